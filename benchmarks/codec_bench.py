@@ -0,0 +1,73 @@
+"""
+Compares the binary wire format against the old pickle path for a typical drawing batch.
+run with: uv run python benchmarks/codec_bench.py
+"""
+
+import pickle
+import random
+import timeit
+
+from shared import codec
+from shared.actions.chat_message_action import ChatMessageAction
+from shared.actions.draw_action import DrawAction
+from shared.chat_message import ChatMessage
+from shared.color import Color
+from shared.point import Point
+
+BATCH_SIZE = 50
+REPEAT = 2000
+
+
+def make_stroke(segments: int):
+    """
+    Builds a random walk stroke the way Canvas produces it: every segment starts where the previous one ended
+    """
+    point = Point(350, 250)
+    color = Color(random.randint(0, 255), 0, 0)
+    stroke = []
+    for _ in range(segments):
+        end = Point(point.x + random.randint(-8, 8), point.y + random.randint(-8, 8))
+        stroke.append(DrawAction(point, end, color, 5))
+        point = end
+    return stroke
+
+
+def bench(name: str, batch: list, segments: int):
+    pickled = pickle.dumps(batch)
+    encoded = codec.encode(batch)
+    results = {
+        "pickle": (
+            len(pickled),
+            timeit.timeit(lambda: pickle.dumps(batch), number=REPEAT),
+            timeit.timeit(lambda: pickle.loads(pickled), number=REPEAT),
+        ),
+        "binary": (
+            len(encoded),
+            timeit.timeit(lambda: codec.encode(batch), number=REPEAT),
+            timeit.timeit(lambda: codec.decode(encoded), number=REPEAT),
+        ),
+    }
+
+    print(f"\n{name} ({len(batch)} actions)")
+    print(f"{'codec':<8}{'bytes':>8}{'B/seg':>8}{'enc ns/op':>12}{'dec ns/op':>12}")
+    for codec_name, (size, encode_time, decode_time) in results.items():
+        print(
+            f"{codec_name:<8}{size:>8}{size / segments:>8.1f}"
+            f"{encode_time / REPEAT * 1e9:>12.0f}{decode_time / REPEAT * 1e9:>12.0f}"
+        )
+
+
+def main():
+    random.seed(0)
+    stroke = make_stroke(BATCH_SIZE)
+    bench("single segment", stroke[:1], 1)
+    bench("draw batch", stroke, BATCH_SIZE)
+    bench(
+        "chat message",
+        [ChatMessageAction(ChatMessage("player", "ice cream", (0, 0, 0)))],
+        1,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures how long it takes a fresh process to import server.main and how much memory it holds after it,
+with the shared package as it is now and with pygame loaded on top (what importing shared used to cost).
+run with: uv run python benchmarks/import_time_bench.py [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SCENARIOS = {
+    "server": "from server import main",
+    "server + pygame": "import pygame\nfrom server import main",
+}
+
+
+def run_once(code: str) -> tuple[float, int]:
+    """
+    Returns the wall time of a process that only runs code, and its max RSS in KiB
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-c", code],
+        stdout=subprocess.DEVNULL,
+        env={**os.environ, "PYGAME_HIDE_SUPPORT_PROMPT": "1"},
+    )
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status:
+        raise RuntimeError(f"{code!r} failed")
+    return elapsed, rusage.ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    loads_pygame = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from server import main; print('pygame' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    print(f"importing server loads pygame: {loads_pygame}")
+
+    run_once("pass")  # warm up the file system cache
+    baseline = statistics.median(run_once("pass")[0] for _ in range(args.runs))
+    print(f"{'scenario':<18}{'import ms':>10}{'RSS MiB':>10}")
+    for name, code in SCENARIOS.items():
+        results = [run_once(code) for _ in range(args.runs)]
+        import_time = statistics.median(t for t, _ in results) - baseline
+        rss = statistics.median(r for _, r in results) / 1024
+        print(f"{name:<18}{import_time * 1000:>10.1f}{rss:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
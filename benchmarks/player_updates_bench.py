@@ -0,0 +1,52 @@
+"""
+Measures the traffic a single name keystroke causes in rooms of growing size:
+the PlayerUpdateAction the server sends now against the whole player list it used to send to everyone.
+run with: uv run python benchmarks/player_updates_bench.py
+"""
+
+import logging
+
+from server.connection import Connection
+from server.room import Room
+from server.scheduler import Scheduler
+from shared.actions.player_list_action import PlayerListAction
+from shared.actions.player_name_action import PlayerNameAction
+from shared.protocol import ActionProtocol
+
+ROOM_SIZES = (2, 8, 32, 128)
+
+
+class CountingConnection(Connection):
+    """
+    A connection that only counts the bytes written to it
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sent = 0
+
+    def send_frame(self, frame):
+        self.sent += len(frame)
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{'players':>8}{'full list B':>14}{'delta B':>10}{'ratio':>8}")
+    for size in ROOM_SIZES:
+        room = Room("bench", lambda room: None, Scheduler())
+        conns = [CountingConnection() for _ in range(size)]
+        for i, conn in enumerate(conns):
+            room.join(conn)
+            room.handle_batch([PlayerNameAction(f"player {i}")], conn)
+
+        full_list = size * len(
+            ActionProtocol.encode_frame(PlayerListAction(room.state.get_player_list()))
+        )
+        before = sum(conn.sent for conn in conns)
+        room.handle_batch([PlayerNameAction("player 0!")], conns[0])
+        delta = sum(conn.sent for conn in conns) - before
+        print(f"{size:>8}{full_list:>14}{delta:>10}{full_list / delta:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
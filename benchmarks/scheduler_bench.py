@@ -0,0 +1,79 @@
+"""
+Runs the turn timers of many rooms on one scheduler: every room plays a turn that times out,
+waits for the turn end delay and moves on to the next player.
+checks that every room got there, that no thread was started per timer, and how late the timers fired.
+run with: uv run python benchmarks/scheduler_bench.py [--rooms N] [--turn-timeout S]
+"""
+
+import argparse
+import logging
+import threading
+import time
+
+from server import round_manager
+from server.connection import Connection
+from server.room import Room
+from server.scheduler import Scheduler
+from shared.actions.start_game_action import StartGameAction
+from shared.actions.work_picked_action import WordPickedAction
+
+
+def make_room(i: int, scheduler: Scheduler, turn_timeout: float):
+    """
+    A room with two players that don't read anything (the base Connection ignores frames)
+    """
+    room = Room(str(i), lambda room: None, scheduler)
+    room.round_manager.turn_timeout = turn_timeout
+    players = [Connection(), Connection()]
+    for conn in players:
+        room.join(conn)
+    room.handle_batch([StartGameAction()], players[0])
+    room.handle_batch(
+        [WordPickedAction(next(iter(room.round_manager.word_manager.available_words)))],
+        room.round_manager.turn.active_player,
+    )
+    return room
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--turn-timeout", type=float, default=1)
+    parser.add_argument("--turn-end-delay", type=float, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    round_manager.TURN_END_DELAY = args.turn_end_delay
+
+    scheduler = Scheduler()
+    threads_before = threading.active_count()
+    start = time.monotonic()
+    rooms = [make_room(i, scheduler, args.turn_timeout) for i in range(args.rooms)]
+    first_turns = [room.round_manager.turn for room in rooms]
+    setup = time.monotonic() - start
+
+    # the last room picked its word right at the end of the setup
+    expected = start + setup + args.turn_timeout + args.turn_end_delay
+    peak_threads = threading.active_count()
+    deadline = time.monotonic() + args.turn_timeout + args.turn_end_delay + 10
+    while time.monotonic() < deadline:
+        peak_threads = max(peak_threads, threading.active_count())
+        done = sum(
+            room.round_manager.turn is not turn
+            for room, turn in zip(rooms, first_turns)
+        )
+        if done == len(rooms):
+            break
+        time.sleep(0.01)
+    finished = time.monotonic()
+
+    print(f"rooms:                  {args.rooms}")
+    print(f"setup:                  {setup * 1000:.0f} ms")
+    print(f"rooms on their 2nd turn: {done}")
+    print(f"extra threads:          {peak_threads - threads_before}")
+    print(f"last turn started late: {(finished - expected) * 1000:.0f} ms")
+    if done != len(rooms) or peak_threads - threads_before > 1:
+        raise SystemExit("FAILED")
+
+
+if __name__ == "__main__":
+    main()
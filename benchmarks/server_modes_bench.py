@@ -0,0 +1,145 @@
+"""
+Compares the asyncio and threaded server modes: how many connections a server process holds,
+and how many forwarded actions per second it delivers to them.
+run with: uv run python benchmarks/server_modes_bench.py [--clients N] [--senders N] [--duration S]
+"""
+
+import argparse
+import asyncio
+import logging
+import socket
+import subprocess
+import sys
+import time
+
+from shared.actions.clear_canvas_action import ClearCanvasAction
+from shared.actions.init_game_state_action import InitGameStateAction
+from shared.actions.join_room_action import JoinRoomAction
+from shared.protocol import ActionProtocol
+
+SEND_BATCH = [ClearCanvasAction()] * 10
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode: str, port: int):
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import sys, logging, server; logging.disable(logging.CRITICAL); server.main(sys.argv[1:])",
+            "--mode",
+            mode,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            # the clients all run on one event loop and fall behind the server, they lose frames instead of being disconnected
+            "--overflow",
+            "drop",
+        ]
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return proc
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def connect(port: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(ActionProtocol.encode_frame(JoinRoomAction()))
+    return reader, writer
+
+
+async def client(port: int, joined: asyncio.Event, counter: list[int]):
+    reader, writer = await connect(port)
+    while actions := await ActionProtocol.recv_batch_async(reader):
+        if any(isinstance(a, InitGameStateAction) for a in actions):
+            joined.set()
+        counter[0] += sum(isinstance(a, ClearCanvasAction) for a in actions)
+    return writer
+
+
+async def discard(reader: asyncio.StreamReader):
+    while await ActionProtocol.recv_frame_async(reader):
+        pass
+
+
+async def sender(writer: asyncio.StreamWriter, stop: float):
+    frame = ActionProtocol.encode_frame(SEND_BATCH)
+    sent = 0
+    while time.time() < stop:
+        writer.write(frame)
+        await writer.drain()
+        sent += len(SEND_BATCH)
+        await asyncio.sleep(0)
+    return sent
+
+
+async def run(mode: str, clients: int, senders: int, duration: float):
+    port = free_port()
+    proc = start_server(mode, port)
+    try:
+        counter = [0]
+        connections = []
+        tasks = []
+        for _ in range(clients):
+            joined = asyncio.Event()
+            task = asyncio.create_task(client(port, joined, counter))
+            try:
+                await asyncio.wait_for(joined.wait(), 5)
+            except asyncio.TimeoutError:
+                task.cancel()
+                break
+            tasks.append(task)
+            connections.append(joined)
+
+        writers = []
+        for _ in range(senders):
+            reader, writer = await connect(port)
+            # the senders get the forwarded actions too, a server drops a client that doesn't read them
+            tasks.append(asyncio.create_task(discard(reader)))
+            writers.append(writer)
+        await asyncio.sleep(0.5)
+
+        counter[0] = 0
+        start = time.time()
+        sent = sum(
+            await asyncio.gather(*(sender(w, start + duration) for w in writers))
+        )
+        elapsed = time.time() - start
+        delivered = counter[0]
+        for task in tasks:
+            task.cancel()
+        return len(connections), sent / elapsed, delivered / elapsed
+    finally:
+        proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--senders", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'mode':<10}{'held':>8}{'sent/s':>12}{'delivered/s':>14}")
+    for mode in ("threaded", "asyncio"):
+        held, sent, delivered = asyncio.run(
+            run(mode, args.clients, args.senders, args.duration)
+        )
+        print(f"{mode:<10}{held:>8}{sent:>12.0f}{delivered:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
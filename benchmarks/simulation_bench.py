@@ -0,0 +1,152 @@
+"""
+Plays whole games with the simulation harness: scripted players in one room over in-memory connections, on a virtual clock.
+checks that a seed plays the same game every time, that a few known seeds still play the games they always did
+(also with a player joining in the middle of the game),
+and how many games a second the harness gets through.
+run with: uv run python benchmarks/simulation_bench.py [--games N] [--players N] [--seed N] [--wire] [--profile]
+"""
+
+import argparse
+import cProfile
+import logging
+import pstats
+import time
+
+from server.simulation import GameResult, SimulationConfig, run_games
+
+# what these seeds play with the default config: (scores, winners, turns).
+# a change to the game rules or to what the room picks at random changes them, update them on purpose only
+KNOWN_GAMES = {
+    0: (
+        {"player0": 160, "player1": 276, "player2": 242, "player3": 194},
+        ["player1"],
+        12,
+    ),
+    1: (
+        {"player0": 299, "player1": 307, "player2": 269, "player3": 213},
+        ["player1"],
+        12,
+    ),
+    2: (
+        {"player0": 313, "player1": 332, "player2": 342, "player3": 390},
+        ["player3"],
+        12,
+    ),
+}
+# the same seeds with a fifth player joining in the middle of the first round, they get their turns from the second one on
+KNOWN_LATE_JOIN_GAMES = {
+    0: (
+        {
+            "player0": 202,
+            "player1": 318,
+            "player2": 320,
+            "player3": 275,
+            "player4": 238,
+        },
+        ["player2"],
+        14,
+    ),
+    1: (
+        {
+            "player0": 296,
+            "player1": 357,
+            "player2": 369,
+            "player3": 243,
+            "player4": 242,
+        },
+        ["player2"],
+        14,
+    ),
+    2: (
+        {
+            "player0": 313,
+            "player1": 425,
+            "player2": 386,
+            "player3": 471,
+            "player4": 301,
+        },
+        ["player3"],
+        14,
+    ),
+}
+
+
+def check_known_games(known: dict, config: SimulationConfig) -> list[str]:
+    """
+    Plays the known seeds and returns what they did differently
+    """
+    failures = []
+    for result in run_games(list(known), config):
+        played = _summary(result)
+        if played != known[result.seed]:
+            failures.append(
+                f"seed {result.seed}: expected {known[result.seed]}, got {played}"
+            )
+    return failures
+
+
+def _summary(result: GameResult):
+    return result.scores, result.winners, result.turns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--hit-rate", type=float, default=0.8)
+    parser.add_argument(
+        "--seed", type=int, default=0, help="the seed of the first game"
+    )
+    parser.add_argument(
+        "--wire",
+        action="store_true",
+        help="sends every frame through the codec, slower but counts the bytes",
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="prints where the time goes"
+    )
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    config = SimulationConfig(
+        players=args.players, hit_rate=args.hit_rate, wire=args.wire
+    )
+    seeds = range(args.seed, args.seed + args.games)
+
+    profiler = cProfile.Profile() if args.profile else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    results = run_games(seeds, config)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+    replayed = run_games(seeds[:10], config)
+
+    virtual = sum(result.duration for result in results)
+    print(f"games:            {len(results)} x {args.players} players")
+    print(f"wall time:        {elapsed:.2f} s")
+    print(f"games/s:          {len(results) / elapsed:.0f}")
+    print(
+        f"virtual time:     {virtual / 3600:.1f} h ({virtual / elapsed:.0f}x real time)"
+    )
+    print(f"scheduled calls:  {sum(result.steps for result in results)}")
+    print(f"frames:           {sum(result.frames for result in results)}")
+    if args.wire:
+        print(
+            f"bytes:            {sum(result.bytes for result in results) / 1024**2:.1f} MiB"
+        )
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+    if replayed != results[:10]:
+        raise SystemExit("FAILED: the same seeds played different games")
+    failures = check_known_games(KNOWN_GAMES, SimulationConfig(wire=args.wire))
+    failures += check_known_games(
+        KNOWN_LATE_JOIN_GAMES, SimulationConfig(late_players=1, wire=args.wire)
+    )
+    if failures:
+        raise SystemExit("FAILED: known games changed\n" + "\n".join(failures))
+    print("known games:      ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares how much memory a turn's strokes take as a list of DrawActions and as a StrokeBuffer.
+run with: uv run python benchmarks/stroke_memory_bench.py [--segments N]
+"""
+
+import argparse
+import gc
+import pickle
+import random
+import tracemalloc
+
+from shared.actions.draw_action import DrawAction
+from shared.color import Color
+from shared.point import Point
+from shared.stroke_buffer import StrokeBuffer
+
+
+def make_strokes(segments: int):
+    """
+    A random walk the way Canvas produces it, built from plain numbers so building it allocates nothing we measure
+    """
+    x, y = 350, 250
+    strokes = []
+    for _ in range(segments):
+        nx, ny = x + random.randint(-8, 8), y + random.randint(-8, 8)
+        strokes.append((x, y, nx, ny, random.randint(0, 255), 5))
+        x, y = nx, ny
+    return strokes
+
+
+def as_list(strokes):
+    return [
+        DrawAction(Point(x0, y0), Point(x1, y1), Color(r, 0, 0), size)
+        for x0, y0, x1, y1, r, size in strokes
+    ]
+
+
+def as_buffer(strokes):
+    buffer = StrokeBuffer()
+    for stroke in as_list(strokes):
+        buffer.append(stroke)
+    return buffer
+
+
+def measure(build, strokes) -> int:
+    """
+    Returns the bytes still allocated by the structure build returns
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build(strokes)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=100_000)
+    args = parser.parse_args()
+    random.seed(0)
+    strokes = make_strokes(args.segments)
+
+    print(f"{'storage':<14}{'bytes':>12}{'B/seg':>8}{'pickled B/seg':>15}")
+    for name, build in (("DrawAction[]", as_list), ("StrokeBuffer", as_buffer)):
+        size = measure(build, strokes)
+        pickled = len(pickle.dumps(build(strokes), protocol=pickle.HIGHEST_PROTOCOL))
+        print(
+            f"{name:<14}{size:>12}{size / args.segments:>8.1f}"
+            f"{pickled / args.segments:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Compares the transports: the same server (in this process, so the in-memory transport can reach it)
+with clients forwarding actions to each other over TCP, a unix domain socket and socket pairs,
+and how long a ping takes on an idle connection.
+run with: uv run python benchmarks/transport_bench.py [--mode asyncio|threaded] [--clients N] [--senders N] [--duration S]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+import server
+from shared.actions.clear_canvas_action import ClearCanvasAction
+from shared.actions.init_game_state_action import InitGameStateAction
+from shared.actions.join_room_action import JoinRoomAction
+from shared.actions.ping_action import PingAction
+from shared.actions.pong_action import PongAction
+from shared.protocol import ActionProtocol
+from shared.transport import MemoryTransport, TcpTransport, Transport, UnixTransport
+
+SEND_BATCH = [ClearCanvasAction()] * 10
+PINGS = 200
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode: str, transport: Transport):
+    """
+    Runs a server on a daemon thread and waits until it accepts connections
+    """
+    # the clients share this process with the server and fall behind it, they lose frames instead of being disconnected
+    argv = ["--mode", mode, "--ping-interval", "0", "--overflow", "drop"]
+    threading.Thread(target=server.main, args=(argv, transport), daemon=True).start()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            transport.connect().close()
+            return
+        except (ConnectionRefusedError, FileNotFoundError):
+            time.sleep(0.1)
+    raise RuntimeError(f"{mode} server did not start on {transport}")
+
+
+async def connect(transport: Transport):
+    reader, writer = await transport.open_connection()
+    writer.write(ActionProtocol.encode_frame(JoinRoomAction()))
+    return reader, writer
+
+
+async def client(transport: Transport, joined: asyncio.Event, counter: list[int]):
+    reader, writer = await connect(transport)
+    while actions := await ActionProtocol.recv_batch_async(reader):
+        if any(isinstance(a, InitGameStateAction) for a in actions):
+            joined.set()
+        counter[0] += sum(isinstance(a, ClearCanvasAction) for a in actions)
+    return writer
+
+
+async def discard(reader: asyncio.StreamReader):
+    while await ActionProtocol.recv_frame_async(reader):
+        pass
+
+
+async def sender(writer: asyncio.StreamWriter, stop: float):
+    frame = ActionProtocol.encode_frame(SEND_BATCH)
+    sent = 0
+    while time.time() < stop:
+        writer.write(frame)
+        await writer.drain()
+        sent += len(SEND_BATCH)
+        await asyncio.sleep(0)
+    return sent
+
+
+async def ping(transport: Transport) -> float:
+    """
+    The median round trip of a ping on a connection that isn't in a room, in seconds
+    """
+    reader, writer = await transport.open_connection()
+    samples = []
+    for _ in range(PINGS):
+        sent = time.perf_counter()
+        writer.write(ActionProtocol.encode_frame(PingAction(time.monotonic())))
+        while not any(
+            isinstance(a, PongAction)
+            for a in await ActionProtocol.recv_batch_async(reader)
+        ):
+            pass
+        samples.append(time.perf_counter() - sent)
+    writer.close()
+    return statistics.median(samples)
+
+
+async def run(transport: Transport, clients: int, senders: int, duration: float):
+    counter = [0]
+    tasks = []
+    for _ in range(clients):
+        joined = asyncio.Event()
+        task = asyncio.create_task(client(transport, joined, counter))
+        await asyncio.wait_for(joined.wait(), 5)
+        tasks.append(task)
+
+    writers = []
+    for _ in range(senders):
+        reader, writer = await connect(transport)
+        # the senders get the forwarded actions too, a server drops a client that doesn't read them
+        tasks.append(asyncio.create_task(discard(reader)))
+        writers.append(writer)
+    await asyncio.sleep(0.5)
+
+    counter[0] = 0
+    start = time.time()
+    sent = sum(await asyncio.gather(*(sender(w, start + duration) for w in writers)))
+    elapsed = time.time() - start
+    delivered = counter[0]
+    rtt = await ping(transport)
+    for task in tasks:
+        task.cancel()
+    for writer in writers:
+        writer.close()
+    return sent / elapsed, delivered / elapsed, rtt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=server.SERVER_MODES, default="asyncio")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--senders", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    transports = {"tcp": TcpTransport("127.0.0.1", free_port())}
+    if hasattr(socket, "AF_UNIX"):
+        path = os.path.join(tempfile.mkdtemp(), "skribble.sock")
+        transports["unix"] = UnixTransport(path)
+    transports["memory"] = MemoryTransport()
+
+    print(f"{args.mode} server, {args.clients} clients, {args.senders} senders")
+    print(f"{'transport':<10}{'sent/s':>12}{'delivered/s':>14}{'ping p50 us':>14}")
+    for name, transport in transports.items():
+        start_server(args.mode, transport)
+        sent, delivered, rtt = asyncio.run(
+            run(transport, args.clients, args.senders, args.duration)
+        )
+        print(f"{name:<10}{sent:>12.0f}{delivered:>14.0f}{rtt * 1e6:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import logging
+
+from shared.config import SERVER_ADDRESS, SERVER_PORT
+from shared.transport import TcpTransport, UnixTransport
+
+from bot.load import LoadConfig, run_load
+
+
+def main(argv: list[str] = None):
+    """
+    Parses the command line, plays the server with rooms x bots headless players for a while
+    and prints the latency percentiles, throughput and errors they saw
+    """
+    parser = argparse.ArgumentParser(prog="bot")
+    parser.add_argument("--host", default=SERVER_ADDRESS)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument(
+        "--unix",
+        metavar="PATH",
+        help="connects through the server's unix domain socket at PATH instead of host:port",
+    )
+    parser.add_argument("--rooms", type=int, default=10, help="how many rooms to fill")
+    parser.add_argument(
+        "--bots", type=int, default=4, help="how many bots play in every room"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=30, help="seconds to keep playing"
+    )
+    parser.add_argument(
+        "--draw-rate",
+        type=float,
+        default=100,
+        help="segments a second the drawing bot sends",
+    )
+    parser.add_argument(
+        "--guess-rate",
+        type=float,
+        default=0.5,
+        help="guesses a second every other bot sends",
+    )
+    parser.add_argument(
+        "--hit-rate",
+        type=float,
+        default=0.1,
+        help="the chance that a guess is the right word, so turns end before they time out",
+    )
+    parser.add_argument(
+        "--seed", type=int, help="makes the bots draw and guess the same way every run"
+    )
+    args = parser.parse_args(argv)
+    if args.bots < 2:
+        parser.error("a game needs at least 2 bots in a room")
+    logging.getLogger().setLevel(logging.WARNING)
+
+    transport = (
+        UnixTransport(args.unix) if args.unix else TcpTransport(args.host, args.port)
+    )
+    config = LoadConfig(
+        transport,
+        args.rooms,
+        args.bots,
+        args.duration,
+        args.draw_rate,
+        args.guess_rate,
+        args.hit_rate,
+        args.seed,
+    )
+    print(
+        f"{args.rooms} rooms x {args.bots} bots against {transport} for {args.duration:g}s"
+    )
+    stats, elapsed = asyncio.run(run_load(config))
+    print(stats.report(elapsed))
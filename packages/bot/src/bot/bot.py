@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Mapping
+
+from shared.actions import Action
+from shared.actions.chat_message_action import ChatMessageAction
+from shared.actions.choose_word_action import ChooseWordAction
+from shared.actions.create_room_action import CreateRoomAction
+from shared.actions.draw_action import DrawAction
+from shared.actions.game_over_action import GameOverAction
+from shared.actions.init_game_state_action import InitGameStateAction
+from shared.actions.join_room_action import JoinRoomAction
+from shared.actions.leave_action import LeaveAction
+from shared.actions.ping_action import PingAction
+from shared.actions.player_name_action import PlayerNameAction
+from shared.actions.pong_action import PongAction
+from shared.actions.room_list_action import RoomListAction
+from shared.actions.turn_end_action import TurnEndAction
+from shared.actions.turn_start_action import TurnStartAction
+from shared.actions.work_picked_action import WordPickedAction
+from shared.chat_message import ChatMessage
+from shared.color import Color
+from shared.colors import BLACK
+from shared.heartbeat import Heartbeat
+from shared.point import Point
+from shared.protocol import HEADER_SIZE, ActionProtocol
+from shared.transport import Transport
+
+from bot.stats import LoadStats
+
+# the size of the client's canvas, strokes stay inside it
+CANVAS_WIDTH, CANVAS_HEIGHT = 700, 500
+# how far the pen moves between two segments, like a mouse motion event
+PEN_STEP = 8
+# seconds between two rounds of sending, the client batches its strokes just as often
+TICK = 0.05
+# seconds between the pings a bot sends to measure the round trip time
+PING_EVERY = 1
+
+type OnActionCallable = Callable[[Action], None]
+
+
+@dataclass
+class BotRoom:
+    """
+    What the bots of a room know about it, the word is shared so the guessers can get it right some of the time
+    """
+
+    id: str = None
+    word: str = None
+
+
+class Bot:
+    """
+    A headless player that talks to the server with ActionProtocol on an asyncio stream.
+    it joins a room, names itself, picks a word when it is its turn to draw and streams random strokes while drawing,
+    and sends guesses (right ones with a chance of hit_rate) while the others draw.
+    it measures how long joining, a chat echo and a ping take, and counts everything it sends and receives
+    """
+
+    def __init__(
+        self,
+        name: str,
+        room: BotRoom,
+        stats: LoadStats,
+        draw_rate: float,
+        guess_rate: float,
+        hit_rate: float,
+        rng: random.Random,
+    ):
+        """
+        draw_rate is how many segments a second it draws, guess_rate how many guesses a second it sends
+        """
+        self.name = name
+        self.room = room
+        self.stats = stats
+        self.draw_rate = draw_rate
+        self.guess_rate = guess_rate
+        self.hit_rate = hit_rate
+        self.rng = rng
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+        self.heartbeat = Heartbeat()
+        self.joined = asyncio.Event()
+        self.done = asyncio.Event()
+        self.game_over = False
+        self.join_sent: float = None
+        self.picked_word: str = None
+        self.drawing = False
+        self.guessing = False
+        self.pen = Point(CANVAS_WIDTH // 2, CANVAS_HEIGHT // 2)
+        self.color = Color(0, 0, 0)
+        self.segments_due = 0.0
+        # the text of every guess that wasn't echoed back yet, with the time it was sent
+        self.pending_guesses: dict[str, float] = {}
+        self.guesses = 0
+        self.actionsMap: Mapping[Action, OnActionCallable] = {
+            InitGameStateAction: self._on_init_game_state,
+            ChooseWordAction: self._on_choose_word,
+            TurnStartAction: self._on_turn_start,
+            TurnEndAction: self._on_turn_end,
+            ChatMessageAction: self._on_chat_message,
+            GameOverAction: self._on_game_over,
+            RoomListAction: self._on_room_list,
+        }
+
+    async def connect(self, transport: Transport):
+        self.reader, self.writer = await transport.open_connection()
+        asyncio.create_task(self._read_loop())
+
+    def join(self):
+        """
+        Creates a new room if the bots of the room don't have one yet, or joins theirs
+        """
+        self.join_sent = time.monotonic()
+        enter = JoinRoomAction(self.room.id) if self.room.id else CreateRoomAction()
+        self.send([enter, PlayerNameAction(self.name)])
+
+    def send(self, batch: list[Action] | Action):
+        if not isinstance(batch, list):
+            batch = [batch]
+        if self.writer.is_closing():
+            return
+        frame = ActionProtocol.encode_frame(batch)
+        self.writer.write(frame)
+        self.stats.actions_sent += len(batch)
+        self.stats.bytes_sent += len(frame)
+
+    async def play(self, deadline: float):
+        """
+        Draws or guesses every tick until the game is over, the connection drops or the deadline passes
+        """
+        last_ping = 0
+        while not self.done.is_set():
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now - last_ping >= PING_EVERY:
+                last_ping = now
+                self.send(PingAction(now))
+            if self.drawing:
+                self._draw(TICK)
+            elif self.guessing and self.rng.random() < self.guess_rate * TICK:
+                self._guess()
+            try:
+                await self.writer.drain()
+                await asyncio.wait_for(self.done.wait(), TICK)
+            except (asyncio.TimeoutError, OSError):
+                pass
+
+    def close(self):
+        self.done.set()
+        if self.writer:
+            # leaving on purpose frees the bot's place in the room right away
+            self.send(LeaveAction())
+            self.writer.close()
+
+    async def _read_loop(self):
+        """
+        Reads frames until the connection ends and passes their actions to the handlers from the actionsMap
+        """
+        try:
+            while True:
+                payload = await ActionProtocol.recv_frame_async(self.reader)
+                if payload is None:
+                    break
+                self.stats.bytes_received += HEADER_SIZE + len(payload)
+                actions = ActionProtocol.decode_payload(payload)
+                if not actions:
+                    self.stats.error("bad frame")
+                    break
+                self.stats.actions_received += len(actions)
+                now = time.monotonic()
+                for action in actions:
+                    if isinstance(action, PongAction):
+                        self.stats.sample("ping", now - action.sent)
+                actions, replies = self.heartbeat.receive(actions)
+                if replies:
+                    self.send(replies)
+                for action in actions:
+                    if type(action) in self.actionsMap:
+                        self.actionsMap[type(action)](action)
+        except OSError:
+            pass
+        if not self.done.is_set() and not self.game_over:
+            self.stats.error("disconnected")
+        self.done.set()
+
+    def _on_init_game_state(self, action: InitGameStateAction):
+        self.room.id = action.room_id
+        self.stats.sample("join", time.monotonic() - self.join_sent)
+        self.joined.set()
+
+    def _on_room_list(self, action: RoomListAction):
+        # only sent back for a room that doesn't exist
+        logging.warning("%s couldn't join room %s", self.name, self.room.id)
+        self.stats.error("join refused")
+        self.close()
+
+    def _on_choose_word(self, action: ChooseWordAction):
+        self.picked_word = self.rng.choice(action.options)
+        self.room.word = self.picked_word
+        self.send(WordPickedAction(self.picked_word))
+
+    def _on_turn_start(self, action: TurnStartAction):
+        self.drawing = action.word == self.picked_word
+        self.guessing = not self.drawing
+        if self.drawing:
+            self.color = Color(*(self.rng.randrange(256) for _ in range(3)))
+
+    def _on_turn_end(self, action: TurnEndAction):
+        self.drawing = self.guessing = False
+        self.picked_word = None
+
+    def _on_chat_message(self, action: ChatMessageAction):
+        message = action.message
+        sent = self.pending_guesses.pop(message.text, None)
+        if sent is not None:
+            self.stats.sample("chat", time.monotonic() - sent)
+        elif message.text == f"{self.name} guessed the word!":
+            # a right guess comes back as the system message instead of the guess itself
+            self.guessing = False
+
+    def _on_game_over(self, action: GameOverAction):
+        # the server hangs up right after it
+        self.game_over = True
+        self.drawing = self.guessing = False
+
+    def _draw(self, seconds: float):
+        """
+        Sends the segments that are due by now as one batch, the pen walks randomly across the canvas
+        """
+        self.segments_due += self.draw_rate * seconds
+        count = int(self.segments_due)
+        if not count:
+            return
+        self.segments_due -= count
+        batch = []
+        for _ in range(count):
+            end = Point(
+                min(
+                    max(self.pen.x + self.rng.randint(-PEN_STEP, PEN_STEP), 0),
+                    CANVAS_WIDTH - 1,
+                ),
+                min(
+                    max(self.pen.y + self.rng.randint(-PEN_STEP, PEN_STEP), 0),
+                    CANVAS_HEIGHT - 1,
+                ),
+            )
+            batch.append(DrawAction(self.pen, end, self.color, 5))
+            self.pen = end
+        self.send(batch)
+
+    def _guess(self):
+        if self.room.word and self.rng.random() < self.hit_rate:
+            text = self.room.word
+        else:
+            self.guesses += 1
+            text = f"{self.name} guess {self.guesses}"
+            self.pending_guesses[text] = time.monotonic()
+        self.send(ChatMessageAction(ChatMessage(self.name, text, BLACK)))
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+
+from shared.actions.start_game_action import StartGameAction
+from shared.transport import Transport
+
+from bot.bot import Bot, BotRoom
+from bot.stats import LoadStats
+
+# seconds a bot may wait for the server to let it into a room
+JOIN_TIMEOUT = 10
+# seconds to wait before filling a room again after a connection failed
+RETRY_DELAY = 1
+
+
+@dataclass
+class LoadConfig:
+    transport: Transport
+    rooms: int
+    bots: int
+    duration: float
+    draw_rate: float
+    guess_rate: float
+    hit_rate: float
+    seed: int = None
+
+
+async def run_load(config: LoadConfig) -> tuple[LoadStats, float]:
+    """
+    Fills every room with bots that play games back to back until the duration is up,
+    returns what they measured and how many seconds it took
+    """
+    stats = LoadStats()
+    rng = random.Random(config.seed)
+    start = time.monotonic()
+    deadline = start + config.duration
+    await asyncio.gather(
+        *(
+            _run_room(index, config, stats, random.Random(rng.random()), deadline)
+            for index in range(config.rooms)
+        )
+    )
+    return stats, time.monotonic() - start
+
+
+async def _run_room(
+    index: int,
+    config: LoadConfig,
+    stats: LoadStats,
+    rng: random.Random,
+    deadline: float,
+):
+    """
+    Plays one game after another in a new room: the first bot creates it, the others join it, and the first one starts the game.
+    the server closes the connections once a game is over
+    """
+    game = 0
+    while time.monotonic() < deadline:
+        game += 1
+        room = BotRoom()
+        bots = [
+            Bot(
+                f"bot{index}-{game}-{i}",
+                room,
+                stats,
+                config.draw_rate,
+                config.guess_rate,
+                config.hit_rate,
+                rng,
+            )
+            for i in range(config.bots)
+        ]
+        try:
+            # the room id is only known once the first bot created it
+            await _enter(bots[0], config)
+            await asyncio.gather(*(_enter(bot, config) for bot in bots[1:]))
+        except OSError:
+            stats.error("connect")
+            _close(bots)
+            await asyncio.sleep(RETRY_DELAY)
+            continue
+        except asyncio.TimeoutError:
+            stats.error("join timeout")
+            _close(bots)
+            await asyncio.sleep(RETRY_DELAY)
+            continue
+
+        bots[0].send(StartGameAction())
+        await asyncio.gather(*(bot.play(deadline) for bot in bots))
+        if any(bot.game_over for bot in bots):
+            stats.games_finished += 1
+        logging.debug("Room %s is done with game %d", room.id, game)
+        _close(bots)
+
+
+async def _enter(bot: Bot, config: LoadConfig):
+    await bot.connect(config.transport)
+    bot.join()
+    await asyncio.wait_for(bot.joined.wait(), JOIN_TIMEOUT)
+
+
+def _close(bots: list[Bot]):
+    for bot in bots:
+        bot.close()
@@ -0,0 +1,68 @@
+from collections import Counter, defaultdict
+
+PERCENTILES = (50, 90, 99)
+
+
+class LoadStats:
+    """
+    What the bots of a load run measured: latency samples by kind (in seconds),
+    the actions and bytes they sent and received, and the errors they ran into.
+    all the bots run on one event loop, so it is updated without locks
+    """
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.actions_sent = 0
+        self.actions_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.games_finished = 0
+        self.errors: Counter[str] = Counter()
+
+    def sample(self, kind: str, seconds: float):
+        self.latencies[kind].append(seconds)
+
+    def error(self, kind: str):
+        self.errors[kind] += 1
+
+    def report(self, elapsed: float) -> str:
+        """
+        Formats the latency percentiles, throughput and errors as a table
+        """
+        lines = [
+            f"{'latency':<10}{'count':>8}"
+            + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+            + f"{'max ms':>10}"
+        ]
+        for kind, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            lines.append(
+                f"{kind:<10}{len(samples):>8}"
+                + "".join(
+                    f"{percentile(samples, p) * 1000:>10.1f}" for p in PERCENTILES
+                )
+                + f"{samples[-1] * 1000:>10.1f}"
+            )
+        lines.append("")
+        lines.append(
+            f"sent     {self.actions_sent / elapsed:>10.0f} actions/s"
+            f"{self.bytes_sent / elapsed / 1024:>10.1f} KiB/s"
+        )
+        lines.append(
+            f"received {self.actions_received / elapsed:>10.0f} actions/s"
+            f"{self.bytes_received / elapsed / 1024:>10.1f} KiB/s"
+        )
+        lines.append(f"games finished: {self.games_finished}")
+        errors = ", ".join(f"{kind} {count}" for kind, count in self.errors.items())
+        lines.append(f"errors: {errors or 'none'}")
+        return "\n".join(lines)
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """
+    The nearest-rank percentile of sorted samples
+    """
+    if not samples:
+        return 0
+    rank = max(round(p / 100 * len(samples)) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
@@ -4,16 +4,21 @@ import pygame
 from shared.actions import Action
 from shared.actions.init_game_state_action import InitGameStateAction
 from shared.actions.player_list_action import PlayerListAction
+from shared.actions.player_list_request_action import PlayerListRequestAction
+from shared.actions.player_update_action import PlayerUpdateAction
 from shared.actions.start_game_action import StartGameAction
 
+from client import draw_latency
 from client.client_socket import ClientSocket
+from client.fonts import TEXT_CACHE
 from client.game import Game
 from client.game_state import GameState
 from client.menu import Menu
 from client.window import Window
 
 WIDTH, HEIGHT = 1200, 800
-BACKGROUND_COLOR = (240, 240, 255)
+# writes the draw latency histograms to a file, see client.draw_latency
+EXPORT_LATENCY_KEY = pygame.K_F9
 
 
 class UserInterface:
@@ -43,13 +48,23 @@ class UserInterface:
         """
         if isinstance(action, InitGameStateAction):
             self.state.my_player_id = action.you
-            self.state.players_info = action.players_list
-            self.state.chat_messages = action.chat_messages
+            self.state.set_players(action.players_list)
+            self.state.set_chat_messages(action.chat_messages, action.chat_offset)
             self.state.max_rounds = action.max_rounds
+            self.state.room_id = action.room_id
+            self.state.pending_canvas = action.draw_actions
         elif isinstance(action, StartGameAction):
             self.show_game()
         elif isinstance(action, PlayerListAction):
-            self.state.players_info = action.players_list
+            self.state.set_players(action.players_list)
+        elif isinstance(action, PlayerUpdateAction):
+            if (
+                not self.state.apply_player_update(action)
+                and self.state.should_resync_players()
+            ):
+                self.client.send_action_to_server(
+                    PlayerListRequestAction(), immediate=True
+                )
         self.active_window.on_action(action)
 
     def show_menu(self):
@@ -57,12 +72,14 @@ class UserInterface:
         Sets the active window to the menu
         """
         self.active_window_idx = 0
+        self.active_window.invalidate()
 
     def show_game(self):
         """
         Sets the active window to the game.
         """
         self.active_window_idx = 1
+        self.active_window.invalidate()
 
     def quit_game(self):
         """
@@ -70,27 +87,36 @@ class UserInterface:
         """
         self.state.running = False
         self.client.close_client()
+        logging.debug(
+            "Text cache: %d hits, %d misses, %d surfaces",
+            TEXT_CACHE.hits,
+            TEXT_CACHE.misses,
+            len(TEXT_CACHE),
+        )
 
     def run(self):
         """
-        Runs the game loop, handling events, updating, and drawing the active window at 60 FPS
+        Runs the game loop, handling events, updating, and drawing the active window at 60 FPS.
+        only the parts of the screen the window reports as changed are sent to the display
         """
         while self.state.running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.quit_game()
                     return None
+                if event.type == pygame.KEYDOWN and event.key == EXPORT_LATENCY_KEY:
+                    draw_latency.export()
 
                 self.active_window.handle_event(event)
 
             self.active_window.update()
 
             # Draw the game
-            self.screen.fill(BACKGROUND_COLOR)
-            self.active_window.draw(self.screen)
+            dirty_rects = self.active_window.render(self.screen)
 
             # Update the display
-            pygame.display.update()
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
 
             # Cap the framerate
             self.clock.tick(60)
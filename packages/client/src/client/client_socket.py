@@ -1,53 +1,278 @@
 import logging
-import queue
+import os
 import socket
 import time
-from threading import Thread
+from threading import Condition, Lock, Thread
 from typing import Callable
 
 from shared.actions import Action
-from shared.config import SERVER_ADDRESS, SERVER_PORT
-from shared.protocol import ActionProtocol
+from shared.actions.draw_action import DrawAction
+from shared.actions.draw_timing_action import DrawTimingAction
+from shared.actions.game_over_action import GameOverAction
+from shared.actions.init_game_state_action import InitGameStateAction
+from shared.actions.join_room_action import JoinRoomAction
+from shared.actions.leave_action import LeaveAction
+from shared.actions.resume_action import ResumeAction
+from shared.actions.sequence_action import SequenceAction
+from shared.heartbeat import IDLE_TIMEOUT, Heartbeat
+from shared.metrics import REGISTRY, Counter, Histogram
+from shared.protocol import ActionProtocol, FrameReader
+from shared.transport import TcpTransport, Transport, UnixTransport
 
-BATCH_SIZE = 50
-SEND_INTERVAL = 0.05  # Send batch every 50ms
+from client.draw_latency import DRAW_TIMING
+
+# seconds a batch stays open until the round trip time is known
+SEND_INTERVAL = 0.05
+# the bounds of the adaptive interval, a LAN sends about every 5ms and a slow link at least every 100ms
+MIN_SEND_INTERVAL = 0.005
+MAX_SEND_INTERVAL = 0.1
+# the share of the round trip time a batch stays open
+RTT_FRACTION = 0.5
+# a batch this big is sent right away
+MAX_BATCH_SIZE = 200
+# seconds to wait before each attempt to reconnect after the connection dropped
+RECONNECT_DELAYS = (0.5, 1, 2, 4, 8)
+# the path of a server's unix domain socket to connect through instead of TCP, for a server on the same machine
+SERVER_SOCKET = os.environ.get("SKRIBBLE_SOCKET")
+
+BATCHES_SENT = REGISTRY.register(
+    Counter(
+        "skribble_client_batches_total",
+        "Batches sent to the server by why they were sent (interval, size or flush)",
+        ("reason",),
+    )
+)
+BATCH_ACTIONS = REGISTRY.register(
+    Histogram(
+        "skribble_client_batch_actions",
+        "Actions in a batch sent to the server",
+        buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+    )
+)
+BATCH_BYTES = REGISTRY.register(
+    Histogram(
+        "skribble_client_batch_bytes",
+        "Size of a frame sent to the server",
+        buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+    )
+)
+BATCH_INTERVAL = REGISTRY.register(
+    Histogram(
+        "skribble_client_batch_interval_seconds",
+        "How long a batch was allowed to stay open when it was sent",
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1),
+    )
+)
+
+
+class SocketWriter:
+    """
+    Every write to the server goes through here: the main thread, the batch thread and the receiver thread (pongs) all send,
+    and two frames written at once would interleave on the wire.
+    a send that fails or times out may have written part of a frame and nothing can follow it,
+    so the connection is shut down, the receiver thread sees it end and reconnects
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.socket = sock
+        self.lock = Lock()
+
+    def send_batch(self, batch: list[Action] | Action):
+        self.send_frame(ActionProtocol.encode_frame(batch))
+
+    def send_frame(self, frame: bytes):
+        with self.lock:
+            sock = self.socket
+            try:
+                ActionProtocol.send_frame(sock, frame)
+            except OSError:
+                self._break(sock)
+                raise
+
+    def replace(self, sock: socket.socket):
+        """
+        Writes to a new connection from now on, a send in progress finishes on the old one first
+        """
+        with self.lock:
+            self.socket = sock
+
+    def _break(self, sock: socket.socket):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
 
 
 class ClientSocket:
-    def __init__(self, on_action: Callable[[Action], None]):
+    def __init__(
+        self,
+        on_action: Callable[[Action], None],
+        room_id: str = None,
+        transport: Transport = None,
+    ):
         """
-        Initializes a TCP socket and starts batching and receiving threads
+        Connects through the transport (TCP to the server, or its unix socket if SKRIBBLE_SOCKET is set), starts batching and receiving threads
+        and joins a room (the default one if no id is given).
+        if the connection drops, it reconnects and resumes the player with the token and the last frame number the server sent
         """
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.connect((SERVER_ADDRESS, SERVER_PORT))
+        self.on_action = on_action
+        self.room_id = room_id
+        self.transport = transport or (
+            UnixTransport(SERVER_SOCKET) if SERVER_SOCKET else TcpTransport()
+        )
+        self.resume_token: str = None
+        self.last_seq = 0
+        # set once a frame went missing, what arrives on the connection after it is ignored until the player is resumed
+        self.resyncing = False
+        # a dropped connection is final once the client is closed or the game is over (the server hangs up then)
+        self.reconnect = True
+        self.socket = self._connect()
+        self.writer = SocketWriter(self.socket)
+        # pings the server and answers its pings, which also estimates how far the server's clock is from ours
+        self.heartbeat = Heartbeat()
 
-        self.batch_thread = BatchThread(self.socket)
-        self.recv_thread = ReceiverThread(self.socket, on_action)
+        self.batch_thread = BatchThread(self.writer, self.heartbeat)
+        self.recv_thread = ReceiverThread(
+            self.socket,
+            self.writer,
+            self.heartbeat,
+            self._on_actions,
+            self._on_disconnect,
+        )
+        self.send_action_to_server(JoinRoomAction(room_id), immediate=True)
 
     def send_action_to_server(self, action: Action, immediate=False):
         """
         Sends an action immediately or queues it for batch sending
         """
         if immediate:
-            ActionProtocol.send_batch(self.socket, action)
+            try:
+                self.writer.send_batch(action)
+            except OSError:
+                logging.warning("Not connected, %s was not sent", type(action).__name__)
         else:
             self.batch_thread.add_to_queue(action)
 
+    def flush(self):
+        """
+        Sends the batched actions right away instead of waiting for the batch interval
+        """
+        self.batch_thread.flush()
+
     def close_client(self):
         """
-        Stops the batch thread and cleanly shuts down the socket
+        Stops the batch thread, tells the server the player left (so it doesn't keep their place for a reconnect)
+        and cleanly shuts down the socket
         """
+        self.reconnect = False
         self.batch_thread.stop()
+        self.send_action_to_server(LeaveAction(), immediate=True)
         self.socket.shutdown(socket.SHUT_RDWR)
 
+    def _connect(self) -> socket.socket:
+        """
+        Opens a connection to the server. the server pings every few seconds,
+        so a connection that stays silent for longer than the idle timeout is dead and reading from it fails
+        """
+        return self.transport.connect(IDLE_TIMEOUT)
+
+    def _on_actions(self, actions: list[Action]):
+        """
+        Checks that no frame went missing, keeps what is needed to resume (the frame numbers and the resume token)
+        and passes the rest on
+        """
+        if self.resyncing:
+            return
+        if actions and isinstance(actions[0], SequenceAction):
+            sequence: SequenceAction = actions[0]
+            # a new initial state starts over (a new room, or the whole state after missing too much)
+            restart = any(isinstance(a, InitGameStateAction) for a in actions)
+            if self.last_seq and not restart and sequence.prev != self.last_seq:
+                logging.warning(
+                    "Missed frames after %d (got %d, sent after %d), resuming",
+                    self.last_seq,
+                    sequence.seq,
+                    sequence.prev,
+                )
+                self._resync()
+                return
+            self.last_seq = sequence.seq
+            actions = actions[1:]
+        for action in actions:
+            if isinstance(action, InitGameStateAction):
+                self.resume_token = action.resume_token
+                self.room_id = action.room_id
+            elif isinstance(action, GameOverAction):
+                self.reconnect = False
+            self.on_action(action)
+
+    def _resync(self):
+        """
+        Drops the connection after a missing frame, the reconnect resumes the player from the last frame they got in order
+        (the server replays the rest or sends the whole state)
+        """
+        self.resyncing = True
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _on_disconnect(self):
+        """
+        Called by the receiver thread when the connection ends, reconnects and asks to resume the player
+        """
+        for delay in RECONNECT_DELAYS:
+            if not self.reconnect:
+                return
+            time.sleep(delay)
+            try:
+                sock = self._connect()
+                break
+            except OSError:
+                logging.warning("Reconnecting to the server failed")
+        else:
+            logging.error("Gave up reconnecting to the server")
+            return
+        if not self.reconnect:
+            sock.close()
+            return
+
+        logging.info("Reconnected to the server")
+        self.resyncing = False
+        self.writer.replace(sock)
+        self.socket.close()
+        self.socket = sock
+        self.recv_thread = ReceiverThread(
+            sock, self.writer, self.heartbeat, self._on_actions, self._on_disconnect
+        )
+        if self.resume_token:
+            action = ResumeAction(self.resume_token, self.last_seq, self.room_id)
+        else:
+            action = JoinRoomAction(self.room_id)
+        self.send_action_to_server(action, immediate=True)
+
 
 class BatchThread:
-    def __init__(self, socket: socket.socket):
+    """
+    Sends the queued actions in batches. how long a batch stays open adapts to the link:
+    about half the measured round trip (so a LAN sends strokes almost right away and a slow link sends fewer, bigger frames),
+    shortened the fuller the batch gets. a pen-up flushes right away so the end of a stroke isn't held back.
+    the queue is swapped out in one go instead of taking actions one by one,
+    and every flush is counted by its reason, size and interval in the client's metrics
+    """
+
+    def __init__(self, writer: SocketWriter, heartbeat: Heartbeat):
         """
-        Initializes the batch thread with a socket and starts it
+        Initializes the batch thread with the writer of the connection and starts it,
+        it also sends the pings of the heartbeat (which measure the round trip time)
         """
-        self.socket = socket
-        self.queue = queue.Queue()
+        self.writer = writer
+        self.heartbeat = heartbeat
+        self.pending: list[Action] = []
+        self.flush_requested = False
+        self.condition = Condition()
+        # how long the current batch may stay open, for tuning
+        self.interval = SEND_INTERVAL
         self.batch_thread_running = True
         # must be last
         self.t = Thread(target=self.batch_thread)
@@ -57,50 +282,129 @@ class BatchThread:
         """
         Adds an action to the sending queue
         """
-        self.queue.put(action)
+        with self.condition:
+            self.pending.append(action)
+            self.condition.notify()
+
+    def flush(self):
+        """
+        Sends whatever is batched right away, e.g. when the pen is lifted
+        """
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify()
 
     def stop(self):
         """
         Stops the batch thread by setting its running flag to False
         """
-        self.batch_thread_running = False
+        with self.condition:
+            self.batch_thread_running = False
+            self.condition.notify()
 
     def batch_thread(self):
         """
-        Continuously batches and sends queued actions at intervals or when the batch size is reached
+        Collects the queued actions into a batch and sends it once its interval is up, it is full or a flush was asked for
         """
-        data_batch = []
-        last_send_time = time.time()
+        batch: list[Action] = []
+        opened: float = None
+        # when the first stroke of the batch was queued, for its DrawTimingAction
+        first_stroke_time: float = None
 
         while self.batch_thread_running:
             try:
-                data_item = self.queue.get(timeout=SEND_INTERVAL)
-                data_batch.append(data_item)
+                if ping := self.heartbeat.poll():
+                    self.writer.send_batch(ping)
+            except OSError:
+                logging.warning("Failed to ping the server")
+
+            with self.condition:
+                if batch:
+                    timeout = opened + self.interval - time.monotonic()
+                else:
+                    # nothing to send, just wake up now and then for the pings
+                    timeout = MAX_SEND_INTERVAL
+                if not self.pending and not self.flush_requested and timeout > 0:
+                    self.condition.wait(timeout)
+                taken, self.pending = self.pending, []
+                flush, self.flush_requested = self.flush_requested, False
 
-                if (
-                    len(data_batch) >= BATCH_SIZE
-                    or time.time() - last_send_time >= SEND_INTERVAL
+            now = time.monotonic()
+            if taken:
+                if not batch:
+                    opened = now
+                if first_stroke_time is None and any(
+                    isinstance(action, DrawAction) for action in taken
                 ):
-                    ActionProtocol.send_batch(self.socket, data_batch)
-                    data_batch = []
-                    last_send_time = time.time()
-            except queue.Empty:
-                # Timeout occurred: send any remaining data
-                if data_batch:
-                    ActionProtocol.send_batch(self.socket, data_batch)
-                    data_batch = []
-                    last_send_time = time.time()
-            except socket.error:
+                    first_stroke_time = now
+                batch.extend(taken)
+            if not batch:
+                continue
+
+            self.interval = self._interval(len(batch))
+            if flush:
+                reason = "flush"
+            elif len(batch) >= MAX_BATCH_SIZE:
+                reason = "size"
+            elif now - opened >= self.interval:
+                reason = "interval"
+            else:
+                continue
+            try:
+                self._send(batch, first_stroke_time, reason)
+            except OSError:
                 logging.exception("Failed to send batch to server")
+            batch = []
+            first_stroke_time = None
+
+    def _interval(self, batched: int) -> float:
+        """
+        How long a batch of this many actions may stay open: half the round trip within bounds
+        (the default until the first pong), and less the closer the batch is to full
+        """
+        rtt = self.heartbeat.rtt
+        interval = (
+            SEND_INTERVAL
+            if rtt is None
+            else min(max(rtt * RTT_FRACTION, MIN_SEND_INTERVAL), MAX_SEND_INTERVAL)
+        )
+        return interval * max(1 - batched / MAX_BATCH_SIZE, 0)
+
+    def _send(self, batch: list[Action], first_stroke_time: float, reason: str):
+        """
+        Sends a batch, with a DrawTimingAction after its strokes when measuring draw latency
+        and the server's clock offset is known
+        """
+        offset = self.heartbeat.offset
+        if DRAW_TIMING and first_stroke_time is not None and offset is not None:
+            batch.append(
+                DrawTimingAction(first_stroke_time + offset, time.monotonic() + offset)
+            )
+        frame = ActionProtocol.encode_frame(batch)
+        self.writer.send_frame(frame)
+        BATCHES_SENT.inc(reason)
+        BATCH_ACTIONS.observe(len(batch))
+        BATCH_BYTES.observe(len(frame))
+        BATCH_INTERVAL.observe(self.interval)
 
 
 class ReceiverThread:
-    def __init__(self, socket: socket.socket, on_action: Callable[[Action], None]):
+    def __init__(
+        self,
+        socket: socket.socket,
+        writer: SocketWriter,
+        heartbeat: Heartbeat,
+        on_actions: Callable[[list[Action]], None],
+        on_disconnect: Callable[[], None],
+    ):
         """
-        Initializes the receiver thread with a socket and callback, then starts it
+        Initializes the receiver thread with a socket to read from, the writer that answers the pings, the heartbeat that takes the pings and pongs and callbacks, then starts it
         """
-        self.on_action = on_action
+        self.on_actions = on_actions
+        self.on_disconnect = on_disconnect
         self.socket = socket
+        self.writer = writer
+        self.heartbeat = heartbeat
 
         # must be last
         self.t = Thread(target=self.recv_thread_main)
@@ -111,11 +415,28 @@ class ReceiverThread:
         Continuously receives action batches and calls the handler until the connection ends
         """
         logging.debug("client thread started")
+        reader = FrameReader(self.socket)
         while True:
-            actions = ActionProtocol.recv_batch(self.socket)
+            try:
+                actions = reader.recv_batch()
+            except OSError:
+                logging.warning("Lost the connection to the server")
+                actions = None
             if actions:
-                for action in actions:
-                    self.on_action(action)
+                actions, replies = self.heartbeat.receive(actions)
+                if replies:
+                    self._send_replies(replies)
+                self.on_actions(actions)
             else:
                 logging.debug("ending client receiver thread")
                 break
+        self.on_disconnect()
+
+    def _send_replies(self, replies: list[Action]):
+        """
+        Answers the server's pings right away, they measure the round trip time
+        """
+        try:
+            self.writer.send_batch(replies)
+        except OSError:
+            logging.warning("Failed to answer the server's ping")
@@ -1,3 +1,4 @@
 LEFT_CLICK = 1
 RIGHT_CLICK = 3
 MOUSE_BUTTONS_TUPLE = (LEFT_CLICK, RIGHT_CLICK)
+BACKGROUND_COLOR = (240, 240, 255)
@@ -0,0 +1,43 @@
+import logging
+import os
+
+from shared.actions.draw_timing_action import DrawTimingAction
+from shared.metrics import REGISTRY, Histogram
+
+# when set, the strokes this client draws carry a DrawTimingAction so the other players can measure their latency
+DRAW_TIMING = os.environ.get("SKRIBBLE_DRAW_TIMING") == "1"
+EXPORT_PATH = "draw_latency.prom"
+
+DRAW_LATENCY = REGISTRY.register(
+    Histogram(
+        "skribble_draw_latency_seconds",
+        "Time the strokes of other players spend in every stage on their way to the canvas",
+        ("stage",),
+    )
+)
+
+
+def record(timing: DrawTimingAction, arrived: float, drawn: float, offset: float):
+    """
+    Adds the stages of a stroke batch to the histograms: batching on the drawer, the network both ways,
+    the server's draw tick and waiting for the next frame here. arrived and drawn are on our clock,
+    offset is how far the server's clock is ahead of ours, the stages that cross clocks are skipped without it
+    """
+    DRAW_LATENCY.observe(timing.sent - timing.created, "batching")
+    DRAW_LATENCY.observe(timing.forwarded - timing.received, "server")
+    DRAW_LATENCY.observe(drawn - arrived, "render")
+    if offset is None:
+        return
+    network = (timing.received - timing.sent) + (arrived + offset - timing.forwarded)
+    # the offset is an estimate, it may push a fast network below zero
+    DRAW_LATENCY.observe(max(network, 0), "network")
+    DRAW_LATENCY.observe(drawn + offset - timing.created, "total")
+
+
+def export(path: str = EXPORT_PATH):
+    """
+    Writes the client's metrics (these histograms and the batching ones of the BatchThread) in the Prometheus text format
+    """
+    with open(path, "w") as f:
+        f.write(REGISTRY.render())
+    logging.info("Draw latency written to %s", os.path.abspath(path))
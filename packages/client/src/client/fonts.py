@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 import pygame
 
 pygame.font.init()
@@ -10,3 +12,65 @@ FONT_LG = pygame.font.SysFont(font, 24)
 FONT_TITLE = pygame.font.SysFont(font, 64, bold=True)
 
 # Initializes Pygame fonts with various sizes for different UI text elements.
+
+TEXT_CACHE_SIZE = 512
+
+
+class TextCache:
+    """
+    A bounded cache of rendered text surfaces, most of the text on screen (names, scores, chat lines...) is the same every frame.
+    the least recently used surface is dropped once the cache is full.
+    the surfaces are shared, so they must only be blitted and never drawn on
+    """
+
+    def __init__(self, max_size: int = TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(
+        self,
+        font: pygame.font.Font,
+        text: str,
+        antialias: bool,
+        color,
+        background=None,
+    ) -> pygame.Surface:
+        """
+        Same as font.render, but returns the cached surface when the same text was rendered with the same font and colors
+        """
+        key = (
+            font,
+            text,
+            antialias,
+            tuple(pygame.Color(color)),
+            tuple(pygame.Color(background)) if background is not None else None,
+        )
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+TEXT_CACHE = TextCache()
+
+
+def render_text(
+    font: pygame.font.Font, text: str, antialias: bool, color, background=None
+) -> pygame.Surface:
+    """
+    Renders text through the shared TEXT_CACHE, every widget should use this instead of font.render
+    """
+    return TEXT_CACHE.render(font, text, antialias, color, background)
@@ -1,11 +1,15 @@
+import time
 from typing import TYPE_CHECKING, Callable, override
 
 import pygame
 from shared.actions import Action
+from shared.actions.chat_history_action import ChatHistoryAction
+from shared.actions.chat_history_request_action import ChatHistoryRequestAction
 from shared.actions.chat_message_action import ChatMessageAction
 from shared.actions.choose_word_action import ChooseWordAction
 from shared.actions.clear_canvas_action import ClearCanvasAction
 from shared.actions.draw_action import DrawAction
+from shared.actions.draw_timing_action import DrawTimingAction
 from shared.actions.game_over_action import GameOverAction
 from shared.actions.turn_end_action import TurnEndAction
 from shared.actions.turn_start_action import TurnStartAction
@@ -13,7 +17,9 @@ from shared.actions.work_picked_action import WordPickedAction
 from shared.chat_message import ChatMessage
 from shared.colors import BLACK, DARK_GRAY, LIGHT_GRAY, WHITE
 
-from client.fonts import FONT_LG, FONT_MD, FONT_TITLE
+from client import draw_latency
+from client.constants import BACKGROUND_COLOR
+from client.fonts import FONT_LG, FONT_MD, FONT_TITLE, render_text
 from client.game_state import GameState
 from client.items.bubble import Bubble
 from client.items.button import Button
@@ -22,7 +28,7 @@ from client.items.players_list import PlayersList
 from client.items.popup import Popup
 from client.items.title import Title
 from client.items.toolbar import Toolbar
-from client.window import Window
+from client.window import Region, Window
 
 if TYPE_CHECKING:
     from client import UserInterface
@@ -56,13 +62,16 @@ class WordDisplay:
             and not game_state.current_word
             and game_state.active_player()
         ):
-            word_text = FONT_MD.render(
+            word_text = render_text(
+                FONT_MD,
                 f"{game_state.active_player().get_player_name(game_state.my_player_id)} is picking a word",
                 True,
                 DARK_GRAY,
             )
         elif game_state.current_word:
-            word_text = FONT_TITLE.render(game_state.current_word, True, DARK_GRAY)
+            word_text = render_text(
+                FONT_TITLE, game_state.current_word, True, DARK_GRAY
+            )
             if word_text.get_height() > self.rect.height:
                 word_text = pygame.transform.smoothscale(
                     word_text, (word_text.get_width(), self.rect.height)
@@ -100,7 +109,7 @@ class PickWordPopUp:
         overlay.fill((0, 0, 0, 150))
         surface.blit(overlay, self.rect_bound)
 
-        title_surf = FONT_LG.render("Choose a word to draw:", True, WHITE)
+        title_surf = render_text(FONT_LG, "Choose a word to draw:", True, WHITE)
         title_rect = title_surf.get_rect(
             center=(
                 self.rect_bound.centerx,
@@ -184,7 +193,7 @@ class Timer:
         Draws the timer icon and current countdown value on the screen
         """
         surface.blit(self.image, self.image.get_rect(center=self.rect.center))
-        time_text = FONT_MD.render(str(self.current_time), True, BLACK)
+        time_text = render_text(FONT_MD, str(self.current_time), True, BLACK)
         time_rect = time_text.get_rect(
             center=(self.rect.centerx, self.rect.centery + 5)
         )
@@ -213,6 +222,7 @@ class Game(Window):
             DRAWING_AREA_HEIGHT,
             on_draw=self._on_draw,
             state=self.ui.state,
+            on_stroke_end=self._on_stroke_end,
         )
         self.word_display = WordDisplay(
             pygame.Rect(
@@ -231,6 +241,7 @@ class Game(Window):
             ),
             self.ui.state,
             self._on_chat_enter,
+            self._on_chat_scroll_top,
         )
         self.toolbar = Toolbar(
             self.ui.state,
@@ -245,6 +256,33 @@ class Game(Window):
         self.timer = Timer(pygame.Rect(self.word_display.rect.right + 50, 10, 65, 60))
         self.popup = None
         self.bubbles = [Bubble(self.ui.screen.get_rect()) for _ in range(50)]
+        self.full_redraw = True
+        canvas_rect = self.canvas.surface.get_rect(
+            topleft=(self.canvas.x, self.canvas.y)
+        )
+        # drawn back to front, the canvas region has no key because it reports its own dirty rects
+        self.regions = [
+            Region(
+                pygame.Rect(0, 0, self.ui.screen.get_width(), HEADER_HEIGHT),
+                self._draw_header,
+                lambda: (self.ui.state.round, self.ui.state.max_rounds),
+            ),
+            Region(
+                self.word_display.rect,
+                lambda surface: self.word_display.draw(self.ui.state, surface),
+                self._word_display_key,
+            ),
+            Region(self.timer.rect, self.timer.draw, lambda: self.timer.current_time),
+            Region(canvas_rect, self.canvas.draw),
+            Region(self.toolbar.rect, self._draw_toolbar, self._toolbar_key),
+            Region(
+                self.playersList.player_list_rect,
+                lambda surface: self.playersList.draw(self.ui.state, surface),
+                self._players_list_key,
+            ),
+            Region(self.chat.rect, self.chat.draw, self.chat.state_key),
+            Region(canvas_rect, self._draw_popup, self._popup_key),
+        ]
 
     @override
     def handle_event(self, event):
@@ -280,6 +318,8 @@ class Game(Window):
         """
         if isinstance(action, DrawAction):
             self.ui.state.pending_draw_lines.put(action)
+        elif isinstance(action, DrawTimingAction):
+            self.ui.state.pending_draw_timings.put((action, time.monotonic()))
         elif isinstance(action, ClearCanvasAction):
             self.canvas.clear_canvas()
         elif isinstance(action, ChooseWordAction):
@@ -330,14 +370,82 @@ class Game(Window):
             )
 
         elif isinstance(action, ChatMessageAction):
-            self.ui.state.chat_messages.append(action.message)
+            self.ui.state.add_chat_message(action.message)
+        elif isinstance(action, ChatHistoryAction):
+            self.ui.state.add_older_chat_messages(action.messages, action.first)
 
     @override
     def draw(self, surface):
         """
         Draws the full game UI including header, canvas, toolbar, chat, players, timer, popups, and winner effects
         """
-        # Header
+        self._draw_pending_strokes()
+        self.canvas.take_dirty_rects()
+        for region in self.regions:
+            region.draw(surface)
+
+        if self.ui.state.am_i_a_winner():
+            for bubble in self.bubbles:
+                bubble.draw(surface)
+
+    @override
+    def render(self, surface: pygame.Surface) -> list[pygame.Rect]:
+        """
+        Redraws only the regions that changed since the last frame (and the parts of the canvas new strokes touched),
+        a frame where nothing changed draws nothing. the winner bubbles move all over the screen so they redraw everything
+        """
+        if self.full_redraw or self.ui.state.am_i_a_winner():
+            self.full_redraw = False
+            for region in self.regions:
+                region.changed()
+            return super().render(surface)
+
+        self._draw_pending_strokes()
+        changed = [region.rect for region in self.regions if region.changed()]
+        changed.extend(self.canvas.take_dirty_rects())
+        dirty_rects: list[pygame.Rect] = []
+        for rect in changed:
+            if not any(other.contains(rect) for other in dirty_rects):
+                dirty_rects.append(rect)
+        for rect in dirty_rects:
+            # everything under the rect is drawn again, clipped to it
+            surface.set_clip(rect)
+            surface.fill(BACKGROUND_COLOR)
+            for region in self.regions:
+                if region.rect.colliderect(rect):
+                    region.draw(surface)
+        surface.set_clip(None)
+        return dirty_rects
+
+    @override
+    def invalidate(self):
+        self.full_redraw = True
+
+    def _draw_pending_strokes(self):
+        """
+        Draws the strokes received since the last frame onto the canvas, and measures how long the timed ones took to get here.
+        the timings are taken first, every stroke they came with is queued before them and gets drawn now
+        """
+        if self.ui.state.pending_canvas is not None:
+            self._replay_canvas()
+        timings: list[tuple[DrawTimingAction, float]] = []
+        while not self.ui.state.pending_draw_timings.empty():
+            timings.append(self.ui.state.pending_draw_timings.get())
+        draw_actions: list[DrawAction] = []
+        while not self.ui.state.pending_draw_lines.empty():
+            draw_actions.append(self.ui.state.pending_draw_lines.get())
+        if draw_actions:
+            self.canvas.draw_strokes(draw_actions)
+        if timings:
+            drawn = time.monotonic()
+            offset = self.ui.client.heartbeat.offset
+            for timing, arrived in timings:
+                draw_latency.record(timing, arrived, drawn, offset)
+
+    def _draw_header(self, surface: pygame.Surface):
+        """
+        Draws the header bar with the title and the round counter
+        """
         pygame.draw.rect(
             surface, HEADER_COLOR, (0, 0, surface.get_width(), HEADER_HEIGHT)
         )
@@ -348,8 +456,11 @@ class Game(Window):
             with_shadow=False,
             background=HEADER_COLOR,
         )
-        rounds_title = FONT_LG.render(
-            f"Round {self.ui.state.round}/{self.ui.state.max_rounds}", True, BLACK
+        rounds_title = render_text(
+            FONT_LG,
+            f"Round {self.ui.state.round}/{self.ui.state.max_rounds}",
+            True,
+            BLACK,
         )
         surface.blit(
             rounds_title,
@@ -359,24 +470,55 @@ class Game(Window):
             ),
         )
 
-        while not self.ui.state.pending_draw_lines.empty():
-            draw_action: DrawAction = self.ui.state.pending_draw_lines.get()
-            self._draw_smooth_line(self.canvas.surface, draw_action)
-
+    def _draw_toolbar(self, surface: pygame.Surface):
         if self.ui.state.ready_to_draw():
             self.toolbar.draw(surface)
-        self.canvas.draw(surface)
-        self.playersList.draw(self.ui.state, surface)
-        self.word_display.draw(self.ui.state, surface)
-        self.chat.draw(surface)
-        self.timer.draw(surface)
 
+    def _draw_popup(self, surface: pygame.Surface):
         if self.popup:
             self.popup.draw(surface)
 
-        if self.ui.state.am_i_a_winner():
-            for bubble in self.bubbles:
-                bubble.draw(surface)
+    def _word_display_key(self):
+        active_player = self.ui.state.active_player()
+        return (
+            self.ui.state.current_word,
+            self.ui.state.me().is_player_turn,
+            active_player.get_player_name(self.ui.state.my_player_id)
+            if active_player
+            else None,
+        )
+
+    def _toolbar_key(self):
+        buttons = [
+            *self.toolbar.buttons,
+            self.toolbar.clear_button,
+            self.toolbar.eraser_button,
+        ]
+        return (
+            bool(self.ui.state.ready_to_draw()),
+            self.ui.state.brush_size,
+            tuple(self.ui.state.primary_color),
+            tuple(self.ui.state.secondary_color),
+            tuple(button.hover for button in buttons),
+        )
+
+    def _players_list_key(self):
+        return self.ui.state.my_player_id, tuple(
+            (p.id, p.name, p.score, p.is_player_turn)
+            for p in self.ui.state.players_info
+        )
+
+    def _popup_key(self):
+        # the popup buttons change color under the mouse
+        return id(self.popup), self.popup and pygame.mouse.get_pos()
+
+    def _replay_canvas(self):
+        """
+        Redraws the canvas from the strokes the server sent on join, in one go before the strokes that arrived after them
+        """
+        strokes, self.ui.state.pending_canvas = self.ui.state.pending_canvas, None
+        self.canvas.clear_canvas()
+        self.canvas.draw_strokes(strokes)
 
     def _on_draw(self, draw_action: DrawAction):
         """
@@ -385,6 +527,12 @@ class Game(Window):
         self.on_action(draw_action)
         self.ui.client.send_action_to_server(draw_action)
 
+    def _on_stroke_end(self):
+        """
+        Sends the end of the stroke right away instead of waiting for the batch to fill up
+        """
+        self.ui.client.flush()
+
     def _on_clear(self):
         """
         Clears the canvas and immediately sends a clear action to the server
@@ -406,25 +554,13 @@ class Game(Window):
         message = ChatMessage(self.ui.state.me().name, text, BLACK)
         self.ui.client.send_action_to_server(ChatMessageAction(message), immediate=True)
 
-    def _draw_smooth_line(self, surf: pygame.surface, draw_action: DrawAction):
+    def _on_chat_scroll_top(self, count: int):
         """
-        Draws a smooth line by interpolating points between the start and end, drawing circles at each point
+        Asks the server for the chat messages before the oldest one shown when the chat is scrolled all the way up
         """
-        distance = int(draw_action.start.distance_to(draw_action.end))
-
-        if distance == 0:
-            pygame.draw.circle(
-                surf,
-                draw_action.color,
-                (int(draw_action.start.x), int(draw_action.start.y)),
-                draw_action.brush_size,
-            )
-        else:
-            for i in range(distance):
-                point = draw_action.start.lerp(draw_action.end, i / distance)
-                pygame.draw.circle(
-                    surf,
-                    draw_action.color,
-                    (int(point.x), int(point.y)),
-                    draw_action.brush_size,
-                )
+        self.ui.client.send_action_to_server(
+            ChatHistoryRequestAction(
+                self.ui.state.request_older_chat_messages(), count
+            ),
+            immediate=True,
+        )
@@ -1,9 +1,19 @@
 import queue
+import time
+from collections import deque
 from uuid import UUID
 
 import pygame
+from shared.actions.draw_timing_action import DrawTimingAction
+from shared.actions.player_update_action import PlayerUpdateAction, PlayerUpdateKind
 from shared.chat_message import ChatMessage
 from shared.player import Player
+from shared.stroke_buffer import StrokeBuffer
+
+# chat messages kept on the client, older ones are dropped
+CHAT_HISTORY = 200
+# seconds to wait for the player list before asking for it again
+PLAYERS_RESYNC_INTERVAL = 1
 
 
 class GameState:
@@ -13,23 +23,124 @@ class GameState:
         """
         self.running = True
         self.pending_draw_lines = queue.Queue()
-        self.players_info: list[Player] = []
+        # (timing, when it arrived) of the stroke batches in pending_draw_lines, see DrawTimingAction
+        self.pending_draw_timings: queue.Queue[tuple[DrawTimingAction, float]] = (
+            queue.Queue()
+        )
+        # a whole canvas to replay, sent by the server when joining a room in the middle of a turn
+        self.pending_canvas: StrokeBuffer = None
+        # in join order, like the server's list. replaced as a whole when someone joins or leaves
+        # so the list can be read while the network thread applies updates
+        self.players: dict[UUID, Player] = {}
+        # when the whole list was last asked for after missing an update
+        self.players_resync_time: float = None
         self.my_player_id: UUID
+        self.room_id: str = None
         self.current_word: str = None
         self.brush_size: int = 5
         self.is_eraser: bool = False
         self.primary_color: pygame.Color = pygame.Color("black")
         self.secondary_color: pygame.Color = pygame.Color("white")
-        self.chat_messages: list[ChatMessage] = []
+        self.chat_messages: deque[ChatMessage] = deque(maxlen=CHAT_HISTORY)
+        # the server numbers the messages of a room, chat_count is the number the next message will get
+        # and chat_first the number of the oldest one received (the ones before it can be fetched)
+        self.chat_count = 0
+        self.chat_first = 0
+        # pages of older messages fetched while scrolling up, for the chat to add
+        self.older_chat_messages: queue.Queue[list[ChatMessage]] = queue.Queue()
+        # the message number the page asked for ends before, None while no page is on the way
+        self.chat_requested: int = None
         self.round = 0
         self.max_rounds = 0
         self.winners: list[UUID] = None
 
+    def set_chat_messages(self, messages: list[ChatMessage], first: int = 0):
+        """
+        Replaces the chat history, e.g. with the last page the server sends when joining a room
+        """
+        self.chat_first = first
+        self.chat_count = first + len(messages)
+        self.older_chat_messages = queue.Queue()
+        self.chat_requested = None
+        self.chat_messages = deque(messages, maxlen=CHAT_HISTORY)
+
+    def add_chat_message(self, message: ChatMessage):
+        """
+        Adds a message to the chat history
+        """
+        self.chat_messages.append(message)
+        self.chat_count += 1
+
+    def request_older_chat_messages(self) -> int:
+        """
+        Remembers that the page before the oldest message received was asked for and returns where it ends
+        """
+        self.chat_requested = self.chat_first
+        return self.chat_requested
+
+    def add_older_chat_messages(self, messages: list[ChatMessage], first: int):
+        """
+        Adds a page of messages from before the oldest one received.
+        an empty page (the server dropped everything older) goes to the chat too, so it stops asking
+        """
+        if self.chat_requested is None:
+            # an answer to a request sent before joining again
+            return
+        self.chat_requested = None
+        if messages:
+            self.chat_first = first
+        self.older_chat_messages.put(messages)
+
+    @property
+    def players_info(self) -> list[Player]:
+        return list(self.players.values())
+
+    def set_players(self, players: list[Player]):
+        """
+        Replaces all the players with a full list from the server
+        """
+        self.players = {p.id: p for p in players}
+        self.players_resync_time = None
+
+    def apply_player_update(self, action: PlayerUpdateAction) -> bool:
+        """
+        Applies a change to a single player. returns False if an update was missed on the way
+        (the player doesn't have the version right before it, or the number of players doesn't add up), then the whole list should be fetched again
+        """
+        player = self.players.get(action.player_id)
+        if action.kind == PlayerUpdateKind.JOINED:
+            self.players = {**self.players, action.player_id: Player(**action.changes)}
+        elif action.kind == PlayerUpdateKind.LEFT:
+            self.players = {
+                id: p for id, p in self.players.items() if id != action.player_id
+            }
+        elif player and player.version + 1 == action.version:
+            for name, value in action.changes.items():
+                setattr(player, name, value)
+            player.version = action.version
+        else:
+            return False
+        return len(self.players) == action.player_count
+
+    def should_resync_players(self) -> bool:
+        """
+        Checks if the whole player list should be asked for after a missed update,
+        once until it arrives (or until it is probably lost too)
+        """
+        now = time.monotonic()
+        if (
+            self.players_resync_time is not None
+            and now - self.players_resync_time < PLAYERS_RESYNC_INTERVAL
+        ):
+            return False
+        self.players_resync_time = now
+        return True
+
     def get_player_by_id(self, id: UUID):
         """
         Finds and returns a player by their ID, or None if not found
         """
-        return next((p for p in self.players_info if p.id == id), None)
+        return self.players.get(id)
 
     def me(self):
         """
@@ -2,7 +2,7 @@ import logging
 from typing import Callable, Tuple, override
 
 import pygame
-from client.fonts import FONT_MD
+from client.fonts import FONT_MD, render_text
 from client.game_object import GameObject
 from shared.colors import BLACK, DARK_GRAY, WHITE
 
@@ -109,8 +109,11 @@ class Button(BaseButton):
             )
 
         if self.text:
-            text_surf = FONT_MD.render(
-                self.text, True, DARK_GRAY if self.disabled else self.text_color
+            text_surf = render_text(
+                FONT_MD,
+                self.text,
+                True,
+                DARK_GRAY if self.disabled else self.text_color,
             )
             text_rect = text_surf.get_rect(center=self.surf.get_rect().center)
             self.surf.blit(text_surf, text_rect)
@@ -1,12 +1,15 @@
-from typing import Callable, Tuple, override
+from typing import Callable, Iterable, Tuple, override
 
 import pygame
 import pygame.gfxdraw
 from client.constants import LEFT_CLICK, MOUSE_BUTTONS_TUPLE
 from client.game_object import GameObject
 from client.game_state import GameState
+from client.rasterizer import draw_segments
 from shared.actions.draw_action import DrawAction
+from shared.color import Color
 from shared.colors import BLACK, WHITE
+from shared.point import Point
 
 
 class Canvas(GameObject):
@@ -18,11 +21,18 @@ class Canvas(GameObject):
         height,
         on_draw: Callable[[DrawAction], None],
         state: GameState,
+        on_stroke_end: Callable[[], None] = lambda: None,
     ):
+        """
+        on_draw gets every segment drawn, on_stroke_end is called when the pen is lifted (or leaves the canvas)
+        """
         super().__init__(x, y, width, height)
         self.on_draw = on_draw
+        self.on_stroke_end = on_stroke_end
         self.surface = pygame.Surface((width, height))
         self.surface.fill(WHITE)
+        # the parts of the canvas that changed since the window last rendered it
+        self.dirty_rects: list[pygame.Rect] = []
         self.last_pos: pygame.Vector2 = None
         self.is_drawing = False
         self.state = state
@@ -55,6 +65,8 @@ class Canvas(GameObject):
                     self.last_pos = None
             else:
                 self._set_cursor_as_default()
+                if self.is_drawing:
+                    self.on_stroke_end()
                 self.is_drawing = False
                 self.last_pos = None
 
@@ -66,6 +78,7 @@ class Canvas(GameObject):
             self._create_draw_action(event.pos, event.button)
             self.is_drawing = False
             self.last_pos = None
+            self.on_stroke_end()
 
     @override
     def draw(self, surface):
@@ -112,13 +125,33 @@ class Canvas(GameObject):
         current_pos = self._normalizeCoordinates(pos)
         if self.last_pos:
             color = self._get_drawing_color(button)
+            # the shared types go on the wire, pygame's stay in the client
             self.on_draw(
-                DrawAction(self.last_pos, current_pos, color, self.state.brush_size)
+                DrawAction(
+                    Point(*self.last_pos),
+                    Point(*current_pos),
+                    Color(*color),
+                    self.state.brush_size,
+                )
             )
         self.last_pos = current_pos
 
+    def draw_strokes(self, strokes: Iterable[DrawAction]):
+        rect = draw_segments(self.surface, strokes)
+        if rect:
+            self.dirty_rects.append(rect)
+
     def clear_canvas(self):
         self.surface.fill(WHITE)
+        self.dirty_rects.append(self.surface.get_rect())
+
+    def take_dirty_rects(self) -> list[pygame.Rect]:
+        """
+        Returns the changed parts of the canvas in screen coordinates and forgets them
+        """
+        bounds = self.surface.get_rect()
+        rects, self.dirty_rects = self.dirty_rects, []
+        return [rect.clip(bounds).move(self.x, self.y) for rect in rects]
 
     def _normalizeCoordinates(self, pos: Tuple[int, int]):
         return pygame.Vector2(pos[0] - self.x, pos[1] - self.y)
@@ -1,32 +1,65 @@
+import queue
+from collections import deque
 from typing import Callable
 
 import pygame
-from client.fonts import FONT_SM
+from client.fonts import FONT_SM, render_text
 from client.game_state import GameState
 from client.items.text_input import TextInput
-from pygame_menu import locals
-from pygame_menu._scrollarea import ScrollArea
-from shared.colors import WHITE
+from shared.chat_message import ChatMessage
+from shared.colors import BLACK, GRAY, WHITE
 from shared.constants import SYSTEM_PLAYER_ID
 
 TEXT_INPUT_HEIGHT = 30
+ROW_PADDING = 5
+# wrapped lines kept for scrolling back, older ones are dropped
+MAX_ROWS = 500
+SCROLL_STEP_ROWS = 3
+# how many older messages to ask the server for when scrolled to the top
+HISTORY_PAGE_SIZE = 50
+SCROLLBAR_WIDTH = 6
+MIN_THUMB_HEIGHT = 20
 
 
 class Chat:
+    """
+    The chat log and the guess input.
+    messages are wrapped into rows kept in a bounded ring, and only the rows inside the viewport are ever rendered:
+    the viewport surface is scrolled in place and just the rows that scrolled into view (or were added to it) are drawn.
+    scrolling to the top calls on_scroll_top to fetch older messages, until the ring is full
+    """
+
     def __init__(
-        self, rect: pygame.Rect, state: GameState, on_enter: Callable[[str], None]
+        self,
+        rect: pygame.Rect,
+        state: GameState,
+        on_enter: Callable[[str], None],
+        on_scroll_top: Callable[[int], None],
     ):
         self.state = state
-        self.area = ScrollArea(
-            rect.width,
-            rect.height - TEXT_INPUT_HEIGHT,
-            area_color=WHITE,
-            border_width=1,
-            scrollbars=(locals.POSITION_SOUTH, locals.POSITION_EAST),
+        self.rect = rect
+        self.view_rect = pygame.Rect(
+            rect.x, rect.y, rect.width, rect.height - TEXT_INPUT_HEIGHT
         )
-        self.inner_surface = pygame.Surface((1000, 1000))
-        self.area.set_world(self.inner_surface)
-        self.area.set_position(rect.x, rect.y)
+        self.view = pygame.Surface(self.view_rect.size)
+        self.row_height = FONT_SM.get_height() + ROW_PADDING
+        self.rows: deque[tuple[str, tuple]] = deque(maxlen=MAX_ROWS)
+        # rows ever added, rows[0] is row number total_rows - len(rows)
+        self.total_rows = 0
+        # the message list the rows were built from and how many of its messages were added
+        self.source: deque[ChatMessage] = None
+        self.seen = 0
+        self.on_scroll_top = on_scroll_top
+        # waiting for a page of older messages, or no more older messages fit
+        self.fetching = False
+        self.history_full = False
+        # the y of the viewport's top in the whole log, and whether it sticks to the newest row
+        self.top = 0
+        self.follow = True
+        # what the view surface currently shows
+        self.view_top: int = None
+        self.view_rows = 0
+        self.drag_offset: int = None
         self.text_input = TextInput(
             rect.x,
             rect.bottom - TEXT_INPUT_HEIGHT,
@@ -37,36 +70,229 @@ class Chat:
             placeholder="Type your guess here...",
         )
 
+    @property
+    def first_row(self) -> int:
+        return self.total_rows - len(self.rows)
+
     def handle_event(self, event: pygame.event.Event):
-        self.area.update([event])
+        if event.type == pygame.MOUSEWHEEL:
+            if self.view_rect.collidepoint(pygame.mouse.get_pos()):
+                self._scroll_to(self.top - event.y * SCROLL_STEP_ROWS * self.row_height)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            thumb = self._thumb_rect()
+            if thumb and thumb.inflate(6, 0).collidepoint(event.pos):
+                self.drag_offset = event.pos[1] - thumb.y
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            self.drag_offset = None
+        elif event.type == pygame.MOUSEMOTION and self.drag_offset is not None:
+            self._drag_thumb_to(event.pos[1] - self.drag_offset)
         self.text_input.handle_event(event)
 
+    def state_key(self):
+        """
+        A snapshot of everything the chat shows, it only has to be redrawn when this changes
+        """
+        text_input = self.text_input
+        return (
+            id(self.source),
+            self.first_row,
+            self.total_rows,
+            self.top,
+            self._is_input_shown(),
+            text_input.text,
+            text_input.active,
+            text_input.active and text_input.cursor_visible(),
+        )
+
     def update(self):
-        if self.inner_surface.get_height() < len(self.state.chat_messages) * (
-            FONT_SM.get_height() + 5
-        ):
-            self.inner_surface = pygame.Surface(
-                (self.inner_surface.get_width(), self.inner_surface.get_height() * 2)
-            )
-            self.area.set_world(self.inner_surface)
+        """
+        Wraps the messages that arrived since the last frame into rows, and asks for older ones when scrolled to the top
+        """
+        messages = self.state.chat_messages
+        if messages is not self.source:
+            # a new message list (e.g. joined a room), start over
+            self.source = messages
+            self.seen = 0
+            self.rows.clear()
+            self.total_rows = 0
+            self.top = 0
+            self.follow = True
+            self.view_top = None
+            self.view_rows = 0
+            self.fetching = False
+            self.history_full = False
 
-    def draw(self, surface: pygame.Surface):
-        self.inner_surface.fill(WHITE)
-        for i, chat_msg in enumerate(self.state.chat_messages):
-            text = (
-                chat_msg.text
-                if chat_msg.player_name == SYSTEM_PLAYER_ID
-                else f"{chat_msg.player_name}: {chat_msg.text}"
-            )
-            text_surf = FONT_SM.render(text, True, chat_msg.color)
-            self.inner_surface.blit(text_surf, (5, i * (FONT_SM.get_height() + 5)))
-        self.area.draw(surface)
+        new = self.state.chat_count - self.seen
+        if new > 0:
+            for message in list(messages)[-new:]:
+                for row in self._wrap(message):
+                    self.rows.append((row, message.color))
+                    self.total_rows += 1
+            self.seen = self.state.chat_count
+
+        try:
+            while True:
+                self._add_older(self.state.older_chat_messages.get_nowait())
+        except queue.Empty:
+            pass
+
+        if self.follow:
+            self.top = self._max_top()
         if (
-            self.state.active_player()
-            and self.state.active_player().id != self.state.my_player_id
+            not self.fetching
+            and not self.history_full
+            and self.state.chat_first > 0
+            and self.top <= self._min_top()
         ):
+            self.fetching = True
+            self.on_scroll_top(HISTORY_PAGE_SIZE)
+
+    def _add_older(self, messages: list[ChatMessage]):
+        """
+        Adds the rows of a page of older messages above the oldest row, as many as the ring still has room for
+        """
+        self.fetching = False
+        rows = [
+            (row, message.color) for message in messages for row in self._wrap(message)
+        ]
+        room = MAX_ROWS - len(self.rows)
+        if not messages or len(rows) >= room:
+            self.history_full = True
+            rows = rows[len(rows) - room :]
+        # rows keep their numbers, the new ones are numbered below the oldest one
+        self.rows.extendleft(reversed(rows))
+
+    def draw(self, surface: pygame.Surface):
+        self._compose()
+        surface.blit(self.view, self.view_rect)
+        pygame.draw.rect(surface, BLACK, self.view_rect, 1)
+        thumb = self._thumb_rect()
+        if thumb:
+            pygame.draw.rect(surface, GRAY, thumb, border_radius=3)
+        if self._is_input_shown():
             self.text_input.draw(surface)
 
+    def _compose(self):
+        """
+        Brings the view surface up to date with the scroll position and the rows, drawing only what it doesn't show yet
+        """
+        self.top = min(max(self.top, self._min_top()), self._max_top())
+        height = self.view_rect.height
+        if self.view_top is None or abs(self.top - self.view_top) >= height:
+            self._draw_rows(self.view.get_rect())
+        elif self.top != self.view_top:
+            delta = self.top - self.view_top
+            self.view.scroll(0, -delta)
+            if delta > 0:
+                self._draw_rows(
+                    pygame.Rect(0, height - delta, self.view_rect.width, delta)
+                )
+            else:
+                self._draw_rows(pygame.Rect(0, 0, self.view_rect.width, -delta))
+        self.view_top = self.top
+
+        if self.view_rows < self.total_rows:
+            # rows added inside the viewport without scrolling it
+            added = pygame.Rect(
+                0,
+                self.view_rows * self.row_height - self.top,
+                self.view_rect.width,
+                (self.total_rows - self.view_rows) * self.row_height,
+            ).clip(self.view.get_rect())
+            if added:
+                self._draw_rows(added)
+        self.view_rows = self.total_rows
+
+    def _draw_rows(self, band: pygame.Rect):
+        """
+        Draws the rows that fall inside a horizontal band of the view surface
+        """
+        self.view.set_clip(band)
+        self.view.fill(WHITE)
+        first = max((self.top + band.top) // self.row_height, self.first_row)
+        last = min((self.top + band.bottom - 1) // self.row_height, self.total_rows - 1)
+        for row in range(first, last + 1):
+            text, color = self.rows[row - self.first_row]
+            self.view.blit(
+                render_text(FONT_SM, text, True, color),
+                (5, row * self.row_height - self.top),
+            )
+        self.view.set_clip(None)
+
+    def _wrap(self, message: ChatMessage) -> list[str]:
+        """
+        Splits a message into rows that fit the width of the chat
+        """
+        text = (
+            message.text
+            if message.player_name == SYSTEM_PLAYER_ID
+            else f"{message.player_name}: {message.text}"
+        )
+        max_width = self.view_rect.width - 10 - SCROLLBAR_WIDTH
+        rows = []
+        row = ""
+        for word in text.split(" "):
+            candidate = f"{row} {word}" if row else word
+            if FONT_SM.size(candidate)[0] <= max_width:
+                row = candidate
+                continue
+            if row:
+                rows.append(row)
+            # a word longer than a whole row is broken wherever it has to
+            while FONT_SM.size(word)[0] > max_width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and FONT_SM.size(word[:cut])[0] > max_width:
+                    cut -= 1
+                rows.append(word[:cut])
+                word = word[cut:]
+            row = word
+        rows.append(row)
+        return rows
+
+    def _min_top(self) -> int:
+        return self.first_row * self.row_height
+
+    def _max_top(self) -> int:
+        return max(
+            self._min_top(),
+            self.total_rows * self.row_height - self.view_rect.height,
+        )
+
+    def _scroll_to(self, top: int):
+        self.top = min(max(top, self._min_top()), self._max_top())
+        self.follow = self.top >= self._max_top()
+
+    def _thumb_rect(self) -> pygame.Rect | None:
+        """
+        The scrollbar thumb, there is none while all of the rows fit
+        """
+        content = len(self.rows) * self.row_height
+        height = self.view_rect.height
+        if content <= height:
+            return None
+        thumb_height = max(MIN_THUMB_HEIGHT, height * height // content)
+        scrolled = (self.top - self._min_top()) / (self._max_top() - self._min_top())
+        return pygame.Rect(
+            self.view_rect.right - SCROLLBAR_WIDTH - 2,
+            self.view_rect.y + round(scrolled * (height - thumb_height)),
+            SCROLLBAR_WIDTH,
+            thumb_height,
+        )
+
+    def _drag_thumb_to(self, thumb_y: int):
+        thumb = self._thumb_rect()
+        if not thumb:
+            return
+        track = self.view_rect.height - thumb.height
+        scrolled = min(max((thumb_y - self.view_rect.y) / track, 0), 1)
+        self._scroll_to(
+            self._min_top() + round(scrolled * (self._max_top() - self._min_top()))
+        )
+
+    def _is_input_shown(self) -> bool:
+        active_player = self.state.active_player()
+        return bool(active_player and active_player.id != self.state.my_player_id)
+
     def _on_text_input_enter(self, text: str, on_enter: Callable[[str], None]):
         self.text_input.clear()
         on_enter(text)
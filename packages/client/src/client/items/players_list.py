@@ -1,5 +1,5 @@
 import pygame
-from client.fonts import FONT_MD, FONT_SM
+from client.fonts import FONT_MD, FONT_SM, render_text
 from client.game_state import GameState
 from pygame_emojis import load_emoji
 from shared.colors import BLACK, DARK_BLUE, DARK_GRAY, GOLD, LIGHT_GRAY, WHITE
@@ -23,7 +23,7 @@ class PlayersList:
         )
 
         # Draw header
-        header_surf = FONT_MD.render("Players", True, BLACK)
+        header_surf = render_text(FONT_MD, "Players", True, BLACK)
         header_rect = header_surf.get_rect(
             center=(self.player_list_rect.centerx, self.player_list_rect.top + 30)
         )
@@ -57,8 +57,8 @@ class PlayersList:
                 text_start = player_rect.x + 10
 
                 # Player name
-                name_surf = FONT_SM.render(
-                    player.get_player_name(gameState.my_player_id), True, BLACK
+                name_surf = render_text(
+                    FONT_SM, player.get_player_name(gameState.my_player_id), True, BLACK
                 )
                 surface.blit(
                     name_surf,
@@ -69,7 +69,9 @@ class PlayersList:
                 )
 
                 # Player score
-                score_text = FONT_SM.render(f"{player.score} pts", True, DARK_BLUE)
+                score_text = render_text(
+                    FONT_SM, f"{player.score} pts", True, DARK_BLUE
+                )
                 surface.blit(
                     score_text,
                     (
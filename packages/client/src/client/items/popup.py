@@ -1,7 +1,7 @@
 from typing import Callable
 
 import pygame
-from client.fonts import FONT_LG, FONT_MD
+from client.fonts import FONT_LG, FONT_MD, render_text
 from shared.colors import BLACK, DARK_GRAY, LIGHT_BLUE, WHITE
 
 
@@ -26,7 +26,7 @@ class Popup:
         )
         self.closable = closable
         self.on_close = on_close
-        self.close_surf = FONT_MD.render("X", True, BLACK)
+        self.close_surf = render_text(FONT_MD, "X", True, BLACK)
         self.close_rect = self.close_surf.get_rect(
             topright=(self.popup_rect.right - 20, self.popup_rect.top + 20)
         )
@@ -50,7 +50,7 @@ class Popup:
         pygame.draw.rect(overlay, BLACK, self.popup_rect, 2, border_radius=15)
 
         # Title
-        title_surf = FONT_LG.render(self.title, True, BLACK)
+        title_surf = render_text(FONT_LG, self.title, True, BLACK)
         title_rect = title_surf.get_rect(
             center=(self.popup_rect.centerx, self.popup_rect.top + 40)
         )
@@ -67,7 +67,7 @@ class Popup:
 
         # Content lines
         for i, line in enumerate(self.lines):
-            line_surf = FONT_MD.render(line, True, BLACK)
+            line_surf = render_text(FONT_MD, line, True, BLACK)
             line_rect = line_surf.get_rect(
                 left=self.popup_rect.left + 50, top=self.popup_rect.top + 120 + i * 30
             )
@@ -1,9 +1,11 @@
 from typing import Callable
 
 import pygame
-from client.fonts import FONT_MD
+from client.fonts import FONT_MD, render_text
 from shared.colors import BLACK, DARK_GRAY, LIGHT_BLUE, WHITE
 
+CURSOR_BLINK_MS = 500
+
 
 class TextInput:
     """Text input field for player name"""
@@ -23,8 +25,6 @@ class TextInput:
         self.text = ""
         self.active = False
         self.placeholder = placeholder
-        self.cursor_visible = True
-        self.cursor_timer = 0
         self.max_length = max_length
         self.on_input = on_input
         self.on_enter = on_enter
@@ -43,9 +43,9 @@ class TextInput:
 
         # Render text or placeholder
         if self.text:
-            text_surf = FONT_MD.render(self.text, True, BLACK)
+            text_surf = render_text(FONT_MD, self.text, True, BLACK)
         else:
-            text_surf = FONT_MD.render(self.placeholder, True, DARK_GRAY)
+            text_surf = render_text(FONT_MD, self.placeholder, True, DARK_GRAY)
 
         # Position the text
         text_rect = text_surf.get_rect(midleft=(self.rect.left + 10, self.rect.centery))
@@ -53,13 +53,7 @@ class TextInput:
 
         # Draw cursor when active
         if self.active:
-            # Update cursor blink timer
-            self.cursor_timer += 1
-            if self.cursor_timer >= 30:  # Toggle every 30 frames
-                self.cursor_visible = not self.cursor_visible
-                self.cursor_timer = 0
-
-            if self.cursor_visible:
+            if self.cursor_visible():
                 if self.text:
                     cursor_x = text_rect.right + 2
                 else:
@@ -74,6 +68,10 @@ class TextInput:
                     2,
                 )
 
+    def cursor_visible(self) -> bool:
+        # Toggle every half a second, by the clock so it blinks the same however often it is drawn
+        return pygame.time.get_ticks() // CURSOR_BLINK_MS % 2 == 0
+
     def handle_event(self, event: pygame.event.Event):
         if event.type == pygame.MOUSEBUTTONDOWN:
             self.active = self.rect.collidepoint(event.pos)
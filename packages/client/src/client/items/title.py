@@ -1,5 +1,5 @@
 import pygame
-from client.fonts import FONT_TITLE
+from client.fonts import FONT_TITLE, render_text
 from shared.colors import (
     DARK_GRAY,
     GREEN,
@@ -31,9 +31,9 @@ class Title:
 
         for i, char in enumerate(text):
             color = colors[i % len(colors)]
-            char_surf = FONT_TITLE.render(char, True, color, background)
+            char_surf = render_text(FONT_TITLE, char, True, color, background)
             if with_shadow:
-                shadow_surf = FONT_TITLE.render(char, True, DARK_GRAY)
+                shadow_surf = render_text(FONT_TITLE, char, True, DARK_GRAY)
                 surface.blit(
                     shadow_surf, (start_x + 5, y - shadow_surf.get_height() // 2 + 5)
                 )
@@ -6,7 +6,7 @@ from shared.actions.start_game_action import StartGameAction
 from shared.colors import BLACK, DARK_BLUE, GREEN, ORANGE, PINK, RED, YELLOW
 from shared.utils import debounce
 
-from client.fonts import FONT_LG, FONT_MD
+from client.fonts import FONT_LG, FONT_MD, render_text
 from client.items.bubble import Bubble
 from client.items.button import Button
 from client.items.players_list import PlayersList
@@ -164,14 +164,14 @@ class Menu(Window):
 
         # Draw subtitle
         subtitle = "Draw, Guess & Have Fun!"
-        subtitle_surf = FONT_LG.render(subtitle, True, DARK_BLUE)
+        subtitle_surf = render_text(FONT_LG, subtitle, True, DARK_BLUE)
         subtitle_rect = subtitle_surf.get_rect(
             center=(self.ui.screen.get_width() // 2, 150 + self.logo_y_offset)
         )
         surface.blit(subtitle_surf, subtitle_rect)
 
         # Draw name input label
-        name_label = FONT_MD.render("Enter Your Name:", True, BLACK)
+        name_label = render_text(FONT_MD, "Enter Your Name:", True, BLACK)
         name_label_rect = name_label.get_rect(
             center=(
                 self.ui.screen.get_width() // 2,
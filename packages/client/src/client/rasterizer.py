@@ -0,0 +1,58 @@
+import math
+from typing import Iterable
+
+import pygame
+from shared.actions.draw_action import DrawAction
+
+
+def draw_segments(
+    surface: pygame.Surface, segments: Iterable[DrawAction]
+) -> pygame.Rect | None:
+    """
+    Draws a batch of strokes onto the surface as round capped thick lines (capsules),
+    a few draw calls per segment instead of a circle for every pixel of its length.
+    returns the area that was drawn on, or None if there was nothing to draw
+    """
+    dirty: pygame.Rect = None
+    surface.lock()
+    try:
+        for segment in segments:
+            rect = draw_segment(surface, segment)
+            dirty = dirty.union(rect) if dirty else rect
+    finally:
+        surface.unlock()
+    return dirty
+
+
+def draw_segment(surface: pygame.Surface, segment: DrawAction) -> pygame.Rect:
+    """
+    Draws a single stroke as a capsule: a circle at each end joined by a quad as wide as the brush.
+    the points are truncated to whole pixels like the circles of the stroke always were
+    """
+    color = tuple(segment.color)
+    radius = segment.brush_size
+    x0, y0 = int(segment.start.x), int(segment.start.y)
+    x1, y1 = int(segment.end.x), int(segment.end.y)
+
+    rect = pygame.draw.circle(surface, color, (x0, y0), radius)
+    if (x0, y0) == (x1, y1):
+        return rect
+    rect.union_ip(pygame.draw.circle(surface, color, (x1, y1), radius))
+
+    length = math.hypot(x1 - x0, y1 - y0)
+    # half the brush width along the normal of the segment
+    nx = -(y1 - y0) / length * radius
+    ny = (x1 - x0) / length * radius
+    rect.union_ip(
+        pygame.draw.polygon(
+            surface,
+            color,
+            (
+                (x0 + nx, y0 + ny),
+                (x1 + nx, y1 + ny),
+                (x1 - nx, y1 - ny),
+                (x0 - nx, y0 - ny),
+            ),
+        )
+    )
+    return rect
@@ -1,6 +1,10 @@
+from typing import Callable, Hashable
+
 import pygame
 from shared.actions import Action
 
+from client.constants import BACKGROUND_COLOR
+
 
 class Window:
     def handle_event(self, event: pygame.event.Event) -> None:
@@ -21,8 +25,52 @@ class Window:
         """
         pass
 
+    def render(self, surface: pygame.Surface) -> list[pygame.Rect]:
+        """
+        draws the window and returns the parts of the surface that changed, only those are updated on the display.
+        by default the whole window is redrawn on every frame
+        """
+        surface.fill(BACKGROUND_COLOR)
+        self.draw(surface)
+        return [surface.get_rect()]
+
+    def invalidate(self) -> None:
+        """
+        makes the next render redraw the whole window, e.g. when it is shown
+        """
+        pass
+
     def on_action(self, action: Action) -> None:
         """
         when the server sends an action to the client, we can process it here
         """
         pass
+
+
+class Region:
+    """
+    A part of a window that is only redrawn when it changes.
+    key returns a snapshot of whatever the region shows, the region is dirty when the snapshot differs from the last frame's
+    """
+
+    def __init__(
+        self,
+        rect: pygame.Rect,
+        draw: Callable[[pygame.Surface], None],
+        key: Callable[[], Hashable] = lambda: None,
+    ):
+        self.rect = rect
+        self.draw = draw
+        self.key = key
+        self.last_key = None
+        self.dirty = True
+
+    def changed(self) -> bool:
+        """
+        Checks the region for changes since the last call
+        """
+        key = self.key()
+        changed = self.dirty or key != self.last_key
+        self.last_key = key
+        self.dirty = False
+        return changed
@@ -1,27 +1,131 @@
+import argparse
+import asyncio
 import logging
-import socket
 
-from shared.config import SERVER_PORT
+from shared.config import SERVER_PORT, SERVER_SOCKET_PATH
+from shared.heartbeat import IDLE_TIMEOUT, PING_INTERVAL
+from shared.transport import TcpTransport, Transport, UnixTransport
 
-from server.room import Room
+from server import async_server
+from server.chat_history import DEFAULT_CHAT_HISTORY
+from server.lobby import DEFAULT_RESUME_GRACE, Lobby
+from server.metrics import METRICS_HOST, serve_metrics
+from server.outbound_queue import DEFAULT_MAX_DEPTH, OverflowPolicy
+from server.strokes import DEFAULT_DRAW_TICK_HZ
 
-global_room = Room()
+SERVER_MODES = ("asyncio", "threaded")
+TRANSPORTS = ("tcp", "unix")
 
 
-def main():
+def main(argv: list[str] = None, transport: Transport = None):
     """
-    Initializes a TCP server, binds it to a specified host and port, listens for client connections, and accepts incoming clients, adding them to the global room
+    Parses the command line and starts the server in the selected mode, adding every client to the lobby.
+    the clients connect through the transport from the command line, or the given one (e.g. a MemoryTransport in a test)
     """
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    host = "0.0.0.0"
-    port = SERVER_PORT
-    MAX_CLIENTS = 10
+    parser = argparse.ArgumentParser(prog="server")
+    parser.add_argument(
+        "--mode",
+        choices=SERVER_MODES,
+        default="asyncio",
+        help="asyncio serves every client from one event loop, threaded starts an OS thread per client",
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default="tcp",
+        help="tcp listens on host:port, unix on a unix domain socket at socket-path (for clients on the same machine)",
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--socket-path", default=SERVER_SOCKET_PATH)
+    parser.add_argument(
+        "--queue-depth",
+        type=int,
+        default=DEFAULT_MAX_DEPTH,
+        help="how many frames may wait to be written to a single client",
+    )
+    parser.add_argument(
+        "--overflow",
+        choices=[policy.value for policy in OverflowPolicy],
+        default=OverflowPolicy.DISCONNECT.value,
+        help="what to do with a frame for a client whose queue is full",
+    )
+    parser.add_argument(
+        "--draw-tick-hz",
+        type=float,
+        default=DEFAULT_DRAW_TICK_HZ,
+        help="how many times a second the strokes of a room are sent out, 0 forwards every batch right away",
+    )
+    parser.add_argument(
+        "--chat-history",
+        type=int,
+        default=DEFAULT_CHAT_HISTORY,
+        help="how many chat messages every room keeps, players can scroll back through them",
+    )
+    parser.add_argument(
+        "--resume-grace",
+        type=float,
+        default=DEFAULT_RESUME_GRACE,
+        help="seconds a player whose connection dropped keeps their place in the room, 0 removes them right away",
+    )
+    parser.add_argument(
+        "--ping-interval",
+        type=float,
+        default=PING_INTERVAL,
+        help="seconds between the pings sent to every client, 0 turns off pings and evicting silent clients",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=IDLE_TIMEOUT,
+        help="seconds a client may stay silent (not even answering pings) before it is evicted",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=0,
+        help="serves Prometheus metrics at http://<metrics-host>:<port>/metrics, off by default",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default=METRICS_HOST,
+        help="the address the metrics endpoint listens on, only localhost by default",
+    )
+    args = parser.parse_args(argv)
 
-    server_socket.bind((host, port))
-    server_socket.listen(MAX_CLIENTS)
+    lobby = Lobby(
+        args.queue_depth,
+        OverflowPolicy(args.overflow),
+        args.draw_tick_hz,
+        chat_history=args.chat_history,
+        resume_grace=args.resume_grace,
+        ping_interval=args.ping_interval,
+        idle_timeout=args.idle_timeout,
+    )
 
-    logging.info("Server started!")
+    if args.metrics_port:
+        serve_metrics(lobby, args.metrics_port, args.metrics_host)
+
+    if not transport:
+        if args.transport == "unix":
+            transport = UnixTransport(args.socket_path)
+        else:
+            transport = TcpTransport(args.host, args.port)
+
+    if args.mode == "asyncio":
+        asyncio.run(async_server.serve(lobby, transport))
+    else:
+        serve_threaded(lobby, transport)
+
+
+def serve_threaded(lobby: Lobby, transport: Transport):
+    """
+    Listens on the transport and accepts incoming clients, adding them to the lobby
+    """
+    listener = transport.listen()
+
+    logging.info("Server started on %s! (threaded mode)", transport)
     logging.info("Waiting for clients...")
     while True:
-        c, addr = server_socket.accept()
-        global_room.add_client(c, addr)
+        c, addr = listener.accept()
+        lobby.add_client(c, addr)
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import socket
+
+from shared.protocol import HEADER_SIZE, ActionProtocol
+from shared.transport import Transport
+
+from server.connection import StreamConnection
+from server.lobby import Lobby
+from server.metrics import BYTES_RECEIVED
+
+
+async def serve(lobby: Lobby, transport: Transport, backlog: int = socket.SOMAXCONN):
+    """
+    Runs the asyncio server mode: every client gets a task on a single event loop instead of an OS thread,
+    and all of the lobby's and rooms' handlers run on that loop, including the scheduled ones
+    """
+    lobby.scheduler.dispatch = asyncio.get_running_loop().call_soon_threadsafe
+    logging.info("Server started on %s! (asyncio mode)", transport)
+    logging.info("Waiting for clients...")
+    await transport.serve(
+        lambda reader, writer, addr: _client_task_main(lobby, reader, writer, addr),
+        backlog,
+    )
+
+
+async def _client_task_main(
+    lobby: Lobby, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, addr: str
+):
+    """
+    Handles communication with a connected client, the task version of Lobby._client_thread_main
+    """
+    conn = StreamConnection(writer, lobby.queue_depth, lobby.overflow_policy, addr)
+    lobby.connect(conn)
+    try:
+        while True:
+            payload = await ActionProtocol.recv_frame_async(reader)
+            if payload is not None:
+                BYTES_RECEIVED.inc(amount=HEADER_SIZE + len(payload))
+            actions = ActionProtocol.decode_payload(payload)
+            if not actions:
+                break
+            lobby.handle_batch(actions, conn)
+    except (ConnectionResetError, BrokenPipeError):
+        logging.exception("Client forcibly closed the connection")
+    except OSError:
+        logging.exception("Error handling client %s", conn.addr)
+    finally:
+        logging.info("Connection closed from %s", conn.addr)
+        lobby.remove_client(conn)
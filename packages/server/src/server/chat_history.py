@@ -0,0 +1,48 @@
+from collections import deque
+from itertools import islice
+
+from shared.chat_message import ChatMessage
+
+DEFAULT_CHAT_HISTORY = 500
+# how many messages a player gets when joining, and at most per ChatHistoryRequestAction
+CHAT_PAGE_SIZE = 50
+
+
+class ChatHistory:
+    """
+    The chat of a room, only the newest max_size messages are kept.
+    messages are numbered from the first one sent in the room, so players can ask for the page before the oldest one they have
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CHAT_HISTORY):
+        self.messages: deque[ChatMessage] = deque(maxlen=max_size)
+        # how many messages were ever added, the next message gets this number
+        self.count = 0
+
+    @property
+    def first(self) -> int:
+        """
+        The number of the oldest message still kept
+        """
+        return self.count - len(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def append(self, message: ChatMessage):
+        self.messages.append(message)
+        self.count += 1
+
+    def page(
+        self, before: int, size: int = CHAT_PAGE_SIZE
+    ) -> tuple[int, list[ChatMessage]]:
+        """
+        Returns up to size messages right before the message numbered before (oldest first) and the number of the first of them.
+        the page is empty if the messages before it were already dropped
+        """
+        end = min(max(before, self.first), self.count)
+        start = max(end - min(size, CHAT_PAGE_SIZE), self.first)
+        return start, list(islice(self.messages, start - self.first, end - self.first))
+
+    def last_page(self) -> tuple[int, list[ChatMessage]]:
+        return self.page(self.count)
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import socket
+import threading
+from typing import Hashable
+
+from shared.heartbeat import Heartbeat
+
+from server.metrics import BYTES_SENT, OUTBOUND_OVERFLOW
+from server.outbound_queue import DEFAULT_MAX_DEPTH, OutboundQueue, OverflowPolicy
+
+
+class Connection:
+    """
+    A connected client as the room sees it: something frames can be written to and that can be closed.
+    the room and the round manager only talk to clients through this interface so they don't care which server mode is running.
+    frames are never written by the caller, they wait in a bounded outbound queue that the connection drains on its own,
+    so a slow client can't stall the room
+    """
+
+    addr = None
+    queue: OutboundQueue
+    # the token a client presents to get its player back after reconnecting, only sessions have one (see Session)
+    resume_token: str = None
+    # set by the lobby for network connections, its reaper pings the client and evicts it once it goes silent
+    heartbeat: Heartbeat = None
+
+    def send_frame(self, frame: bytes, key: Hashable = None) -> None:
+        """
+        queues a frame built by ActionProtocol.encode_frame for the client.
+        frames with the same key hold snapshots of the same state, the COALESCE policy keeps only the newest one
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        writes whatever is still queued and closes the connection,
+        the client's reading loop then ends and removes it from the room
+        """
+        pass
+
+    def abort(self) -> None:
+        """
+        drops whatever is still queued and the connection right away, e.g. for a client that stopped answering
+        """
+        pass
+
+    def stats(self) -> dict:
+        """
+        the outbound queue numbers and the heartbeat of the client, for monitoring
+        """
+        heartbeat = self.heartbeat
+        return {
+            "addr": self.addr,
+            "queue_depth": len(self.queue),
+            "dropped": self.queue.dropped,
+            "coalesced": self.queue.coalesced,
+            "rtt_ms": heartbeat.rtt * 1000
+            if heartbeat and heartbeat.rtt is not None
+            else None,
+            "idle_s": heartbeat.idle() if heartbeat else None,
+            "clock_offset_ms": heartbeat.offset * 1000
+            if heartbeat and heartbeat.offset is not None
+            else None,
+        }
+
+    def _push(self, frame: bytes, key: Hashable) -> bool:
+        """
+        Queues a frame and logs when the overflow policy kicks in, returns False if the client should be disconnected
+        """
+        dropped, coalesced = self.queue.dropped, self.queue.coalesced
+        if not self.queue.push(frame, key):
+            OUTBOUND_OVERFLOW.inc("disconnected")
+            logging.warning(
+                "Outbound queue of %s is full (%d frames), disconnecting",
+                self.addr,
+                len(self.queue),
+            )
+            return False
+        if self.queue.coalesced != coalesced:
+            OUTBOUND_OVERFLOW.inc("coalesced")
+        if self.queue.dropped != dropped:
+            OUTBOUND_OVERFLOW.inc("dropped")
+        if self.queue.dropped != dropped and self.queue.dropped % 100 == 1:
+            logging.warning(
+                "Outbound queue of %s is full, %d frames dropped so far",
+                self.addr,
+                self.queue.dropped,
+            )
+        return True
+
+
+class SocketConnection(Connection):
+    """
+    A blocking socket (the threaded server mode), its queue is drained by a writer thread of its own
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        addr,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+        policy: OverflowPolicy = OverflowPolicy.DISCONNECT,
+    ):
+        self.sock = sock
+        self.addr = addr
+        self.queue = OutboundQueue(max_depth, policy)
+        self.condition = threading.Condition()
+        self.closing = False
+        # must be last
+        self.writer = threading.Thread(target=self._writer_thread_main, daemon=True)
+        self.writer.start()
+
+    def send_frame(self, frame: bytes, key: Hashable = None):
+        if not frame:
+            return
+        with self.condition:
+            if self.closing:
+                return
+            if not self._push(frame, key):
+                self._abort()
+                return
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+
+    def abort(self):
+        with self.condition:
+            self._abort()
+
+    def _abort(self):
+        """
+        Drops the queue and shuts the socket down right away, which also wakes up the reading thread
+        """
+        self.closing = True
+        self.queue.frames.clear()
+        self.condition.notify()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _writer_thread_main(self):
+        """
+        Writes the queued frames until the connection is closed and nothing is left to write
+        """
+        while True:
+            with self.condition:
+                while not self.queue and not self.closing:
+                    self.condition.wait()
+                if not self.queue:
+                    break
+                data = self.queue.drain()
+            try:
+                self.sock.sendall(data)
+                BYTES_SENT.inc(amount=len(data))
+            except OSError:
+                logging.warning("Failed sending to %s", self.addr)
+                with self.condition:
+                    self._abort()
+                break
+
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class StreamConnection(Connection):
+    """
+    An asyncio stream (the asyncio server mode), its queue is drained by a writer task on the event loop.
+    calls made from other threads (e.g. timers) are handed over to the loop
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+        policy: OverflowPolicy = OverflowPolicy.DISCONNECT,
+        addr: str = None,
+    ):
+        self.writer = writer
+        self.addr = addr or writer.get_extra_info("peername")
+        self.queue = OutboundQueue(max_depth, policy)
+        self.closing = False
+        self.wakeup = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.writer_task = self.loop.create_task(self._writer_task_main())
+
+    def send_frame(self, frame: bytes, key: Hashable = None):
+        if frame:
+            self._call_on_loop(self._enqueue, frame, key)
+
+    def close(self):
+        self._call_on_loop(self._close)
+
+    def abort(self):
+        self._call_on_loop(self._abort)
+
+    def _enqueue(self, frame: bytes, key: Hashable):
+        if self.closing:
+            return
+        if not self._push(frame, key):
+            self._abort()
+            return
+        self.wakeup.set()
+
+    def _abort(self):
+        self.closing = True
+        self.queue.frames.clear()
+        self.writer.transport.abort()
+        self.wakeup.set()
+
+    def _close(self):
+        self.closing = True
+        self.wakeup.set()
+
+    async def _writer_task_main(self):
+        """
+        Writes the queued frames until the connection is closed and nothing is left to write
+        """
+        try:
+            while True:
+                if not self.queue:
+                    if self.closing:
+                        break
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                    continue
+                data = self.queue.drain()
+                self.writer.write(data)
+                BYTES_SENT.inc(amount=len(data))
+                await self.writer.drain()
+        except OSError:
+            logging.warning("Failed sending to %s", self.addr)
+        finally:
+            self.writer.close()
+
+    def _call_on_loop(self, func, *args):
+        if threading.get_ident() == self.loop_thread:
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
@@ -0,0 +1,355 @@
+import logging
+import secrets
+import socket
+import threading
+import time
+from itertools import groupby
+from typing import Callable, Mapping
+
+from shared.actions import Action
+from shared.actions.create_room_action import CreateRoomAction
+from shared.actions.join_room_action import JoinRoomAction
+from shared.actions.leave_action import LeaveAction
+from shared.actions.list_rooms_action import ListRoomsAction
+from shared.actions.resume_action import ResumeAction
+from shared.actions.room_list_action import RoomListAction
+from shared.heartbeat import IDLE_TIMEOUT, PING_INTERVAL, Heartbeat
+from shared.protocol import HEADER_SIZE, ActionProtocol, FrameReader
+from shared.room_info import RoomInfo
+
+from server.chat_history import DEFAULT_CHAT_HISTORY
+from server.connection import Connection, SocketConnection
+from server.metrics import (
+    ACTIONS_RECEIVED,
+    BYTES_RECEIVED,
+    HANDLER_SECONDS,
+    RTT_SECONDS,
+    count_sent,
+)
+from server.outbound_queue import DEFAULT_MAX_DEPTH, OverflowPolicy
+from server.room import Room
+from server.scheduler import Scheduler, TimerHandle
+from server.session import Session
+from server.strokes import DEFAULT_DRAW_TICK_HZ
+
+DEFAULT_ROOM_ID = "main"
+# seconds a player whose connection dropped keeps their place in the room
+DEFAULT_RESUME_GRACE = 30
+
+type OnActionCallable = Callable[[list[Action], Connection], None]
+
+
+class Lobby:
+    """
+    The registry of all the rooms in a server process. every connection starts in the lobby,
+    joins a room with a JoinRoomAction or CreateRoomAction, and from then on its actions are routed to that room.
+    rooms are isolated from each other and are dropped once their last player leaves.
+    rooms see every client as a Session, which a client that reconnects within resume_grace seconds gets back with a ResumeAction
+    """
+
+    def __init__(
+        self,
+        queue_depth: int = DEFAULT_MAX_DEPTH,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DISCONNECT,
+        draw_tick_hz: float = DEFAULT_DRAW_TICK_HZ,
+        scheduler: Scheduler = None,
+        chat_history: int = DEFAULT_CHAT_HISTORY,
+        resume_grace: float = DEFAULT_RESUME_GRACE,
+        ping_interval: float = PING_INTERVAL,
+        idle_timeout: float = IDLE_TIMEOUT,
+    ):
+        self.queue_depth = queue_depth
+        self.overflow_policy = overflow_policy
+        self.draw_tick_hz = draw_tick_hz
+        self.chat_history = chat_history
+        self.resume_grace = resume_grace
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.reaper: TimerHandle = None
+        # one timer thread for all the rooms
+        self.scheduler = scheduler or Scheduler()
+        self.rooms: dict[str, Room] = {}
+        self.connections: set[Connection] = set()
+        self.connection_rooms: dict[Session, Room] = {}
+        self.sessions: dict[Connection, Session] = {}
+        self.resume_tokens: dict[str, Session] = {}
+        self.lock = threading.Lock()
+        self.actionsMap: Mapping[Action, OnActionCallable] = {
+            CreateRoomAction: self._on_create_room,
+            JoinRoomAction: self._on_join_room,
+            ListRoomsAction: self._on_list_rooms,
+            ResumeAction: self._on_resume,
+            LeaveAction: self._on_leave,
+        }
+
+    def add_client(self, sock: socket.socket, addr):
+        """
+        Starts a new thread to handle the messages of a new client (the threaded server mode)
+        """
+        conn = SocketConnection(sock, addr, self.queue_depth, self.overflow_policy)
+        self.connect(conn)
+        t = threading.Thread(target=self._client_thread_main, args=[conn])
+        t.start()
+
+    def connect(self, conn: Connection):
+        """
+        Registers a new connection with a new session, it stays in the lobby until it joins a room
+        """
+        logging.info("Got connection from %s", conn.addr)
+        conn.heartbeat = Heartbeat(
+            self.ping_interval, self.idle_timeout, RTT_SECONDS.observe
+        )
+        session = Session(conn)
+        with self.lock:
+            self.connections.add(conn)
+            self.sessions[conn] = session
+            self.resume_tokens[session.resume_token] = session
+            if self.ping_interval and not self.reaper:
+                self.reaper = self.scheduler.call_later(self.ping_interval, self._reap)
+
+    def connection_stats(self) -> list[dict]:
+        """
+        Returns the outbound queue numbers of every connection
+        """
+        with self.lock:
+            connections = list(self.connections)
+        return [conn.stats() for conn in connections]
+
+    def handle_batch(self, actions: list[Action], conn: Connection):
+        """
+        Handles the lobby actions of a batch and passes the rest to the room the connection's session is in,
+        pings and pongs only feed the connection's heartbeat
+        """
+        for action_type, action_iter in groupby(actions, key=lambda a: type(a)):
+            ACTIONS_RECEIVED.inc(
+                action_type.__name__, amount=sum(1 for _ in action_iter)
+            )
+        if conn.heartbeat:
+            actions, replies = conn.heartbeat.receive(actions)
+            if replies:
+                count_sent(replies)
+                conn.send_frame(ActionProtocol.encode_frame(replies))
+        session = self.sessions.get(conn)
+        if not session or not actions:
+            return
+        for action_type, action_iter in groupby(actions, key=lambda a: type(a)):
+            action_list = list(action_iter)
+            if action_type in self.actionsMap:
+                start = time.perf_counter()
+                self.actionsMap[action_type](action_list, session)
+                HANDLER_SECONDS.observe(
+                    time.perf_counter() - start, action_type.__name__
+                )
+            elif room := self.connection_rooms.get(session):
+                room.handle_batch(action_list, session)
+            else:
+                logging.warning(
+                    "%s sent %s before joining a room", conn.addr, action_type
+                )
+
+    def remove_client(self, conn: Connection):
+        """
+        Removes a disconnected client from its room (if it joined one).
+        a player in a room keeps their place for resume_grace seconds, in case the client reconnects
+        (unless they sent a LeaveAction, then they already left it)
+        """
+        with self.lock:
+            self.connections.discard(conn)
+            session = self.sessions.pop(conn, None)
+            if not session or session.conn is not conn:
+                # the session already moved on to a new connection
+                room = None
+            elif (
+                self.resume_grace
+                and (room := self.connection_rooms.get(session))
+                and session in room.state.players
+            ):
+                session.detach()
+                session.expiry = self.scheduler.call_later(
+                    self.resume_grace, self._expire_session, session
+                )
+                logging.info(
+                    "Keeping the player of %s in room %s for %ss",
+                    conn.addr,
+                    room.id,
+                    self.resume_grace,
+                )
+                room = None
+            else:
+                room = self.connection_rooms.pop(session, None)
+                self.resume_tokens.pop(session.resume_token, None)
+        if room:
+            room.remove_client(session)
+        else:
+            conn.close()
+
+    def _reap(self):
+        """
+        Runs every ping interval: pings every connection and evicts the ones that were silent for longer than the idle timeout,
+        which ends their reading loop like any other disconnect. a half-open connection would otherwise hold its player forever
+        """
+        with self.lock:
+            connections = list(self.connections)
+            self.reaper = self.scheduler.call_later(self.ping_interval, self._reap)
+        for conn in connections:
+            if conn.heartbeat.expired():
+                logging.warning(
+                    "%s was silent for %.0fs, evicting it",
+                    conn.addr,
+                    conn.heartbeat.idle(),
+                )
+                conn.abort()
+            elif ping := conn.heartbeat.poll():
+                count_sent(ping)
+                conn.send_frame(ActionProtocol.encode_frame(ping))
+
+    def _expire_session(self, session: Session):
+        """
+        Removes a player whose client didn't come back in time from their room
+        """
+        with self.lock:
+            if session.conn:
+                return
+            room = self.connection_rooms.pop(session, None)
+            self.resume_tokens.pop(session.resume_token, None)
+        if room:
+            logging.info("Player of room %s didn't come back", room.id)
+            room.leave(session)
+
+    def _on_leave(self, actions: list[LeaveAction], session: Session):
+        """
+        Takes a player who quit on purpose out of their room right away and forgets their resume token,
+        the grace period is only for connections that drop
+        """
+        with self.lock:
+            room = self.connection_rooms.pop(session, None)
+            self.resume_tokens.pop(session.resume_token, None)
+        if room:
+            logging.info("%s left room %s", session.addr, room.id)
+            room.leave(session)
+
+    def _on_resume(self, actions: list[ResumeAction], session: Session):
+        """
+        Gives a reconnecting client its previous session back (and the frames it missed),
+        a player that is gone by now joins the room again as a new one
+        """
+        action = actions[-1]
+        conn = session.conn
+        with self.lock:
+            previous = self.resume_tokens.get(action.token)
+            room = self.connection_rooms.get(previous)
+            if not room or previous not in room.state.players:
+                previous = None
+            else:
+                self.sessions[conn] = previous
+                del self.resume_tokens[session.resume_token]
+        if not previous:
+            logging.info("%s can't resume, joining again", conn.addr)
+            self._on_join_room([JoinRoomAction(action.room_id)], session)
+            return
+        stale = previous.conn
+        room.resume(previous, conn, action.last_seq)
+        if stale:
+            # the old connection is dead but the server didn't notice yet, its removal is ignored since the session moved on
+            stale.close()
+
+    def _on_create_room(self, actions: list[CreateRoomAction], conn: Connection):
+        """
+        Opens a new room with a random id and moves the player into it
+        """
+        with self.lock:
+            room_id = secrets.token_hex(3).upper()
+            while room_id in self.rooms:
+                room_id = secrets.token_hex(3).upper()
+            room = self.rooms[room_id] = Room(
+                room_id,
+                self._on_room_empty,
+                self.scheduler,
+                self.draw_tick_hz,
+                self.chat_history,
+            )
+        logging.info("Room %s created", room_id)
+        self._move_to_room(conn, room)
+
+    def _on_join_room(self, actions: list[JoinRoomAction], conn: Connection):
+        """
+        Moves the player into the requested room, the default room is opened on demand.
+        an unknown room id is answered with the list of rooms
+        """
+        room_id = actions[-1].room_id or DEFAULT_ROOM_ID
+        with self.lock:
+            room = self.rooms.get(room_id)
+            if not room and room_id == DEFAULT_ROOM_ID:
+                room = self.rooms[room_id] = Room(
+                    room_id,
+                    self._on_room_empty,
+                    self.scheduler,
+                    self.draw_tick_hz,
+                    self.chat_history,
+                )
+        if room:
+            self._move_to_room(conn, room)
+        else:
+            logging.warning("%s asked to join unknown room %s", conn.addr, room_id)
+            self._on_list_rooms([ListRoomsAction()], conn)
+
+    def _on_list_rooms(self, actions: list[ListRoomsAction], conn: Connection):
+        """
+        Sends the player a RoomListAction describing every room
+        """
+        with self.lock:
+            rooms = [
+                RoomInfo(room.id, len(room.state.players), room.state.is_playing)
+                for room in self.rooms.values()
+            ]
+        room_list = RoomListAction(rooms)
+        count_sent(room_list)
+        conn.send_frame(ActionProtocol.encode_frame(room_list))
+
+    def _move_to_room(self, conn: Connection, room: Room):
+        """
+        Leaves the current room of the connection (if any) and joins the given one
+        """
+        with self.lock:
+            previous = self.connection_rooms.get(conn)
+            self.connection_rooms[conn] = room
+        if previous is room:
+            return
+        if previous:
+            previous.leave(conn)
+        room.join(conn)
+        with self.lock:
+            # the room may have emptied and been dropped right before we joined it
+            if room.id not in self.rooms:
+                self.rooms[room.id] = room
+
+    def _on_room_empty(self, room: Room):
+        """
+        Drops a room once its last player left
+        """
+        with self.lock:
+            if self.rooms.get(room.id) is room and not room.state.players:
+                del self.rooms[room.id]
+                logging.info("Room %s closed", room.id)
+
+    def _client_thread_main(self, conn: SocketConnection):
+        """
+        Handles communication with a connected client. It processes incoming actions in batches, and manages exceptions or client disconnections, ensuring that the client is removed when the connection ends
+        """
+        reader = FrameReader(conn.sock)
+        try:
+            while True:
+                payload = reader.recv_frame()
+                if payload is not None:
+                    BYTES_RECEIVED.inc(amount=HEADER_SIZE + len(payload))
+                actions = ActionProtocol.decode_payload(payload)
+                if not actions:
+                    break
+                self.handle_batch(actions, conn)
+        except socket.error:
+            logging.exception("Error handling client %s", conn.addr)
+        except (ConnectionResetError, BrokenPipeError):
+            logging.exception("Client forcibly closed the connection")
+        finally:
+            logging.info("Connection closed from %s", conn.addr)
+            self.remove_client(conn)
@@ -0,0 +1,183 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Callable
+
+from shared.actions import Action
+from shared.metrics import REGISTRY, Counter, Gauge, Histogram
+
+if TYPE_CHECKING:
+    from server.lobby import Lobby
+
+METRICS_HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+ACTIONS_RECEIVED = REGISTRY.register(
+    Counter(
+        "skribble_actions_received_total", "Actions received from clients", ("action",)
+    )
+)
+ACTIONS_SENT = REGISTRY.register(
+    Counter(
+        "skribble_actions_sent_total",
+        "Actions sent to clients, once per recipient",
+        ("action",),
+    )
+)
+BYTES_RECEIVED = REGISTRY.register(
+    Counter("skribble_bytes_received_total", "Bytes of frames read from clients")
+)
+BYTES_SENT = REGISTRY.register(
+    Counter("skribble_bytes_sent_total", "Bytes of frames written to clients")
+)
+HANDLER_SECONDS = REGISTRY.register(
+    Histogram(
+        "skribble_handler_seconds",
+        "Time spent in the actionsMap handler of an action type, per batch",
+        ("action",),
+    )
+)
+BROADCAST_SECONDS = REGISTRY.register(
+    Histogram(
+        "skribble_broadcast_seconds",
+        "Time spent queueing a broadcast frame for every player of a room",
+    )
+)
+
+RTT_SECONDS = REGISTRY.register(
+    Histogram(
+        "skribble_rtt_seconds",
+        "Round trip time of the pings sent to clients, per pong",
+    )
+)
+OUTBOUND_OVERFLOW = REGISTRY.register(
+    Counter(
+        "skribble_outbound_overflow_total",
+        "Frames for a client whose outbound queue was full, by what the overflow policy did with them",
+        ("outcome",),
+    )
+)
+
+
+def count_sent(batch: list[Action] | Action, recipients: int = 1):
+    """
+    Counts the actions of a batch as sent to the given number of clients
+    """
+    if not isinstance(batch, list):
+        batch = [batch]
+    for action in batch:
+        ACTIONS_SENT.inc(type(action).__name__, amount=recipients)
+
+
+def register_lobby(lobby: "Lobby"):
+    """
+    Adds the gauges that are read from the lobby when scraped, the ones of every open connection are labelled with its address
+    """
+
+    def queue_depths() -> list[int]:
+        return [stats["queue_depth"] for stats in lobby.connection_stats()]
+
+    def per_connection(name: str, scale: float = 1) -> Callable[[], dict]:
+        """
+        Reads a number from the stats of every open connection, labelled with the connection's address.
+        connections that don't have it yet (no pong so far) are left out
+        """
+        return lambda: {
+            (stats["addr"],): stats[name] * scale
+            for stats in lobby.connection_stats()
+            if stats[name] is not None
+        }
+
+    REGISTRY.register(
+        Gauge(
+            "skribble_connections",
+            "Open client connections",
+            lambda: len(lobby.connections),
+        )
+    )
+    REGISTRY.register(Gauge("skribble_rooms", "Open rooms", lambda: len(lobby.rooms)))
+    REGISTRY.register(
+        Gauge(
+            "skribble_outbound_queue_frames",
+            "Frames waiting to be written, over all the connections",
+            lambda: sum(queue_depths()),
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "skribble_outbound_queue_max_frames",
+            "Frames waiting to be written to the most backed up connection",
+            lambda: max(queue_depths(), default=0),
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "skribble_connection_queue_frames",
+            "Frames waiting to be written to a connection",
+            per_connection("queue_depth"),
+            ("addr",),
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "skribble_connection_dropped_frames",
+            "Frames the overflow policy dropped for a connection so far",
+            per_connection("dropped"),
+            ("addr",),
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "skribble_connection_rtt_seconds",
+            "Smoothed round trip time of a connection",
+            per_connection("rtt_ms", 0.001),
+            ("addr",),
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "skribble_connection_idle_seconds",
+            "Seconds since anything was heard from a connection",
+            per_connection("idle_s"),
+            ("addr",),
+        )
+    )
+    REGISTRY.register(
+        Gauge(
+            "skribble_timers",
+            "Timers waiting on the scheduler",
+            lambda: len(lobby.scheduler),
+        )
+    )
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # every scrape would be logged otherwise
+        pass
+
+
+def serve_metrics(
+    lobby: "Lobby", port: int, host: str = METRICS_HOST
+) -> ThreadingHTTPServer:
+    """
+    Serves the metrics in the Prometheus text format at /metrics from a daemon thread.
+    it only listens on localhost by default, the numbers are not meant for the players
+    """
+    register_lobby(lobby)
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,69 @@
+from collections import deque
+from enum import StrEnum
+from typing import Hashable
+
+DEFAULT_MAX_DEPTH = 256
+
+
+class OverflowPolicy(StrEnum):
+    """
+    What a connection does with a new frame once its outbound queue is full
+    """
+
+    # discard the new frame
+    DROP = "drop"
+    # replace the queued frame that has the same coalesce key (a newer snapshot of the same state, see Outbox.send_snapshot)
+    # where it is, otherwise discard the new frame
+    COALESCE = "coalesce"
+    # give up on the client, it can't keep up with the room
+    DISCONNECT = "disconnect"
+
+
+class OutboundQueue:
+    """
+    A bounded queue of frames waiting to be written to a single client.
+    it is not thread safe by itself, every connection guards it in its own way
+    """
+
+    def __init__(
+        self,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+        policy: OverflowPolicy = OverflowPolicy.DISCONNECT,
+    ):
+        self.max_depth = max_depth
+        self.policy = policy
+        self.frames: deque[tuple[Hashable, bytes]] = deque()
+        self.dropped = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def push(self, frame: bytes, key: Hashable = None) -> bool:
+        """
+        Queues a frame, applying the overflow policy when the queue is full.
+        returns False if the client should be disconnected
+        """
+        if len(self.frames) < self.max_depth:
+            self.frames.append((key, frame))
+            return True
+
+        if self.policy == OverflowPolicy.DISCONNECT:
+            return False
+        if self.policy == OverflowPolicy.COALESCE and key is not None:
+            for i, (queued_key, _) in enumerate(self.frames):
+                if queued_key == key:
+                    # in place, so the frames around it keep their order
+                    self.frames[i] = (key, frame)
+                    self.coalesced += 1
+                    return True
+        self.dropped += 1
+        return True
+
+    def drain(self) -> bytes:
+        """
+        Empties the queue and returns all of its frames joined, so they go out in a single write
+        """
+        data = b"".join(frame for _, frame in self.frames)
+        self.frames.clear()
+        return data
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Hashable
+
+from shared.actions import Action
+from shared.actions.sequence_action import SequenceAction
+from shared.protocol import ActionProtocol
+
+from server.connection import Connection
+from server.metrics import BROADCAST_SECONDS, count_sent
+from server.server_state import ServerState
+
+# how many of the last frames a room keeps for players that reconnect
+REPLAY_RING_SIZE = 1024
+
+
+class Outbox:
+    """
+    Sends actions to the players of a room. a broadcast serializes its batch once
+    and writes the same frame to every recipient instead of re-encoding it per player.
+    every frame starts with a SequenceAction numbering it in the room's stream and naming the frame the recipient
+    was sent before it, so a client can tell when one went missing. the players a broadcast reaches were sent the same
+    frames before it apart from the few meant for a single player, so it is encoded once for every previous frame there is.
+    the last frames are kept in a ring so a player that reconnects can be sent just the frames it missed
+    """
+
+    def __init__(
+        self,
+        state: ServerState,
+        seq: int = 0,
+        ring_size: int = REPLAY_RING_SIZE,
+        encode_frame: Callable[[list[Action]], bytes] = ActionProtocol.encode_frame,
+    ):
+        """
+        seq is the number of the last frame sent, a room that starts over keeps counting from where it was.
+        encode_frame turns a numbered batch into what the connections are sent (the simulation hands over the action lists as they are)
+        """
+        self.state = state
+        self.seq = seq
+        self.encode_frame = encode_frame
+        # (seq, the frame by the number of the frame its recipients were sent before it, the only recipient or None,
+        # the excluded connection or None)
+        self.ring: deque[tuple[int, dict[int, bytes], Connection, Connection]] = deque(
+            maxlen=ring_size
+        )
+        # the number of the last frame every player was sent
+        self.last_sent: dict[Connection, int] = {}
+        # frames are numbered and written in the same order, a replay holds it so nothing new slips in between
+        self.lock = threading.RLock()
+
+    def send(self, conn: Connection, batch: list[Action] | Action):
+        """
+        Sends the batch to a single player
+        """
+        with self.lock:
+            batch = self._sequence(batch, to=conn)
+            if batch:
+                count_sent(batch)
+                conn.send_frame(self._frame(conn, batch))
+
+    def send_snapshot(
+        self, conn: Connection, batch: list[Action] | Action, key: Hashable
+    ):
+        """
+        Sends a single player a batch holding the whole of some state, which a newer one with the same key makes useless.
+        it is left out of the numbered stream so a queue with the COALESCE policy can replace it where it waits,
+        and it isn't replayed after a reconnect (the client asks for it again)
+        """
+        if not isinstance(batch, list):
+            batch = [batch]
+        if not batch:
+            return
+        with self.lock:
+            count_sent(batch)
+            conn.send_frame(self.encode_frame(batch), key)
+
+    def broadcast(self, batch: list[Action] | Action, exclude: Connection = None):
+        """
+        Sends the batch to every player in the room except the excluded connection (if given)
+        """
+        with self.lock:
+            batch = self._sequence(batch, exclude=exclude)
+            if not batch:
+                return
+            start = time.perf_counter()
+            # copy the keys since players may join or leave from other threads while we write
+            recipients = [conn for conn in list(self.state.players) if conn != exclude]
+            for conn in recipients:
+                conn.send_frame(self._frame(conn, batch))
+            BROADCAST_SECONDS.observe(time.perf_counter() - start)
+            count_sent(batch, len(recipients))
+
+    def replay(self, conn: Connection, last_seq: int) -> bool:
+        """
+        Sends a player the frames meant for them that came after last_seq.
+        returns False without sending anything if some of them are no longer in the ring
+        """
+        with self.lock:
+            if last_seq > self.seq:
+                return False
+            if last_seq < self.seq and (
+                not self.ring or self.ring[0][0] > last_seq + 1
+            ):
+                return False
+            missed = []
+            prev = last_seq
+            for seq, frames, to, exclude in self.ring:
+                if seq > last_seq and to in (None, conn) and exclude is not conn:
+                    # only there when the player was sent the frame with last_seq as the one before it
+                    if prev not in frames:
+                        return False
+                    missed.append(frames[prev])
+                    prev = seq
+            for frame in missed:
+                conn.send_frame(frame)
+            self.last_sent[conn] = prev
+            return True
+
+    def forget(self, conn: Connection):
+        """
+        Drops what the outbox knows about a player that left the room
+        """
+        with self.lock:
+            self.last_sent.pop(conn, None)
+
+    def _sequence(
+        self,
+        batch: list[Action] | Action,
+        to: Connection = None,
+        exclude: Connection = None,
+    ) -> list[Action]:
+        """
+        Numbers the batch and adds it to the ring, _frame encodes it for every recipient. returns an empty batch as it is
+        """
+        if not isinstance(batch, list):
+            batch = [batch]
+        if batch:
+            self.seq += 1
+            self.ring.append((self.seq, {}, to, exclude))
+        return batch
+
+    def _frame(self, conn: Connection, batch: list[Action]) -> bytes:
+        """
+        Returns the frame of the last numbered batch for a recipient, encoding it the first time a recipient
+        was sent this previous frame
+        """
+        seq, frames, _, _ = self.ring[-1]
+        prev = self.last_sent.get(conn, 0)
+        frame = frames.get(prev)
+        if frame is None:
+            frame = frames[prev] = self.encode_frame(
+                [SequenceAction(seq, prev), *batch]
+            )
+        self.last_sent[conn] = seq
+        return frame
@@ -1,19 +1,22 @@
 import logging
 import random
-import socket
-import threading
+import time
 from itertools import groupby
-from time import sleep
 from typing import Callable, Mapping
 
 from shared.actions import Action
+from shared.actions.chat_history_action import ChatHistoryAction
+from shared.actions.chat_history_request_action import ChatHistoryRequestAction
 from shared.actions.chat_message_action import ChatMessageAction
 from shared.actions.clear_canvas_action import ClearCanvasAction
 from shared.actions.draw_action import DrawAction
+from shared.actions.draw_timing_action import DrawTimingAction
 from shared.actions.game_over_action import GameOverAction
 from shared.actions.init_game_state_action import InitGameStateAction
 from shared.actions.player_list_action import PlayerListAction
+from shared.actions.player_list_request_action import PlayerListRequestAction
 from shared.actions.player_name_action import PlayerNameAction
+from shared.actions.player_update_action import PlayerUpdateAction
 from shared.actions.start_game_action import StartGameAction
 from shared.actions.turn_end_action import TurnEndReason
 from shared.actions.work_picked_action import WordPickedAction
@@ -22,132 +25,278 @@ from shared.colors import GREEN
 from shared.constants import SYSTEM_PLAYER_ID
 from shared.player import Player
 from shared.protocol import ActionProtocol
+from shared.stroke_buffer import StrokeBuffer
 
+from server.chat_history import DEFAULT_CHAT_HISTORY, ChatHistory
+from server.connection import Connection
+from server.metrics import HANDLER_SECONDS
+from server.outbox import Outbox
 from server.round_manager import RoundManager
+from server.scheduler import Scheduler
 from server.server_state import ServerState
+from server.session import Session
+from server.strokes import DEFAULT_DRAW_TICK_HZ, DrawTick
 
-type OnActionCallable = Callable[[list[Action], socket.socket], None]
+GAME_OVER_CLOSE_DELAY = 2
+
+type OnActionCallable = Callable[[list[Action], Connection], None]
 
 
 class Room:
-    def __init__(self):
-        """
-        Initializes an actionsMap to associate specific action types with corresponding handler methods and calls the _init_room() method to set up the room
+    def __init__(
+        self,
+        room_id: str,
+        on_empty: Callable[["Room"], None],
+        scheduler: Scheduler,
+        draw_tick_hz: float = DEFAULT_DRAW_TICK_HZ,
+        chat_history: int = DEFAULT_CHAT_HISTORY,
+        rng: random.Random = None,
+        encode_frame: Callable[[list[Action]], bytes] = ActionProtocol.encode_frame,
+    ):
         """
+        Initializes an actionsMap to associate specific action types with corresponding handler methods and calls the _init_room() method to set up the room.
+        on_empty is called when the last player leaves so the lobby can drop the room, the room's timers run on the scheduler shared by all rooms,
+        draw_tick_hz is how many times a second the strokes drawn in the room are sent out (0 forwards them right away),
+        chat_history is how many chat messages the room keeps, rng makes every random choice of the room (a seeded one replays a game exactly),
+        encode_frame turns the batches the room sends into frames (see Outbox)
+        """
+        self.id = room_id
+        self.on_empty = on_empty
+        self.scheduler = scheduler
+        self.draw_tick_hz = draw_tick_hz
+        self.chat_history = chat_history
+        self.rng = rng or random.Random()
+        self.encode_frame = encode_frame
+        self.draw_tick: DrawTick = None
+        self.round_manager: RoundManager = None
+        self.outbox: Outbox = None
         self.actionsMap: Mapping[Action, OnActionCallable] = {
             DrawAction: self._on_draw_action,
+            DrawTimingAction: self._on_draw_timing,
             PlayerNameAction: self._on_player_name_action,
             StartGameAction: self._on_start_game,
-            ClearCanvasAction: self._forward,
+            ClearCanvasAction: self._on_clear_canvas,
             WordPickedAction: self._on_word_picked,
             ChatMessageAction: self._on_chat_message,
+            ChatHistoryRequestAction: self._on_chat_history_request,
+            PlayerListRequestAction: self._on_player_list_request,
         }
         self._init_room()
 
     def _init_room(self):
         """
-        Initializes the server's game state and round manager, and sets up the callback for handling game over events
-        """
-        self.state = ServerState()
-        self.round_manager = RoundManager(self.state, self._on_game_over)
+        Initializes the server's game state, outbox, draw tick and round manager, and sets up the callback for handling game over events
+        """
+        if self.draw_tick:
+            self.draw_tick.discard()
+        if self.round_manager:
+            self.round_manager.cancel_timers()
+        self.state = ServerState(chat=ChatHistory(self.chat_history))
+        # frame numbers keep counting across games, so a reconnecting client can't mistake a new frame for one it got
+        self.outbox = Outbox(
+            self.state,
+            self.outbox.seq if self.outbox else 0,
+            encode_frame=self.encode_frame,
+        )
+        self.draw_tick = DrawTick(self.outbox, self.scheduler, self.draw_tick_hz)
+        self.round_manager = RoundManager(
+            self.state,
+            self.outbox,
+            self.scheduler,
+            self._on_game_over,
+            self.draw_tick.flush,
+            rng=self.rng,
+        )
 
-    def add_client(self, sock: socket.socket, addr):
+    def join(self, conn: Connection):
         """
-        Adds a new player to the game, sends the updated player list to them, and starts a new thread to handle their messages
+        Adds a new player to the game, tells the others about them and sends them the initial game state
         """
-        self.state.players[sock] = Player(name="", is_owner=not len(self.state.players))
-        self._forward(
-            [PlayerListAction(players_list=self.state.get_player_list())], sock
+        logging.info("%s joined room %s", conn.addr, self.id)
+        # whatever is still waiting for the draw tick is already in the canvas log the new player gets
+        self.draw_tick.flush()
+        joined = self.state.add_player(
+            conn, Player(name="", is_owner=not len(self.state.players))
+        )
+        self._forward([joined], conn)
+        self._send_initial_game_state(conn)
+        self._send_game_in_progress(conn)
+
+    def resume(self, session: Session, conn: Connection, last_seq: int):
+        """
+        Moves a player whose connection dropped to their new connection and sends them the frames they missed,
+        or the whole game state if those are no longer in the replay ring
+        """
+        with self.outbox.lock:
+            session.attach(conn)
+            if self.outbox.replay(session, last_seq):
+                logging.info("%s resumed in room %s", session.addr, self.id)
+                return
+        logging.info(
+            "%s resumed in room %s, missed too much and gets the whole state",
+            session.addr,
+            self.id,
         )
-        t = threading.Thread(target=self._client_thread_main, args=[sock, addr])
-        t.start()
+        self.draw_tick.flush()
+        self._send_initial_game_state(session)
+        self._send_game_in_progress(session)
 
-    def remove_client(self, sock: socket.socket):
+    def handle_batch(self, actions: list[Action], conn: Connection):
         """
-        Disconnects a player, reassigns owner if needed, updates player list or ends game if state is invalid
+        Groups a received batch by action type and passes every group to its handler from the actionsMap
         """
-        sock.close()
-        if sock in self.state.players:
-            was_owner = self.state.players[sock].is_owner
-            del self.state.players[sock]
+        for action_type, action_iter in groupby(actions, key=lambda a: type(a)):
+            action_list = list(action_iter)
+            if action_type in self.actionsMap:
+                start = time.perf_counter()
+                self.actionsMap[action_type](action_list, conn)
+                HANDLER_SECONDS.observe(
+                    time.perf_counter() - start, action_type.__name__
+                )
+            else:
+                logging.warning("Unknown action type %s", action_type)
+
+    def remove_client(self, conn: Connection):
+        """
+        Disconnects a player and removes them from the room
+        """
+        conn.close()
+        self.leave(conn)
+
+    def leave(self, conn: Connection):
+        """
+        Removes a player from the room, reassigns owner if needed, tells the others or ends game if state is invalid
+        """
+        if conn in self.state.players:
+            self.outbox.forget(conn)
+            was_owner = self.state.players[conn].is_owner
+            updates = [self.state.remove_player(conn)]
             if was_owner and self.state.get_player_list():
-                player = random.choice(self.state.get_player_list())
-                player.is_owner = True
+                player = self.rng.choice(self.state.get_player_list())
+                updates.append(self.state.update_player(player, is_owner=True))
             if self._is_valid_state() or not self.state.is_playing:
-                self._broadcast_player_list()
+                self._broadcast_player_updates(updates)
             else:
                 self._on_game_over()
+        if not self.state.players:
+            self.on_empty(self)
+
+    def _on_draw_action(self, draw_actions: list[DrawAction], conn: Connection):
+        """
+        Saves incoming drawing actions for the current turn and queues them for the next draw tick,
+        which sends them to all other clients
+        """
+        self.round_manager.turn.add_strokes(draw_actions)
+        self.draw_tick.add(draw_actions, conn)
 
-    def _on_draw_action(self, draw_actions: list[DrawAction], sock: socket.socket):
+    def _on_draw_timing(self, timings: list[DrawTimingAction], conn: Connection):
         """
-        Saves incoming drawing actions for the current turn and forwards them to all other clients
+        Stamps when the timing of a stroke batch reached the server and passes it to the draw tick, which forwards it with the strokes
         """
-        self.round_manager.turn.draw_actions.extend(draw_actions)
-        self._forward(draw_actions, sock)
+        now = time.monotonic()
+        for timing in timings:
+            timing.received = now
+        self.draw_tick.add_timing(timings, conn)
 
-    def _on_player_name_action(
-        self, actions: list[PlayerNameAction], sock: socket.socket
+    def _on_clear_canvas(self, actions: list[ClearCanvasAction], conn: Connection):
+        """
+        Sends out the strokes still waiting for the draw tick before forwarding the clear, so they don't land on the cleared canvas,
+        and drops the strokes a late joiner would have been sent
+        """
+        self.draw_tick.flush()
+        if self.round_manager.turn:
+            self.round_manager.turn.clear_canvas()
+        self._forward(actions, conn)
+
+    def _on_player_name_action(self, actions: list[PlayerNameAction], conn: Connection):
+        """
+        Updates the player's name on the server and sends the change to everyone
+        """
+        player = self.state.players[conn]
+        self._broadcast_player_updates(
+            [self.state.update_player(player, name=actions[-1].name)]
+        )
+
+    def _on_player_list_request(
+        self, actions: list[PlayerListRequestAction], conn: Connection
     ):
         """
-        Updates the player's name on the server and broadcasts the updated player list
+        Sends the whole player list to a player that missed an update
         """
-        self.state.players[sock].name = actions[-1].name
-        self._broadcast_player_list()
+        self.outbox.send_snapshot(
+            conn, PlayerListAction(self.state.get_player_list()), PlayerListAction
+        )
 
-    def _on_start_game(self, al: list[StartGameAction], sock: socket.socket):
+    def _on_start_game(self, al: list[StartGameAction], conn: Connection):
         """
         Starts the game if the server state is valid, broadcasts the start, and begins the first round
         """
         if self._is_valid_state:
             self.state.is_playing = True
-            self._forward(al, sock)
+            self._forward(al, conn)
             next(self.round_manager.players)
 
-    def _on_word_picked(self, al: list[WordPickedAction], sock: socket.socket):
+    def _on_word_picked(self, al: list[WordPickedAction], conn: Connection):
         """
         Sets the chosen word for the current turn using the last received WordPickedAction
         """
         word = al[-1].picked_word
         self.round_manager.set_turn_word(word)
 
-    def _on_chat_message(self, actions: list[ChatMessageAction], sock: socket.socket):
+    def _on_chat_message(self, actions: list[ChatMessageAction], conn: Connection):
         """
         Handles a chat message, checks if it's a correct guess, updates the chat and sends updates (including possible turn end) to all players
         """
         message = actions[-1].message
-        if self.round_manager.check_guess(sock, message.text):
+        if self.round_manager.check_guess(conn, message.text):
             message = ChatMessage(
                 SYSTEM_PLAYER_ID,
-                f"{self.state.players[sock].get_player_name(None)} guessed the word!",
+                f"{self.state.players[conn].get_player_name(None)} guessed the word!",
                 GREEN,
             )
-        self.state.chat_messages.append(message)
+        self.state.chat.append(message)
         actions_to_send = [ChatMessageAction(message)]
 
         if self.round_manager.is_turn_finished():
-            actions_to_send.append(
+            actions_to_send.extend(
                 self.round_manager.build_turn_end(
                     TurnEndReason.EVERYONE_GUESSED_CORRECTLY
                 )
             )
-        for p_sock, player in self.state.players.items():
-            ActionProtocol.send_batch(p_sock, actions_to_send)
+        self.outbox.broadcast(actions_to_send)
+
+    def _on_chat_history_request(
+        self, actions: list[ChatHistoryRequestAction], conn: Connection
+    ):
+        """
+        Sends the player the page of chat messages they asked for, usually when they scroll up past the oldest one they have
+        """
+        for action in actions:
+            first, messages = self.state.chat.page(action.before, action.count)
+            self.outbox.send(conn, ChatHistoryAction(messages, first))
 
     def _on_game_over(self):
         """
         Sends a GameOverAction to all clients, closes their connections after a short delay, and resets the game state
         """
-        # dealing with multiple winners using groupby
-        score, winners = next(
-            groupby(self.state.players.values(), key=lambda p: p.score)
-        )
+        # dealing with multiple winners, everyone with the top score wins
+        score = max(p.score for p in self.state.players.values())
+        winners = [p for p in self.state.players.values() if p.score == score]
         game_over_action = GameOverAction(score=score, winners=[p.id for p in winners])
-        for s in self.state.players.keys():
-            ActionProtocol.send_batch(s, game_over_action)
-            sleep(2)
-            s.close()
+        self.outbox.broadcast(game_over_action)
+        # closing later instead of sleeping, this may run on the event loop in the asyncio mode
+        self.scheduler.call_later(
+            GAME_OVER_CLOSE_DELAY, self._close_all, list(self.state.players)
+        )
         self._init_room()
 
+    def _close_all(self, conns: list[Connection]):
+        """
+        Closes the connections of the players of a finished game
+        """
+        for conn in conns:
+            conn.close()
+
     def _is_valid_state(self):
         """
         Checks if the game has at least 2 players to be considered valid; returns False if not
@@ -155,64 +304,46 @@ class Room:
         if len(self.state.players) < 2:
             return False
 
-    def _others(self, sock: socket.socket):
+    def _forward(self, actions_list: list[Action], conn: Connection):
         """
-        Returns an iterator over all players except the one associated with the given socket
+        Sends the provided actions_list to all players except the one associated with the given connection
         """
-        return filter(lambda t: t[0] != sock, self.state.players.items())
+        self.outbox.broadcast(actions_list, exclude=conn)
 
-    def _forward(self, actions_list: list[Action], sock: socket.socket):
+    def _broadcast_player_updates(self, updates: list[PlayerUpdateAction | None]):
         """
-        Sends the provided actions_list to all players except the one associated with the given socket
+        Sends the changes of the players to all connected players, updates that changed nothing are None and skipped
         """
-        for other_sock, other_player in self._others(sock):
-            ActionProtocol.send_batch(other_sock, actions_list)
+        updates = [update for update in updates if update]
+        if updates:
+            self.outbox.broadcast(updates)
 
-    def _broadcast_player_list(self):
+    def _send_game_in_progress(self, conn: Connection):
         """
-        Sends the updated list of players (plist) to all connected players
+        Puts a player who arrives in the middle of a game on the game screen (the client only switches to it on a StartGameAction,
+        and only draws the canvas from the initial state there) along with the running turn
         """
-        plist = self.state.get_player_list()
-        for sock, player in self.state.players.items():
-            ActionProtocol.send_batch(sock, PlayerListAction(players_list=plist))
+        if self.state.is_playing:
+            turn_start = self.round_manager.build_turn_start(conn)
+            self.outbox.send(conn, [StartGameAction(), *filter(None, [turn_start])])
 
-    def _send_initial_game_state(self, sock: socket.socket):
+    def _send_initial_game_state(self, conn: Connection):
         """
-        Sends the initial game state (including player list, player ID, chat messages, and max rounds) to a specific player (sock)
+        Sends the initial game state (including player list, player ID, the last page of the chat, max rounds and what is drawn on the canvas) to a specific player (conn)
         """
         plist = self.state.get_player_list()
-        ActionProtocol.send_batch(
-            sock,
+        turn = self.round_manager.turn
+        chat_offset, chat_messages = self.state.chat.last_page()
+        self.outbox.send(
+            conn,
             InitGameStateAction(
                 players_list=plist,
-                you=self.state.players[sock].id,
-                chat_messages=self.state.chat_messages,
+                you=self.state.players[conn].id,
+                chat_messages=chat_messages,
                 max_rounds=self.round_manager.max_rounds,
+                room_id=self.id,
+                draw_actions=turn.canvas[:] if turn else StrokeBuffer(),
+                chat_offset=chat_offset,
+                resume_token=conn.resume_token,
             ),
         )
-
-    def _client_thread_main(self, sock: socket.socket, addr):
-        """
-        Handles communication with a connected client. It sends the initial game state, processes incoming actions in batches, and manages exceptions or client disconnections, ensuring that the client is removed when the connection ends
-        """
-        logging.info("Got connection from %s", addr)
-        self._send_initial_game_state(sock)
-        try:
-            while True:
-                actions = ActionProtocol.recv_batch(sock)
-                if not actions:
-                    break
-
-                for action_type, action_iter in groupby(actions, key=lambda a: type(a)):
-                    action_list = list(action_iter)
-                    if action_type in self.actionsMap:
-                        self.actionsMap[action_type](action_list, sock)
-                    else:
-                        logging.warning("Unknown action type %s", action_type)
-        except socket.error:
-            logging.exception("Error handling client %s", addr)
-        except (ConnectionResetError, BrokenPipeError):
-            logging.exception("Client forcibly closed the connection")
-        finally:
-            logging.info("Connection closed from %s", addr)
-            self.remove_client(sock)
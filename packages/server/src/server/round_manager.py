@@ -1,20 +1,22 @@
-import socket
-import threading
-import time
-from itertools import cycle
+import random
 from math import floor
 from typing import Callable
 
+from shared.actions import Action
 from shared.actions.choose_word_action import ChooseWordAction
-from shared.actions.player_list_action import PlayerListAction
 from shared.actions.turn_end_action import TurnEndAction, TurnEndReason
 from shared.actions.turn_start_action import TurnStartAction
-from shared.protocol import ActionProtocol
 
+from server.connection import Connection
+from server.outbox import Outbox
+from server.scheduler import Scheduler, TimerHandle
 from server.server_state import ServerState
 from server.turn import Turn
 from server.words import WordManager, drawable_words
 
+# seconds between the end of a turn and the next player choosing a word
+TURN_END_DELAY = 5
+
 
 class RoundManager:
     """
@@ -25,18 +27,29 @@ class RoundManager:
     def __init__(
         self,
         state: ServerState,
+        outbox: Outbox,
+        scheduler: Scheduler,
         on_game_over: Callable[[], None],
+        flush_strokes: Callable[[], None] = lambda: None,
         max_rounds: int = 3,
         turn_timeout: int = 60,
+        rng: random.Random = None,
     ):
+        """
+        the turn times are read from the scheduler's clock, rng picks the word options (a seeded one makes a game reproducible)
+        """
         self.state = state
+        self.outbox = outbox
+        self.scheduler = scheduler
         self.on_game_over = on_game_over
+        self.flush_strokes = flush_strokes
         self.max_rounds = max_rounds
         self.turn_timeout = turn_timeout
-        self.word_manager = WordManager(drawable_words)
+        self.word_manager = WordManager(drawable_words, rng)
         self.round = 0
         self.players = self._player_iter()
         self.turn: Turn = None
+        self.turn_end_timer: TimerHandle = None
 
     def set_turn_word(self, word: str):
         """
@@ -45,22 +58,44 @@ class RoundManager:
         self.word_manager.pick_word(word)
         self.turn.word = word
         placeholder = " ".join(["_" for i in word])
-        for sock, p in self.state.players.items():
-            action = TurnStartAction(placeholder, self.round, self.turn_timeout)
-            if sock == self.turn.active_player:
-                action.word = word
-            ActionProtocol.send_batch(sock, action)
-        self.turn.timer.start()
-        self.turn.start_time = time.time()
+        self.outbox.broadcast(
+            TurnStartAction(placeholder, self.round, self.turn_timeout),
+            exclude=self.turn.active_player,
+        )
+        self.outbox.send(
+            self.turn.active_player,
+            TurnStartAction(word, self.round, self.turn_timeout),
+        )
+        self.turn.timeout = self.scheduler.call_later(
+            self.turn_timeout, self._on_timeout
+        )
+        self.turn.start_time = self.scheduler.time()
 
-    def check_guess(self, sock: socket.socket, guess: str) -> bool:
+    def build_turn_start(self, conn: Connection) -> TurnStartAction | None:
+        """
+        Returns the TurnStartAction of the running turn again for a player that lost it, with the time that is left.
+        None if no word was picked yet or the time is up
+        """
+        if not self.turn or not self.turn.word:
+            return None
+        time_left = self.turn_timeout - floor(
+            self.scheduler.time() - self.turn.start_time
+        )
+        if time_left <= 0:
+            return None
+        word = self.turn.word
+        if conn != self.turn.active_player:
+            word = " ".join(["_" for i in word])
+        return TurnStartAction(word, self.round, time_left)
+
+    def check_guess(self, conn: Connection, guess: str) -> bool:
         """
         Checks if the guessed word matches the turn's word. If correct, updates the player's score, ends the turn if all players have guessed, and stops the timer. Returns True if the guess is correct, otherwise False
         """
         if guess == self.turn.word:
-            self.turn.player_score_update[sock] = self._calculate_score()
-            if self.is_turn_finished():
-                self.turn.timer.cancel()
+            self.turn.player_score_update[conn] = self._calculate_score()
+            if self.is_turn_finished() and self.turn.timeout:
+                self.turn.timeout.cancel()
             return True
         return False
 
@@ -70,24 +105,42 @@ class RoundManager:
         """
         return len(self.turn.player_score_update) == len(self.state.players) - 1
 
-    def build_turn_end(self, reason: TurnEndReason):
+    def build_turn_end(self, reason: TurnEndReason) -> list[Action]:
         """
-        Calculates scores at the end of a turn, applies score updates, starts a timer to post the turn end, and returns a TurnEndAction with updated player scores and other details
+        Calculates scores at the end of a turn, applies score updates, starts a timer to post the turn end,
+        and returns the score changes of the players followed by a TurnEndAction with the points every player gained and other details.
+        the strokes still waiting for the draw tick are sent first, so everyone sees the full drawing before the turn ends
         """
+        self.flush_strokes()
+        # the clients clear their canvas when the turn ends
+        self.turn.clear_canvas()
         self.turn.player_score_update[self.turn.active_player] = min(
             self.turn_timeout, len(self.turn.player_score_update) * 10
         )
-        self._apply_score_updates()
-        threading.Timer(5, self._post_turn_end).start()
-        return TurnEndAction(
-            self.state.get_player_list(),
-            self.turn.word,
-            reason,
-            player_score_update={
-                self.state.players[sock].id: score
-                for sock, score in self.turn.player_score_update.items()
-            },
+        updates = self._apply_score_updates()
+        self.turn_end_timer = self.scheduler.call_later(
+            TURN_END_DELAY, self._post_turn_end
         )
+        return [
+            *updates,
+            TurnEndAction(
+                self.turn.word,
+                reason,
+                player_score_update={
+                    self.state.players[conn].id: score
+                    for conn, score in self.turn.player_score_update.items()
+                },
+            ),
+        ]
+
+    def cancel_timers(self):
+        """
+        Cancels the turn timeout and the turn end delay, once the game is over nothing of it should run
+        """
+        if self.turn and self.turn.timeout:
+            self.turn.timeout.cancel()
+        if self.turn_end_timer:
+            self.turn_end_timer.cancel()
 
     def _post_turn_end(self):
         """
@@ -100,47 +153,50 @@ class RoundManager:
         """
         player turn score is calculated based on the remaining time from the turn clock
         """
-        return self.turn_timeout - floor(time.time() - self.turn.start_time)
+        return self.turn_timeout - floor(self.scheduler.time() - self.turn.start_time)
 
     def _apply_score_updates(self):
         """
-        Updates each player's score based on the score stored in player_score_update for the current turn
+        Updates each player's score based on the score stored in player_score_update for the current turn, returns the changes to send
         """
-        for s, p in self.state.players.items():
-            p.score += self.turn.player_score_update.get(s, 0)
+        updates = [
+            self.state.update_player(
+                p, score=p.score + self.turn.player_score_update.get(s, 0)
+            )
+            for s, p in self.state.players.items()
+        ]
+        return [update for update in updates if update]
 
     def _on_timeout(self):
         """
         Handles turn timeout by creating a turn end action with a timeout reason and sending it to all players, signaling the end of the turn
         """
-        turn_end_action = self.build_turn_end(TurnEndReason.TIMEOUT)
-        for s, p in self.state.players.items():
-            ActionProtocol.send_batch(s, turn_end_action)
+        self.outbox.broadcast(self.build_turn_end(TurnEndReason.TIMEOUT))
 
     def _player_iter(self):
         """
-        Cycles through players, assigns turns, starts a timer, and sends a "choose word" action for each round until the max rounds are reached
+        Goes around the players once per round, assigns turns and sends a "choose word" action until the max rounds are reached.
+        every round takes the players in the room when it starts, so a player who joins in the middle of a round
+        gets their turn from the next one on, and a player who left is skipped
         """
-        for i, p in enumerate(cycle(self.state.players.items())):
-            self.round = (i // len(self.state.players)) + 1
-            if self.round > self.max_rounds:
-                return
-
-            for s, player in self.state.players.items():
-                player.is_player_turn = p[0] == s
-            self.turn = Turn(timer=threading.Timer(self.turn_timeout, self._on_timeout))
-            self.turn.active_player = p[0]
-            self._sendChooseWordAction()
-            yield p
+        for self.round in range(1, self.max_rounds + 1):
+            for conn in list(self.state.players):
+                if conn not in self.state.players:
+                    continue
+                updates = [
+                    self.state.update_player(player, is_player_turn=conn == s)
+                    for s, player in self.state.players.items()
+                ]
+                self.turn = Turn()
+                self.turn.active_player = conn
+                self._sendChooseWordAction([update for update in updates if update])
+                yield conn, self.state.players[conn]
 
-    def _sendChooseWordAction(self):
+    def _sendChooseWordAction(self, updates: list[Action]):
         """
-        Sends a "choose word" action to the active player and updates the player list for all players in the game
+        Sends a "choose word" action to the active player and whose turn it is now to all players in the game
         """
         choose_word_action = ChooseWordAction(self.word_manager.get_word_options())
-        player_list_action = PlayerListAction(self.state.get_player_list())
-        for s, p in self.state.players.items():
-            actions = [player_list_action]
-            if s == self.turn.active_player:
-                actions.append(choose_word_action)
-            ActionProtocol.send_batch(s, actions)
+        if updates:
+            self.outbox.broadcast(updates, exclude=self.turn.active_player)
+        self.outbox.send(self.turn.active_player, [*updates, choose_word_action])
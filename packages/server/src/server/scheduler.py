@@ -0,0 +1,100 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable
+
+type Dispatch = Callable[[Callable[[], None]], None]
+
+
+class TimerHandle:
+    """
+    A call waiting in the scheduler, cancel() makes sure it never runs
+    """
+
+    __slots__ = ("when", "func", "args", "cancelled")
+
+    def __init__(self, when: float, func: Callable, args: tuple):
+        self.when = when
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        if self.cancelled:
+            return
+        try:
+            self.func(*self.args)
+        except Exception:
+            logging.exception("Error in scheduled call %s", self.func)
+
+
+class Scheduler:
+    """
+    Runs the delayed calls of every room (turn timeouts, turn end and game over delays, draw ticks)
+    from a heap on a single thread, instead of a sleeping threading.Timer thread per call.
+    by default the calls run on the scheduler thread (the threaded server mode),
+    dispatch hands them over somewhere else, e.g. loop.call_soon_threadsafe runs them on the event loop (the asyncio server mode)
+    """
+
+    def __init__(self, dispatch: Dispatch = None):
+        self.dispatch = dispatch
+        self.heap: list[tuple[float, int, TimerHandle]] = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread: threading.Thread = None
+
+    def time(self) -> float:
+        """
+        The clock the delays are measured on, the rooms read the time from here so a simulation can swap it
+        """
+        return time.monotonic()
+
+    def __len__(self):
+        with self.condition:
+            return sum(not handle.cancelled for _, _, handle in self.heap)
+
+    def call_later(self, delay: float, func: Callable, *args) -> TimerHandle:
+        """
+        Schedules func(*args) to run after delay seconds, calls due at the same time run in the order they were scheduled
+        """
+        handle = TimerHandle(self.time() + delay, func, args)
+        with self.condition:
+            heapq.heappush(self.heap, (handle.when, next(self.counter), handle))
+            if not self.thread:
+                self.thread = threading.Thread(
+                    target=self._scheduler_thread_main, daemon=True
+                )
+                self.thread.start()
+            if self.heap[0][2] is handle:
+                # the thread may be sleeping until a later call
+                self.condition.notify()
+        return handle
+
+    def _scheduler_thread_main(self):
+        """
+        Waits for the earliest call to be due and runs it, forever
+        """
+        while True:
+            handle = self._next_due()
+            if self.dispatch:
+                self.dispatch(handle._run)
+            else:
+                handle._run()
+
+    def _next_due(self) -> TimerHandle:
+        with self.condition:
+            while True:
+                while self.heap and self.heap[0][2].cancelled:
+                    heapq.heappop(self.heap)
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                delay = self.heap[0][0] - self.time()
+                if delay <= 0:
+                    return heapq.heappop(self.heap)[2]
+                self.condition.wait(delay)
@@ -1,19 +1,65 @@
-import socket
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
+from uuid import UUID
 
-from shared.chat_message import ChatMessage
+from shared.actions.player_update_action import PlayerUpdateAction, PlayerUpdateKind
 from shared.player import Player
 
+from server.chat_history import ChatHistory
+from server.connection import Connection
+
 
 @dataclass
 class ServerState:
     """
-    Manages the game state, including whether the game is playing, a dictionary of players, and a list of chat messages. It also provides a method to get the list of players
+    Manages the game state, including whether the game is playing, the players (by connection and by id), and the chat history. It also provides a method to get the list of players.
+    players are only changed through add_player, remove_player and update_player, which return the PlayerUpdateAction to send to the others
     """
 
     is_playing: bool = False
-    players: dict[socket.socket, Player] = field(default_factory=dict)
-    chat_messages: list[ChatMessage] = field(default_factory=list)
+    players: dict[Connection, Player] = field(default_factory=dict)
+    players_by_id: dict[UUID, Player] = field(default_factory=dict)
+    chat: ChatHistory = field(default_factory=ChatHistory)
 
     def get_player_list(self):
         return list(self.players.values())
+
+    def add_player(self, conn: Connection, player: Player) -> PlayerUpdateAction:
+        self.players[conn] = player
+        self.players_by_id[player.id] = player
+        return PlayerUpdateAction(
+            player.id,
+            player.version,
+            PlayerUpdateKind.JOINED,
+            len(self.players),
+            {f.name: getattr(player, f.name) for f in fields(Player)},
+        )
+
+    def remove_player(self, conn: Connection) -> PlayerUpdateAction:
+        player = self.players.pop(conn)
+        del self.players_by_id[player.id]
+        player.version += 1
+        return PlayerUpdateAction(
+            player.id, player.version, PlayerUpdateKind.LEFT, len(self.players)
+        )
+
+    def update_player(self, player: Player, **changes) -> PlayerUpdateAction | None:
+        """
+        Sets the given fields of the player, returns None if none of them actually changed
+        """
+        changes = {
+            name: value
+            for name, value in changes.items()
+            if getattr(player, name) != value
+        }
+        if not changes:
+            return None
+        for name, value in changes.items():
+            setattr(player, name, value)
+        player.version += 1
+        return PlayerUpdateAction(
+            player.id,
+            player.version,
+            PlayerUpdateKind.CHANGED,
+            len(self.players),
+            changes,
+        )
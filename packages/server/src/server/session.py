@@ -0,0 +1,52 @@
+import secrets
+from typing import Hashable
+
+from server.connection import Connection
+from server.scheduler import TimerHandle
+
+
+class Session(Connection):
+    """
+    A player as the lobby and the rooms see them, it outlives the network connection the client came with.
+    when the connection drops the session stays in its room for a grace period, and a client presenting its resume token
+    gets it back on a new connection. frames sent while there is no connection are dropped, the room's replay ring still has them
+    """
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.resume_token = secrets.token_urlsafe(16)
+        # removes the player from its room once the grace period is over
+        self.expiry: TimerHandle = None
+
+    @property
+    def addr(self):
+        return self.conn.addr if self.conn else None
+
+    @property
+    def queue(self):
+        return self.conn.queue
+
+    def send_frame(self, frame: bytes, key: Hashable = None):
+        conn = self.conn
+        if conn:
+            conn.send_frame(frame, key)
+
+    def close(self):
+        conn = self.conn
+        if conn:
+            conn.close()
+
+    def attach(self, conn: Connection):
+        """
+        Moves the session to a new connection, cancelling its expiry
+        """
+        if self.expiry:
+            self.expiry.cancel()
+            self.expiry = None
+        self.conn = conn
+
+    def detach(self):
+        """
+        Marks the session as waiting for its client to come back
+        """
+        self.conn = None
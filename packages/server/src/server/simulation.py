@@ -0,0 +1,336 @@
+import heapq
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
+from uuid import UUID
+
+from shared import codec
+from shared.actions import Action
+from shared.actions.chat_message_action import ChatMessageAction
+from shared.actions.choose_word_action import ChooseWordAction
+from shared.actions.draw_action import DrawAction
+from shared.actions.game_over_action import GameOverAction
+from shared.actions.init_game_state_action import InitGameStateAction
+from shared.actions.player_name_action import PlayerNameAction
+from shared.actions.start_game_action import StartGameAction
+from shared.actions.turn_end_action import TurnEndAction
+from shared.actions.turn_start_action import TurnStartAction
+from shared.actions.work_picked_action import WordPickedAction
+from shared.chat_message import ChatMessage
+from shared.color import Color
+from shared.colors import BLACK
+from shared.point import Point
+from shared.protocol import HEADER_SIZE, ActionProtocol
+
+from server.connection import Connection
+from server.outbound_queue import OutboundQueue
+from server.room import Room
+from server.scheduler import Scheduler, TimerHandle
+from server.strokes import DEFAULT_DRAW_TICK_HZ
+
+# the simulated drawers only draw in black, strokes need a Color (BLACK is a plain tuple for the chat)
+STROKE_COLOR = Color(*BLACK)
+
+
+class SimulationError(RuntimeError):
+    pass
+
+
+class VirtualScheduler(Scheduler):
+    """
+    A scheduler on a virtual clock: nothing runs on its own, the simulation moves the clock forward
+    to the next due call and runs it on its own thread. a game that takes minutes takes as long as its handlers do
+    """
+
+    def __init__(self, start: float = 0.0):
+        super().__init__()
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def call_later(self, delay: float, func: Callable, *args) -> TimerHandle:
+        handle = TimerHandle(self.now + delay, func, args)
+        heapq.heappush(self.heap, (handle.when, next(self.counter), handle))
+        return handle
+
+    def run_next(self) -> bool:
+        """
+        Moves the clock to the next call that wasn't cancelled and runs it, returns False if nothing is scheduled
+        """
+        while self.heap:
+            when, _, handle = heapq.heappop(self.heap)
+            if handle.cancelled:
+                continue
+            self.now = max(self.now, when)
+            handle._run()
+            return True
+        return False
+
+
+class MemoryConnection(Connection):
+    """
+    The server end of an in-memory transport pair: frames are put in the inbox of the player at the other end
+    as they are sent, without a queue or a socket in between. unless the simulation runs on the wire format
+    the frames are the numbered action lists themselves
+    """
+
+    def __init__(self, player: "SimPlayer"):
+        self.player = player
+        self.addr = player.name
+        self.queue = OutboundQueue()
+        self.closed = False
+
+    def send_frame(self, frame: bytes | list[Action], key: Hashable = None):
+        if frame and not self.closed:
+            if not self.player.inbox:
+                self.player.sim.ready.append(self.player)
+            self.player.inbox.append(frame)
+
+    def close(self):
+        self.closed = True
+
+    def abort(self):
+        self.closed = True
+
+
+class SimPlayer:
+    """
+    A scripted player at the client end of a MemoryConnection. it reacts to the frames the room sends the way a person would:
+    picks a word and draws some strokes when it's its turn, otherwise makes a few wrong guesses
+    and the right one (with a chance of hit_rate) at random times during the turn.
+    what it sends goes straight to the room's handle_batch, its delays are calls on the virtual scheduler
+    """
+
+    def __init__(self, sim: "Simulation", name: str, rng: random.Random):
+        self.sim = sim
+        self.name = name
+        self.rng = rng
+        self.conn = MemoryConnection(self)
+        self.inbox: list[bytes | list[Action]] = []
+        self.bytes_received = 0
+        self.picked_word: str = None
+        # the guesses of the running turn, cancelled when it ends
+        self.timers: list[TimerHandle] = []
+        self.actionsMap: dict[type[Action], Callable[[Action], None]] = {
+            ChooseWordAction: self._on_choose_word,
+            TurnStartAction: self._on_turn_start,
+            TurnEndAction: self._on_turn_end,
+            GameOverAction: self._on_game_over,
+            InitGameStateAction: self._on_init_game_state,
+        }
+
+    def deliver(self):
+        """
+        Reacts to the frames waiting in the inbox (decoding them first on the wire format)
+        """
+        frames, self.inbox = self.inbox, []
+        for frame in frames:
+            if self.sim.config.wire:
+                self.bytes_received += len(frame)
+                frame = self.sim.decode(frame)
+            for action in frame:
+                handler = self.actionsMap.get(type(action))
+                if handler:
+                    handler(action)
+
+    def send(self, actions: list[Action]):
+        self.sim.room.handle_batch(actions, self.conn)
+
+    def _on_init_game_state(self, action: InitGameStateAction):
+        self.send([PlayerNameAction(self.name)])
+
+    def _on_choose_word(self, action: ChooseWordAction):
+        self.picked_word = self.rng.choice(action.options)
+        self._later(
+            self.rng.uniform(1, 5), self.send, [WordPickedAction(self.picked_word)]
+        )
+
+    def _on_turn_start(self, action: TurnStartAction):
+        config = self.sim.config
+        if action.word == self.picked_word:
+            self.sim.word = self.picked_word
+            self.sim.turns += 1
+            # the strokes come in batches, like the client sends them.
+            # the room copies what it keeps, so the same batch is sent every time instead of walking a new one
+            strokes = self._strokes(config.strokes_per_batch)
+            for i in range(config.draw_batches):
+                self._later((i + 1) * config.draw_interval, self.send, strokes)
+            return
+        for _ in range(config.wrong_guesses):
+            self._later(
+                self.rng.uniform(0, action.time),
+                self._guess,
+                f"{self.name} {self.rng.random():.6f}",
+            )
+        if self.rng.random() < config.hit_rate:
+            self._later(self.rng.uniform(1, action.time), self._guess, None)
+
+    def _on_turn_end(self, action: TurnEndAction):
+        for timer in self.timers:
+            timer.cancel()
+        self.timers = []
+        self.picked_word = None
+
+    def _on_game_over(self, action: GameOverAction):
+        self.sim.game_over = action
+
+    def _guess(self, text: str):
+        """
+        Sends a guess, None stands for the right word (only the simulation knows it)
+        """
+        text = text or self.sim.word
+        self.send([ChatMessageAction(ChatMessage(self.name, text, BLACK))])
+
+    def _strokes(self, count: int) -> list[DrawAction]:
+        # random() is a lot cheaper than randint() and this runs for every segment
+        random = self.rng.random
+        x, y = int(random() * 700), int(random() * 500)
+        strokes = []
+        for _ in range(count):
+            nx, ny = x + int(random() * 17) - 8, y + int(random() * 17) - 8
+            strokes.append(DrawAction(Point(x, y), Point(nx, ny), STROKE_COLOR, 5))
+            x, y = nx, ny
+        return strokes
+
+    def _later(self, delay: float, func: Callable, *args):
+        self.timers.append(self.sim.scheduler.call_later(delay, func, *args))
+
+
+@dataclass
+class SimulationConfig:
+    players: int = 4
+    # players who join once the game is running, late_join_delay virtual seconds after it started
+    late_players: int = 0
+    late_join_delay: float = 90
+    # the chance that a guesser finds the word before the turn times out
+    hit_rate: float = 0.8
+    wrong_guesses: int = 2
+    draw_batches: int = 5
+    strokes_per_batch: int = 10
+    # virtual seconds between the drawer's stroke batches
+    draw_interval: float = 0.5
+    draw_tick_hz: float = DEFAULT_DRAW_TICK_HZ
+    # a game that isn't over after this many scheduled calls is stuck
+    max_steps: int = 100_000
+    # sends every frame through the codec like a network connection, slower but it counts the bytes.
+    # otherwise the players get the action lists the room sends as they are
+    wire: bool = False
+
+
+@dataclass
+class GameResult:
+    seed: int
+    # in join order
+    scores: dict[str, int]
+    winners: list[str]
+    turns: int
+    # virtual seconds from the start of the game to the game over
+    duration: float
+    steps: int
+    frames: int = 0
+    # only counted on the wire format. not compared, the frames carry the random player ids and their size changes with them
+    bytes: int = field(default=0, compare=False)
+
+
+class Simulation:
+    """
+    Plays a whole game in a single Room with scripted players over in-memory connections, on a virtual clock.
+    everything random (the room's choices and the players') comes from the seed, so a seed always plays the same game.
+    the player ids are the only thing that differs between runs, which is why results name players instead
+    """
+
+    def __init__(self, seed: int, config: SimulationConfig = None):
+        self.seed = seed
+        self.config = config or SimulationConfig()
+        rng = random.Random(seed)
+        self.scheduler = VirtualScheduler()
+        self.room = Room(
+            f"SIM{seed}",
+            lambda room: None,
+            self.scheduler,
+            self.config.draw_tick_hz,
+            rng=random.Random(rng.random()),
+            encode_frame=ActionProtocol.encode_frame if self.config.wire else list,
+        )
+        self.players = [
+            SimPlayer(self, f"player{i}", random.Random(rng.random()))
+            for i in range(self.config.players + self.config.late_players)
+        ]
+        # the names of the room's player ids
+        self.names: dict[UUID, str] = {}
+        # the word of the running turn, the guessers get it right through it
+        self.word: str = None
+        self.game_over: GameOverAction = None
+        self.turns = 0
+        # the players with frames in their inbox, in the order the first one arrived
+        self.ready: list[SimPlayer] = []
+        # the frames decoded while delivering, see decode()
+        self.decoded: dict[bytes, list[Action]] = {}
+
+    def run(self) -> GameResult:
+        """
+        Joins the players, starts the game and alternates between delivering frames and running the next due call until the game is over
+        """
+        for player in self.players[: self.config.players]:
+            self._join(player)
+            self._deliver()
+        # the room starts over with a new state once the game is over, this one keeps the final scores
+        state = self.room.state
+        self.players[0].send([StartGameAction()])
+        for player in self.players[self.config.players :]:
+            self.scheduler.call_later(self.config.late_join_delay, self._join, player)
+        steps = 0
+        while not self.game_over:
+            if self._deliver():
+                continue
+            if steps >= self.config.max_steps or not self.scheduler.run_next():
+                raise SimulationError(f"game {self.seed} got stuck after {steps} steps")
+            steps += 1
+        return GameResult(
+            self.seed,
+            {self.names[player.id]: player.score for player in state.get_player_list()},
+            [self.names[id] for id in self.game_over.winners],
+            self.turns,
+            self.scheduler.now,
+            steps,
+            self.room.outbox.seq,
+            sum(player.bytes_received for player in self.players),
+        )
+
+    def decode(self, frame: bytes) -> list[Action]:
+        """
+        Decodes a frame on the wire format, a broadcast reaches every player as the same frame so it is only decoded once
+        """
+        actions = self.decoded.get(frame)
+        if actions is None:
+            actions = self.decoded[frame] = codec.decode(
+                memoryview(frame)[HEADER_SIZE:]
+            )
+        return actions
+
+    def _join(self, player: SimPlayer):
+        self.room.join(player.conn)
+        self.names[self.room.state.players[player.conn].id] = player.name
+
+    def _deliver(self) -> bool:
+        """
+        Delivers until no player has anything left to react to, returns False if nothing was waiting
+        """
+        if not self.ready:
+            return False
+        while self.ready:
+            ready, self.ready = self.ready, []
+            for player in ready:
+                player.deliver()
+        self.decoded.clear()
+        return True
+
+
+def run_games(
+    seeds: range | list[int], config: SimulationConfig = None
+) -> list[GameResult]:
+    """
+    Plays a game for every seed, e.g. for a regression test that compares the results with known ones
+    """
+    return [Simulation(seed, config).run() for seed in seeds]
@@ -0,0 +1,267 @@
+import math
+import threading
+import time
+from array import array
+from typing import Iterator
+
+from shared.actions.draw_action import DrawAction
+from shared.actions.draw_timing_action import DrawTimingAction
+
+from server.connection import Connection
+from server.outbox import Outbox
+from server.scheduler import Scheduler, TimerHandle
+
+DEFAULT_DRAW_TICK_HZ = 30
+# pixels on a side of the grid cells CoverGrid checks the canvas on
+COVER_CELL = 4
+# how far a drawn pixel may be from the ideal capsule of its stroke (the points are truncated and the edges rasterized)
+COVER_MARGIN = 1.5
+# a cell touches a stroke if its center is this much closer than the stroke's edge, and is inside it if it is this much further in
+COVER_HALF_CELL = COVER_CELL * math.sqrt(2) / 2
+# rows of cells above the top of the canvas CoverGrid keeps, the brush of a stroke along the edge reaches over it
+COVER_ROWS_ABOVE = 16
+
+
+def merge_segments(strokes: list[DrawAction]) -> list[DrawAction]:
+    """
+    Merges chained segments (one starts where the previous one ended) that share color and brush
+    and keep going in the same direction, they are drawn exactly the same as one longer segment.
+    a segment repeating the previous one is dropped, it paints the same pixels again
+    """
+    merged: list[DrawAction] = []
+    for stroke in strokes:
+        if merged and stroke == merged[-1]:
+            continue
+        if merged and _continues(merged[-1], stroke):
+            last = merged[-1]
+            merged[-1] = DrawAction(last.start, stroke.end, last.color, last.brush_size)
+        else:
+            merged.append(stroke)
+    return merged
+
+
+def _continues(last: DrawAction, stroke: DrawAction) -> bool:
+    """
+    Checks if stroke extends last along the same straight line
+    """
+    if (
+        last.end != stroke.start
+        or last.color != stroke.color
+        or last.brush_size != stroke.brush_size
+    ):
+        return False
+    dx1, dy1 = last.end.x - last.start.x, last.end.y - last.start.y
+    dx2, dy2 = stroke.end.x - stroke.start.x, stroke.end.y - stroke.start.y
+    if (dx1 == 0 and dy1 == 0) or (dx2 == 0 and dy2 == 0):
+        # a dot has no direction, and the end of the previous segment is only drawn by it
+        return False
+    return abs(dx1 * dy2 - dy1 * dx2) < 1e-6 and dx1 * dx2 + dy1 * dy2 > 0
+
+
+class CoverGrid:
+    """
+    Remembers which stroke painted over every cell of the canvas last, on a grid of small cells.
+    strokes are known by increasing numbers in the order they were drawn: a stroke is hidden once every cell it touches
+    was painted over by a stroke numbered after it. a stroke paints over a cell only if it is opaque
+    and the cell is inside it even with the rasterizing margin, so a stroke that is still partly visible is never hidden.
+    a stroke found visible keeps the cell it shows through, checking it again is free until that cell is painted over
+    """
+
+    def __init__(self):
+        # a column of cells per item, every cell holds the number of the last stroke that painted over it (0 for none).
+        # the rows start COVER_ROWS_ABOVE above the canvas
+        self.columns: dict[int, array] = {}
+        # the cell (column, row in the column) every stroke found visible still shows through
+        self.witnesses: dict[int, tuple[int, int]] = {}
+
+    def paint(self, stroke: DrawAction, number: int):
+        """
+        Marks the cells the stroke paints over as painted by it
+        """
+        if stroke.color.a != 255:
+            return
+        covers = stroke.brush_size - COVER_MARGIN - COVER_HALF_CELL
+        if covers <= 0:
+            return
+        for column, low, high in _cell_spans(stroke, covers):
+            low, high = max(low + COVER_ROWS_ABOVE, 0), high + COVER_ROWS_ABOVE
+            if high < low:
+                # too far off the canvas, checking a stroke there finds it isn't covered
+                continue
+            cells = self.columns.get(column)
+            if cells is None:
+                cells = self.columns[column] = array("I")
+            if len(cells) <= high:
+                cells.extend(bytes(4 * (high + 1 - len(cells))))
+            cells[low : high + 1] = array("I", [number]) * (high + 1 - low)
+
+    def still_visible(self, number: int) -> bool:
+        """
+        Checks if the stroke was found visible and nothing was painted over the cell it showed through since,
+        without looking at the stroke itself
+        """
+        witness = self.witnesses.get(number)
+        return witness is not None and self._shows(*witness, number)
+
+    def is_hidden(self, stroke: DrawAction, number: int) -> bool:
+        """
+        Checks if strokes drawn after it painted over every cell the stroke touches
+        """
+        touches = stroke.brush_size + COVER_MARGIN + COVER_HALF_CELL
+        for column, low, high in _cell_spans(stroke, touches):
+            low, high = low + COVER_ROWS_ABOVE, high + COVER_ROWS_ABOVE
+            cells = self.columns.get(column)
+            if cells is None or low < 0 or high >= len(cells):
+                self.witnesses[number] = (column, low if low < 0 else high)
+                return False
+            last = min(cells[low : high + 1])
+            if last <= number:
+                self.witnesses[number] = (column, cells.index(last, low, high + 1))
+                return False
+        self.forget(number)
+        return True
+
+    def forget(self, number: int):
+        """
+        Drops what is known about a stroke that is no longer on the canvas
+        """
+        self.witnesses.pop(number, None)
+
+    def clear(self):
+        self.columns = {}
+        self.witnesses = {}
+
+    def _shows(self, column: int, row: int, number: int) -> bool:
+        cells = self.columns.get(column)
+        return cells is None or not 0 <= row < len(cells) or cells[row] <= number
+
+
+def _cell_spans(stroke: DrawAction, distance: float) -> Iterator[tuple[int, int, int]]:
+    """
+    The cells with their center within distance of the stroke's segment (a capsule), as (column, first row, last row) spans.
+    the points are truncated to whole pixels like the client draws them
+    """
+    x0, y0 = int(stroke.start.x), int(stroke.start.y)
+    x1, y1 = int(stroke.end.x), int(stroke.end.y)
+    dx, dy = x1 - x0, y1 - y0
+    length = math.hypot(dx, dy)
+    ux, uy = (dx / length, dy / length) if length else (0.0, 0.0)
+    square = distance * distance
+    for column in range(
+        math.ceil((min(x0, x1) - distance) / COVER_CELL - 0.5),
+        math.floor((max(x0, x1) + distance) / COVER_CELL - 0.5) + 1,
+    ):
+        x = (column + 0.5) * COVER_CELL
+        # the capsule is convex, so the vertical line at x crosses it in one span:
+        # the union of where it crosses the end circles and the band between them
+        low, high = math.inf, -math.inf
+        h = square - (x - x0) * (x - x0)
+        if h >= 0:
+            h = math.sqrt(h)
+            low, high = y0 - h, y0 + h
+        h = square - (x - x1) * (x - x1)
+        if h >= 0:
+            h = math.sqrt(h)
+            low, high = min(low, y1 - h), max(high, y1 + h)
+        if length:
+            # t = y - y0, the band is where 0 <= (x - x0) * ux + t * uy <= length
+            # and -distance <= (x - x0) * uy - t * ux <= distance
+            along, across = (x - x0) * ux, (x - x0) * uy
+            band_low, band_high = -math.inf, math.inf
+            if uy:
+                band_low, band_high = sorted(((-along) / uy, (length - along) / uy))
+            elif not 0 <= along <= length:
+                band_low = math.inf
+            if ux:
+                first, second = sorted(
+                    ((across - distance) / ux, (across + distance) / ux)
+                )
+                band_low, band_high = max(band_low, first), min(band_high, second)
+            elif abs(across) > distance:
+                band_low = math.inf
+            if band_low <= band_high:
+                low, high = min(low, y0 + band_low), max(high, y0 + band_high)
+        if low <= high:
+            first_row = math.ceil(low / COVER_CELL - 0.5)
+            last_row = math.floor(high / COVER_CELL - 0.5)
+            if first_row <= last_row:
+                yield column, first_row, last_row
+
+
+class DrawTick:
+    """
+    Collects the strokes a room receives and broadcasts them once per tick as a single frame,
+    instead of forwarding every small client batch the moment it arrives.
+    the tick is only armed while there are strokes waiting, an idle room costs nothing
+    """
+
+    def __init__(
+        self, outbox: Outbox, scheduler: Scheduler, hz: float = DEFAULT_DRAW_TICK_HZ
+    ):
+        self.outbox = outbox
+        self.scheduler = scheduler
+        self.interval = 1 / hz if hz else 0
+        self.pending: dict[Connection, list[DrawAction]] = {}
+        # the timing stamps of the pending strokes, sent right after them
+        self.timings: dict[Connection, list[DrawTimingAction]] = {}
+        self.lock = threading.Lock()
+        self.timer: TimerHandle = None
+
+    def add(self, strokes: list[DrawAction], conn: Connection):
+        """
+        Queues strokes drawn by conn for the next tick (or forwards them right away if the tick is disabled)
+        """
+        if not self.interval:
+            self.outbox.broadcast(strokes, exclude=conn)
+            return
+        with self.lock:
+            self.pending.setdefault(conn, []).extend(strokes)
+            if not self.timer:
+                self.timer = self.scheduler.call_later(self.interval, self.flush)
+
+    def add_timing(self, timings: list[DrawTimingAction], conn: Connection):
+        """
+        Queues the timing stamps of strokes drawn by conn, they are forwarded with the strokes they came with
+        """
+        if not self.interval:
+            self._stamp_forwarded(timings)
+            self.outbox.broadcast(timings, exclude=conn)
+            return
+        with self.lock:
+            self.timings.setdefault(conn, []).extend(timings)
+            if not self.timer:
+                self.timer = self.scheduler.call_later(self.interval, self.flush)
+
+    def flush(self):
+        """
+        Broadcasts everything collected since the last tick, every drawer's strokes go to everyone but them
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            timings, self.timings = self.timings, {}
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+        for conn in pending.keys() | timings.keys():
+            conn_timings = timings.get(conn, [])
+            self._stamp_forwarded(conn_timings)
+            self.outbox.broadcast(
+                [*merge_segments(pending.get(conn, [])), *conn_timings],
+                exclude=conn,
+            )
+
+    def discard(self):
+        """
+        Drops whatever is waiting without sending it
+        """
+        with self.lock:
+            self.pending = {}
+            self.timings = {}
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+
+    def _stamp_forwarded(self, timings: list[DrawTimingAction]):
+        now = time.monotonic()
+        for timing in timings:
+            timing.forwarded = now
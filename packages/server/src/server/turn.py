@@ -1,8 +1,20 @@
-import socket
-import threading
+import itertools
+from array import array
 from dataclasses import dataclass, field
 
 from shared.actions.draw_action import DrawAction
+from shared.stroke_buffer import StrokeBuffer
+
+from server.connection import Connection
+from server.scheduler import TimerHandle
+from server.strokes import CoverGrid, merge_segments
+
+# the canvas log is checked for strokes painted over once it has this many, so a long scribble doesn't grow it forever
+CANVAS_COMPACT_AT = 1000
+# how many canvas strokes add_strokes checks for every stroke it adds, and at most in one call.
+# the whole log is checked a few strokes at a time, a lot faster than it grows
+COMPACT_PER_STROKE = 8
+COMPACT_STEP = 256
 
 
 @dataclass
@@ -11,9 +23,73 @@ class Turn:
     Represents a single turn in the game, with a timer for timeouts, a word to be guessed, the active player, drawing actions, player score updates, and a timestamp for when the turn started. It manages the state and progress of the game during each turn
     """
 
-    timer: threading.Timer
+    timeout: TimerHandle = None
     word: str = None
-    active_player: socket.socket = None
-    draw_actions: list[DrawAction] = field(default_factory=list)
-    player_score_update: dict[socket.socket, int] = field(default_factory=dict)
+    active_player: Connection = None
+    draw_actions: StrokeBuffer = field(default_factory=StrokeBuffer)
+    # what is on the canvas right now: the strokes since the last clear, merged as they come in
+    canvas: StrokeBuffer = field(default_factory=StrokeBuffer)
+    # the numbers of the canvas strokes in the order they were drawn, the cover grid knows them by it
+    canvas_numbers: array = field(default_factory=lambda: array("I"))
+    cover: CoverGrid = field(default_factory=CoverGrid)
+    next_number: int = 1
+    # the next canvas stroke to check and the ones found painted over since the check started from the first one
+    compact_next: int = 0
+    hidden: list[int] = field(default_factory=list)
+    player_score_update: dict[Connection, int] = field(default_factory=dict)
     start_time: float = None
+
+    def add_strokes(self, strokes: list[DrawAction]):
+        """
+        Records strokes in the full log and merges them into the canvas log, only the last canvas stroke can continue into them.
+        once the canvas log is big enough every call also checks a few of its strokes for being painted over
+        """
+        self.draw_actions.extend(strokes)
+        tail = []
+        if self.canvas:
+            tail.append(self.canvas.pop())
+            self.cover.forget(self.canvas_numbers.pop())
+        merged = merge_segments(tail + strokes)
+        for stroke in merged:
+            self.cover.paint(stroke, self.next_number)
+            self.canvas_numbers.append(self.next_number)
+            self.next_number += 1
+        self.canvas.extend(merged)
+        if len(self.canvas) >= CANVAS_COMPACT_AT:
+            self._compact_step(min(COMPACT_PER_STROKE * len(strokes), COMPACT_STEP))
+
+    def clear_canvas(self):
+        """
+        Nothing drawn before a clear is visible anymore, so a late joiner doesn't need it
+        """
+        self.canvas.clear()
+        del self.canvas_numbers[:]
+        self.cover.clear()
+        self.compact_next = 0
+        self.hidden = []
+
+    def _compact_step(self, count: int):
+        """
+        Checks the next count canvas strokes, once all of them were checked the ones painted over are dropped.
+        the last stroke can still be continued by the next batch, so it is never checked
+        """
+        end = min(self.compact_next + count, len(self.canvas) - 1)
+        for i in range(self.compact_next, end):
+            number = self.canvas_numbers[i]
+            if not self.cover.still_visible(number) and self.cover.is_hidden(
+                self.canvas[i], number
+            ):
+                self.hidden.append(i)
+        self.compact_next = end
+        if end < len(self.canvas) - 1:
+            return
+        if self.hidden:
+            keep = [True] * len(self.canvas)
+            for i in self.hidden:
+                keep[i] = False
+            self.canvas = self.canvas.compress(keep)
+            self.canvas_numbers = array(
+                "I", itertools.compress(self.canvas_numbers, keep)
+            )
+        self.compact_next = 0
+        self.hidden = []
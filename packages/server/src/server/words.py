@@ -2,13 +2,15 @@ import random
 
 
 class WordManager:
-    def __init__(self, words):
+    def __init__(self, words, rng: random.Random = None):
         """
         initializes the WordManager with a pool of words.
         It creates a list of all words (full_word_pool),
         a set of available words (available_words),
-        and a set of used words (used_words) to track the words that have already been chosen
+        and a set of used words (used_words) to track the words that have already been chosen.
+        the options are drawn with rng (a new unseeded one if not given)
         """
+        self.rng = rng or random.Random()
         self.full_word_pool = list(words)
         self.available_words = set(words)
         self.used_words = set()
@@ -21,7 +23,7 @@ class WordManager:
         if len(self.available_words) < count:
             raise ValueError("Not enough words left to choose from. Please reset.")
 
-        options = random.sample(sorted(self.available_words), count)
+        options = self.rng.sample(sorted(self.available_words), count)
         return options
 
     def pick_word(self, word):
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+from shared.chat_message import ChatMessage
+
+
+@dataclass
+class ChatHistoryAction(Action):
+    """
+    a page of older chat messages, first is the number of the first one.
+    an empty page means the server doesn't keep anything older
+    """
+
+    messages: list[ChatMessage]
+    first: int
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class ChatHistoryRequestAction(Action):
+    """
+    asks the server for the chat messages sent before the message numbered before, it answers with a ChatHistoryAction
+    """
+
+    before: int
+    count: int
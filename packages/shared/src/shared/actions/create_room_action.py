@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class CreateRoomAction(Action):
+    """
+    asks the server to open a new room and join it
+    """
+
+    pass
@@ -1,13 +1,13 @@
 from dataclasses import dataclass
 
-import pygame
-
 from shared.actions import Action
+from shared.color import Color
+from shared.point import Point
 
 
 @dataclass
 class DrawAction(Action):
-    start: pygame.Vector2
-    end: pygame.Vector2
-    color: pygame.color.Color
+    start: Point
+    end: Point
+    color: Color
     brush_size: int
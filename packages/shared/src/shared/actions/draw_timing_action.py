@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class DrawTimingAction(Action):
+    """
+    follows the strokes of a batch on their way from the drawer to the other players, when the drawer measures draw latency.
+    all the times are on the server's clock (the drawer converts its own with its clock offset estimate):
+    created is when the oldest stroke of the batch was drawn, sent is when the batch left the drawer,
+    received and forwarded are stamped by the server when the batch arrives and when it is broadcast
+    """
+
+    created: float
+    sent: float
+    received: float = 0.0
+    forwarded: float = 0.0
@@ -1,12 +1,20 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from uuid import UUID
 
 from shared.actions.player_list_action import PlayerListAction
 from shared.chat_message import ChatMessage
+from shared.stroke_buffer import StrokeBuffer
 
 
 @dataclass
 class InitGameStateAction(PlayerListAction):
     you: UUID
+    # the last page of the chat, chat_offset is the number of its first message
     chat_messages: list[ChatMessage]
     max_rounds: int
+    room_id: str = None
+    # the compacted strokes of the canvas, so a player joining mid turn sees the drawing
+    draw_actions: StrokeBuffer = field(default_factory=StrokeBuffer)
+    chat_offset: int = 0
+    # lets the client get this player back if its connection drops, see ResumeAction
+    resume_token: str = None
@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class JoinRoomAction(Action):
+    """
+    asks the server to join a room by its id, without an id the player joins the default room
+    """
+
+    room_id: str = None
@@ -0,0 +1,13 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class LeaveAction(Action):
+    """
+    the player quits on purpose, the server takes them out of their room right away
+    instead of keeping their place for a reconnect
+    """
+
+    pass
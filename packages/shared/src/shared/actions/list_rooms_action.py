@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class ListRoomsAction(Action):
+    """
+    asks the server for the open rooms, it answers with a RoomListAction
+    """
+
+    pass
@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class PingAction(Action):
+    """
+    asks the peer to answer with a PongAction, sent is the sender's clock when it was sent (see Heartbeat)
+    """
+
+    sent: float
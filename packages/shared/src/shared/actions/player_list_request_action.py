@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class PlayerListRequestAction(Action):
+    """
+    asks the server for the whole player list, it answers with a PlayerListAction
+    """
+
+    pass
@@ -0,0 +1,28 @@
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Any
+from uuid import UUID
+
+from shared.actions import Action
+
+
+class PlayerUpdateKind(StrEnum):
+    JOINED = "joined"
+    LEFT = "left"
+    CHANGED = "changed"
+
+
+@dataclass
+class PlayerUpdateAction(Action):
+    """
+    a change to a single player instead of the whole player list.
+    version is the player's version after the change, a client that doesn't have the version before it missed an update
+    and asks for the whole list again with a PlayerListRequestAction. player_count is how many players the room has after it.
+    changes holds the changed fields, or all of them when the player joined
+    """
+
+    player_id: UUID
+    version: int
+    kind: PlayerUpdateKind
+    player_count: int
+    changes: dict[str, Any] = field(default_factory=dict)
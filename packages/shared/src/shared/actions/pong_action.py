@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class PongAction(Action):
+    """
+    the answer to a PingAction, sent is copied from the ping and replied is the answering peer's clock when it answered,
+    which lets the pinging side estimate how far apart the two clocks are (see Heartbeat)
+    """
+
+    sent: float
+    replied: float = 0.0
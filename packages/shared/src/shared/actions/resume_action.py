@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class ResumeAction(Action):
+    """
+    sent instead of a JoinRoomAction by a client that lost its connection, to get its player back.
+    token is the resume token from its InitGameStateAction and last_seq the last SequenceAction it got,
+    the server then sends only the frames it missed. if the player is gone the client joins room_id again as a new player
+    """
+
+    token: str
+    last_seq: int
+    room_id: str = None
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+from shared.room_info import RoomInfo
+
+
+@dataclass
+class RoomListAction(Action):
+    rooms: list[RoomInfo]
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+
+from shared.actions import Action
+
+
+@dataclass
+class SequenceAction(Action):
+    """
+    the number of a frame in the stream of frames its room sends, it comes first in every frame a room sends.
+    a client that reconnects tells the server the last one it got (see ResumeAction).
+    prev is the number of the frame the player was sent before this one (0 for their first), the room's numbers skip
+    the frames meant for the other players so a client checks prev to know it got every frame meant for it
+    """
+
+    seq: int
+    prev: int = 0
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from enum import StrEnum
 from uuid import UUID
 
-from shared.actions.player_list_action import PlayerListAction
+from shared.actions import Action
 
 
 class TurnEndReason(StrEnum):
@@ -11,7 +11,11 @@ class TurnEndReason(StrEnum):
 
 
 @dataclass
-class TurnEndAction(PlayerListAction):
+class TurnEndAction(Action):
+    """
+    the new scores are sent as PlayerUpdateActions in the same batch, right before it
+    """
+
     word: str
     reason: TurnEndReason
     player_score_update: dict[UUID, int]
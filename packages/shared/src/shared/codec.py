@@ -0,0 +1,402 @@
+import pickle
+import struct
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Any, Callable
+from uuid import UUID
+
+from shared.actions import Action
+from shared.actions.chat_history_request_action import ChatHistoryRequestAction
+from shared.actions.chat_message_action import ChatMessageAction
+from shared.actions.clear_canvas_action import ClearCanvasAction
+from shared.actions.create_room_action import CreateRoomAction
+from shared.actions.draw_action import DrawAction
+from shared.actions.draw_timing_action import DrawTimingAction
+from shared.actions.join_room_action import JoinRoomAction
+from shared.actions.leave_action import LeaveAction
+from shared.actions.list_rooms_action import ListRoomsAction
+from shared.actions.ping_action import PingAction
+from shared.actions.player_list_request_action import PlayerListRequestAction
+from shared.actions.player_name_action import PlayerNameAction
+from shared.actions.player_update_action import PlayerUpdateAction, PlayerUpdateKind
+from shared.actions.pong_action import PongAction
+from shared.actions.resume_action import ResumeAction
+from shared.actions.sequence_action import SequenceAction
+from shared.actions.start_game_action import StartGameAction
+from shared.actions.turn_start_action import TurnStartAction
+from shared.actions.work_picked_action import WordPickedAction
+from shared.chat_message import ChatMessage
+from shared.color import Color
+from shared.point import Point
+
+# bump whenever the layout of a record (or of the payload itself) changes
+VERSION = 3
+
+# every pickle (protocol >= 2) starts with this opcode, which lets us still read payloads from peers
+# that send plain pickled batches
+PICKLE_MAGIC = 0x80
+
+FALLBACK_TYPE_ID = 0
+MAX_RUN_LENGTH = 0xFFFF
+
+_VERSION = struct.Struct("<B")
+_RUN = struct.Struct("<BH")
+_STRING = struct.Struct("<H")
+_BLOB = struct.Struct("<I")
+
+# the fields a PlayerUpdateAction can change, by their bit in the record's mask
+PLAYER_UPDATE_FIELDS = ("name", "id", "score", "is_owner", "is_player_turn", "version")
+PLAYER_UPDATE_KINDS = tuple(PlayerUpdateKind)
+
+
+class CodecError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Record:
+    """
+    The wire layout of a single action type: a fixed struct followed by a number of length-prefixed utf-8 strings.
+    dump returns the struct fields followed by the strings, load gets them back in the same order
+    """
+
+    type_id: int
+    action_type: type[Action]
+    layout: struct.Struct
+    dump: Callable[[Any], tuple]
+    load: Callable[..., Action]
+    strings: int = 0
+
+
+RECORDS: dict[type[Action], Record] = {}
+RECORDS_BY_ID: dict[int, Record] = {}
+
+
+def register(record: Record):
+    """
+    Adds a record to the registry, type ids are part of the wire format so they must never be reused
+    """
+    if record.type_id == FALLBACK_TYPE_ID or record.type_id in RECORDS_BY_ID:
+        raise ValueError(f"type id {record.type_id} is already taken")
+    RECORDS[record.action_type] = record
+    RECORDS_BY_ID[record.type_id] = record
+
+
+register(
+    Record(
+        1,
+        DrawAction,
+        struct.Struct("<4f4BH"),
+        lambda a: (a.start.x, a.start.y, a.end.x, a.end.y, *a.color, a.brush_size),
+        lambda x0, y0, x1, y1, r, g, b, alpha, size: DrawAction(
+            Point(x0, y0),
+            Point(x1, y1),
+            Color(r, g, b, alpha),
+            size,
+        ),
+    )
+)
+register(
+    Record(2, ClearCanvasAction, struct.Struct("<"), lambda a: (), ClearCanvasAction)
+)
+register(Record(3, StartGameAction, struct.Struct("<"), lambda a: (), StartGameAction))
+register(
+    Record(
+        4,
+        PlayerNameAction,
+        struct.Struct("<"),
+        lambda a: (a.name,),
+        PlayerNameAction,
+        1,
+    )
+)
+register(
+    Record(
+        5,
+        WordPickedAction,
+        struct.Struct("<"),
+        lambda a: (a.picked_word,),
+        WordPickedAction,
+        1,
+    )
+)
+register(
+    Record(
+        6,
+        ChatMessageAction,
+        struct.Struct("<3B"),
+        lambda a: (*a.message.color, a.message.player_name, a.message.text),
+        lambda r, g, b, player_name, text: ChatMessageAction(
+            ChatMessage(player_name, text, (r, g, b))
+        ),
+        2,
+    )
+)
+register(
+    Record(
+        7,
+        TurnStartAction,
+        struct.Struct("<HH"),
+        lambda a: (a.round, a.time, a.word),
+        lambda round_, time, word: TurnStartAction(word, round_, time),
+        1,
+    )
+)
+register(
+    Record(8, CreateRoomAction, struct.Struct("<"), lambda a: (), CreateRoomAction)
+)
+register(
+    Record(
+        9,
+        JoinRoomAction,
+        struct.Struct("<"),
+        lambda a: (a.room_id or "",),
+        lambda room_id: JoinRoomAction(room_id or None),
+        1,
+    )
+)
+register(Record(10, ListRoomsAction, struct.Struct("<"), lambda a: (), ListRoomsAction))
+register(
+    Record(
+        11,
+        ChatHistoryRequestAction,
+        struct.Struct("<IH"),
+        lambda a: (a.before, a.count),
+        ChatHistoryRequestAction,
+    )
+)
+register(
+    Record(
+        12,
+        PlayerListRequestAction,
+        struct.Struct("<"),
+        lambda a: (),
+        PlayerListRequestAction,
+    )
+)
+register(
+    Record(
+        13,
+        SequenceAction,
+        struct.Struct("<QQ"),
+        lambda a: (a.seq, a.prev),
+        SequenceAction,
+    )
+)
+register(
+    Record(
+        14,
+        ResumeAction,
+        struct.Struct("<Q"),
+        lambda a: (a.last_seq, a.token, a.room_id or ""),
+        lambda last_seq, token, room_id: ResumeAction(token, last_seq, room_id or None),
+        2,
+    )
+)
+register(Record(15, PingAction, struct.Struct("<d"), lambda a: (a.sent,), PingAction))
+register(
+    Record(
+        16,
+        PongAction,
+        struct.Struct("<dd"),
+        lambda a: (a.sent, a.replied),
+        PongAction,
+    )
+)
+register(
+    Record(
+        17,
+        DrawTimingAction,
+        struct.Struct("<dddd"),
+        lambda a: (a.created, a.sent, a.received, a.forwarded),
+        DrawTimingAction,
+    )
+)
+register(Record(18, LeaveAction, struct.Struct("<"), lambda a: (), LeaveAction))
+
+
+def _dump_player_update(action: PlayerUpdateAction) -> tuple:
+    """
+    Packs the changes of a PlayerUpdateAction as a mask of the changed fields followed by all of their values,
+    the id and version in the changes are the action's own so only their bits are set
+    """
+    changes = action.changes
+    if (
+        not isinstance(action.player_id, UUID)
+        or not changes.keys() <= set(PLAYER_UPDATE_FIELDS)
+        or changes.get("id", action.player_id) != action.player_id
+        or changes.get("version", action.version) != action.version
+    ):
+        raise CodecError("player update doesn't fit its record")
+    mask = sum(1 << i for i, name in enumerate(PLAYER_UPDATE_FIELDS) if name in changes)
+    return (
+        action.player_id.bytes,
+        action.version,
+        PLAYER_UPDATE_KINDS.index(action.kind),
+        action.player_count,
+        mask,
+        changes.get("score", 0),
+        changes.get("is_owner", False),
+        changes.get("is_player_turn", False),
+        changes.get("name", ""),
+    )
+
+
+def _load_player_update(
+    player_id, version, kind, player_count, mask, score, is_owner, is_player_turn, name
+) -> PlayerUpdateAction:
+    player_id = UUID(bytes=player_id)
+    values = {
+        "name": name,
+        "id": player_id,
+        "score": score,
+        "is_owner": bool(is_owner),
+        "is_player_turn": bool(is_player_turn),
+        "version": version,
+    }
+    changes = {
+        name: values[name]
+        for i, name in enumerate(PLAYER_UPDATE_FIELDS)
+        if mask & 1 << i
+    }
+    return PlayerUpdateAction(
+        player_id, version, PLAYER_UPDATE_KINDS[kind], player_count, changes
+    )
+
+
+register(
+    Record(
+        19,
+        PlayerUpdateAction,
+        struct.Struct("<16sIBHBI??"),
+        _dump_player_update,
+        _load_player_update,
+        1,
+    )
+)
+
+
+def encode(batch: list[Action]) -> bytes:
+    """
+    Serializes a batch into a versioned payload made of runs of same-typed actions.
+    registered types are packed with their record, anything else (or anything that does not fit its record)
+    is pickled as a fallback run
+    """
+    out = [_VERSION.pack(VERSION)]
+    for action_type, run_iter in groupby(batch, key=type):
+        run = list(run_iter)
+        for i in range(0, len(run), MAX_RUN_LENGTH):
+            chunk = run[i : i + MAX_RUN_LENGTH]
+            record = RECORDS.get(action_type)
+            try:
+                if not record:
+                    raise CodecError(f"no record for {action_type}")
+                out.extend(_encode_run(record, chunk))
+            except (CodecError, struct.error, UnicodeEncodeError, TypeError):
+                out.extend(_encode_fallback_run(chunk))
+    return b"".join(out)
+
+
+def decode(payload: bytes | memoryview) -> list[Action]:
+    """
+    Parses a payload produced by encode (or a legacy pickled batch) back into a list of actions
+    """
+    view = memoryview(payload)
+    if not view:
+        return []
+    if view[0] == PICKLE_MAGIC:
+        actions = pickle.loads(view)
+        return actions if isinstance(actions, list) else [actions]
+    if view[0] != VERSION:
+        raise CodecError(f"unsupported wire format version {view[0]}")
+
+    try:
+        actions = []
+        offset = _VERSION.size
+        while offset < len(view):
+            type_id, count = _RUN.unpack_from(view, offset)
+            offset += _RUN.size
+            if type_id == FALLBACK_TYPE_ID:
+                offset = _decode_fallback_run(view, offset, actions)
+            elif type_id in RECORDS_BY_ID:
+                offset = _decode_run(
+                    RECORDS_BY_ID[type_id], view, offset, count, actions
+                )
+            else:
+                raise CodecError(f"unknown record type id {type_id}")
+        return actions
+    except (struct.error, UnicodeDecodeError) as e:
+        raise CodecError("malformed payload") from e
+
+
+def _encode_run(record: Record, run: list[Action]) -> list[bytes]:
+    """
+    Packs a run of actions that all share the given record
+    """
+    out = [_RUN.pack(record.type_id, len(run))]
+    if not record.strings:
+        out.extend(record.layout.pack(*record.dump(a)) for a in run)
+        return out
+
+    for action in run:
+        fields = record.dump(action)
+        out.append(record.layout.pack(*fields[: -record.strings]))
+        for text in fields[-record.strings :]:
+            encoded = text.encode("utf-8")
+            out.append(_STRING.pack(len(encoded)))
+            out.append(encoded)
+    return out
+
+
+def _encode_fallback_run(run: list[Action]) -> list[bytes]:
+    """
+    Pickles a run of actions that have no record
+    """
+    pickled = pickle.dumps(run, protocol=pickle.HIGHEST_PROTOCOL)
+    return [_RUN.pack(FALLBACK_TYPE_ID, len(run)), _BLOB.pack(len(pickled)), pickled]
+
+
+def _decode_run(
+    record: Record, view: memoryview, offset: int, count: int, actions: list[Action]
+) -> int:
+    """
+    Unpacks count actions of the given record into actions and returns the offset right after the run
+    """
+    size = record.layout.size
+    if not record.strings:
+        end = offset + size * count
+        if end > len(view):
+            raise CodecError("truncated run")
+        if size:
+            actions.extend(
+                record.load(*fields)
+                for fields in record.layout.iter_unpack(view[offset:end])
+            )
+        else:
+            actions.extend(record.load() for _ in range(count))
+        return end
+
+    for _ in range(count):
+        fields = list(record.layout.unpack_from(view, offset))
+        offset += size
+        for _ in range(record.strings):
+            (length,) = _STRING.unpack_from(view, offset)
+            offset += _STRING.size
+            if offset + length > len(view):
+                raise CodecError("truncated string")
+            fields.append(str(view[offset : offset + length], "utf-8"))
+            offset += length
+        actions.append(record.load(*fields))
+    return offset
+
+
+def _decode_fallback_run(view: memoryview, offset: int, actions: list[Action]) -> int:
+    """
+    Unpickles a fallback run into actions and returns the offset right after it
+    """
+    (length,) = _BLOB.unpack_from(view, offset)
+    offset += _BLOB.size
+    if offset + length > len(view):
+        raise CodecError("truncated fallback run")
+    actions.extend(pickle.loads(view[offset : offset + length]))
+    return offset + length
@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class Color:
+    """
+    An RGBA color of a stroke. a light replacement of pygame.Color so the server doesn't need pygame,
+    it unpacks like a tuple so pygame accepts it as is
+    """
+
+    r: int
+    g: int
+    b: int
+    a: int = 255
+
+    def __iter__(self):
+        yield self.r
+        yield self.g
+        yield self.b
+        yield self.a
@@ -1,3 +1,8 @@
+import os
+import tempfile
+
 SERVER_ADDRESS = "localhost"
 SERVER_PORT = 5678
 # here you have the ip of the server that all the clients are connected to
+# the path of the unix domain socket the server listens on with --transport unix
+SERVER_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "skribble.sock")
@@ -0,0 +1,102 @@
+import time
+from collections import deque
+from typing import Callable
+
+from shared.actions import Action
+from shared.actions.ping_action import PingAction
+from shared.actions.pong_action import PongAction
+
+# seconds between pings
+PING_INTERVAL = 5
+# seconds without hearing anything from the peer after which it is considered gone
+IDLE_TIMEOUT = 15
+# how much a new round trip sample moves the smoothed one
+RTT_SMOOTHING = 0.2
+# how many of the last pongs the clock offset is picked from
+OFFSET_WINDOW = 8
+
+
+class Heartbeat:
+    """
+    The liveness of a single connection as seen from our end: when we last heard from the peer,
+    when we last pinged it, and the round trip time and clock offset measured from its pongs.
+    received batches pass through receive, so pings and pongs are handled here and never reach the action handlers
+    """
+
+    def __init__(
+        self,
+        interval: float = PING_INTERVAL,
+        timeout: float = IDLE_TIMEOUT,
+        on_rtt: Callable[[float], None] = None,
+    ):
+        """
+        on_rtt gets every round trip sample in seconds as it is measured, e.g. to add it to a histogram
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.on_rtt = on_rtt
+        now = time.monotonic()
+        self.last_received = now
+        self.last_ping = now
+        # smoothed round trip time in seconds, None until the first pong
+        self.rtt: float = None
+        # how far the peer's clock is ahead of ours in seconds, None until the first pong
+        self.offset: float = None
+        # (round trip, offset) of the last pongs
+        self.offset_samples: deque[tuple[float, float]] = deque(maxlen=OFFSET_WINDOW)
+
+    def receive(self, actions: list[Action]) -> tuple[list[Action], list[Action]]:
+        """
+        Notes that the peer is alive and takes the pings and pongs out of a received batch,
+        returns the rest of the batch and the pongs to send back
+        """
+        now = time.monotonic()
+        self.last_received = now
+        rest: list[Action] = []
+        replies: list[Action] = []
+        for action in actions:
+            if isinstance(action, PingAction):
+                replies.append(PongAction(action.sent, now))
+            elif isinstance(action, PongAction):
+                sample = now - action.sent
+                self.rtt = (
+                    sample
+                    if self.rtt is None
+                    else self.rtt + RTT_SMOOTHING * (sample - self.rtt)
+                )
+                self._add_offset_sample(sample, action)
+                if self.on_rtt:
+                    self.on_rtt(sample)
+            else:
+                rest.append(action)
+        return rest, replies
+
+    def poll(self) -> PingAction | None:
+        """
+        Returns a ping to send if it's time for one
+        """
+        now = time.monotonic()
+        if now - self.last_ping < self.interval:
+            return None
+        self.last_ping = now
+        return PingAction(now)
+
+    def expired(self) -> bool:
+        """
+        Checks if nothing was heard from the peer for longer than the timeout
+        """
+        return time.monotonic() - self.last_received > self.timeout
+
+    def idle(self) -> float:
+        """
+        Seconds since anything was heard from the peer
+        """
+        return time.monotonic() - self.last_received
+
+    def _add_offset_sample(self, rtt: float, pong: PongAction):
+        """
+        Estimates the offset assuming the peer answered halfway through the round trip.
+        the shortest round trip of the last few is the least skewed by queueing on one of the ways, so its offset is kept
+        """
+        self.offset_samples.append((rtt, pong.replied - (pong.sent + rtt / 2)))
+        self.offset = min(self.offset_samples)[1]
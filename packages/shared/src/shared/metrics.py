@@ -0,0 +1,216 @@
+import bisect
+import threading
+from typing import Callable
+
+# seconds, from a fraction of a millisecond (a handler) to a few seconds (a stuck write)
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+)
+
+
+class _Sharded:
+    """
+    Per-thread storage for a metric: every thread updates a dict of its own, without a lock,
+    and a scrape adds the dicts of all the threads up. the dicts of finished threads are folded into one
+    so a server that starts a thread per client doesn't keep a dict for every client it ever had
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: list[tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _collect(self, merge: Callable[[dict, object, object], None]) -> dict:
+        """
+        Merges the shards into one dict with merge(total, key, value)
+        """
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    for key, value in shard.items():
+                        merge(self._retired, key, value)
+            self._shards = alive
+            total = {}
+            for key, value in self._retired.items():
+                merge(total, key, value)
+            for _, shard in alive:
+                # copying is a single call, a thread adding a key meanwhile can't break it
+                for key, value in shard.copy().items():
+                    merge(total, key, value)
+        return total
+
+
+class Counter(_Sharded):
+    """
+    A number that only goes up, e.g. actions received. labels name the values that are passed to inc
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def inc(self, *label_values: str, amount: float = 1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def collect(self) -> dict[tuple, float]:
+        return self._collect(_add_number)
+
+    def samples(self):
+        for label_values, value in sorted(self.collect().items()):
+            yield self.name, _labels(self.labels, label_values), value
+
+
+class Histogram(_Sharded):
+    """
+    Counts observed values (usually seconds) in buckets, with their sum and count
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+
+    def observe(self, value: float, *label_values: str):
+        shard = self._shard()
+        counts = shard.get(label_values)
+        if counts is None:
+            # a count per bucket plus the +Inf one, then the sum and the count
+            counts = shard[label_values] = [0] * (len(self.buckets) + 3)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def collect(self) -> dict[tuple, list]:
+        return self._collect(_add_lists)
+
+    def samples(self):
+        for label_values, counts in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _labels((*self.labels, "le"), (*label_values, str(bound))),
+                    cumulative,
+                )
+            labels = _labels(self.labels, label_values)
+            yield f"{self.name}_sum", labels, counts[-2]
+            yield f"{self.name}_count", labels, counts[-1]
+
+
+class Gauge:
+    """
+    A value read when scraped, e.g. how many connections are open. collect returns a number,
+    or a dict of numbers by label values
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], float | dict[tuple, float]],
+        labels: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.labels = labels
+
+    def samples(self):
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in sorted(values.items()):
+            yield self.name, _labels(self.labels, label_values), value
+
+
+class Registry:
+    """
+    The metrics of a process, rendered in the Prometheus text format
+    """
+
+    def __init__(self):
+        self.metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def register[T: Counter | Histogram | Gauge](self, metric: T) -> T:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _add_number(total: dict, key, value):
+    total[key] = total.get(key, 0) + value
+
+
+def _add_lists(total: dict, key, value: list):
+    if key in total:
+        total[key] = [a + b for a, b in zip(total[key], value)]
+    else:
+        total[key] = list(value)
@@ -15,6 +15,8 @@ class Player:
     score: int = 0
     is_owner: bool = False
     is_player_turn: bool = False
+    # bumped on every change, see PlayerUpdateAction
+    version: int = 0
 
     def get_player_name(self, my_player_id: UUID):
         """
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class Point:
+    """
+    A point on the canvas. a light replacement of pygame.Vector2 so the server doesn't need pygame,
+    the client turns it into a Vector2 when it draws
+    """
+
+    x: float
+    y: float
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
@@ -1,10 +1,29 @@
+import asyncio
 import logging
 import pickle
 import socket
 
+from shared import codec
 from shared.actions import Action
 
 HEADER_SIZE = 4
+INITIAL_BUFFER_SIZE = 64 * 1024
+# the biggest frame payload either side accepts, the length header comes from the other end and can't be trusted.
+# the biggest real frames (a joining player's canvas) are a few hundred KiB
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class FrameTooLargeError(ConnectionError):
+    """
+    The other end announced a frame bigger than MAX_FRAME_SIZE, the connection can't be read any further
+    """
+
+
+def _check_frame_size(message_length: int):
+    if message_length > MAX_FRAME_SIZE:
+        raise FrameTooLargeError(
+            f"Frame of {message_length} bytes is over the limit of {MAX_FRAME_SIZE}"
+        )
 
 
 class ActionProtocol:
@@ -13,56 +32,137 @@ class ActionProtocol:
         """
         sends the batch form server to client and the opposite
         """
+        ActionProtocol.send_frame(sock, ActionProtocol.encode_frame(batch))
+
+    @staticmethod
+    def encode_frame(batch: list[Action] | Action) -> bytes:
+        """
+        serializes the batch once into a complete length-prefixed frame.
+        the frame is immutable, so the same one can be written to any number of sockets
+        """
         if not batch:
-            return
+            return b""
+        if isinstance(batch, Action):
+            batch = [batch]
 
-        serialized = pickle.dumps(batch)
+        serialized = codec.encode(batch)
 
-        # First send the length of the pickled data as a fixed-length integer
+        # First the length of the encoded data as a fixed-length integer
         message_length = len(serialized)
         size = message_length.to_bytes(HEADER_SIZE, byteorder="big")
 
-        sock.sendall(size + serialized)
+        return size + serialized
+
+    @staticmethod
+    def send_frame(sock: socket.socket, frame: bytes | memoryview):
+        """
+        writes a frame built by encode_frame to the socket
+        """
+        if frame:
+            sock.sendall(frame)
 
     @staticmethod
-    def recv_batch_raw(sock: socket.socket):
+    async def recv_frame_async(reader: asyncio.StreamReader) -> bytes | None:
         """
-        receive the batch from the client to the server and the opposite
+        receives the next frame payload from an asyncio stream, returns None when the connection ends.
+        raises FrameTooLargeError for a frame over MAX_FRAME_SIZE
         """
-        # First read the message length header
-        header = sock.recv(HEADER_SIZE)
-        if not header or len(header) < HEADER_SIZE:
+        try:
+            header = await reader.readexactly(HEADER_SIZE)
+            message_length = int.from_bytes(header, byteorder="big")
+            _check_frame_size(message_length)
+            return await reader.readexactly(message_length)
+        except asyncio.IncompleteReadError:
             return None
 
-        # Unpack the message length
-        message_length = int.from_bytes(header, byteorder="big")
+    @staticmethod
+    async def recv_batch_async(reader: asyncio.StreamReader) -> list[Action]:
+        """
+        receives the next frame from an asyncio stream and decodes it, returns None when the connection ends
+        """
+        return ActionProtocol.decode_payload(
+            await ActionProtocol.recv_frame_async(reader)
+        )
 
-        # Read the actual message data
-        data = b""
-        while len(data) < message_length:
-            chunk = sock.recv(min(4096, message_length - len(data)))
-            if not chunk:
-                raise RuntimeError("Socket connection broken")
-            data += chunk
+    @staticmethod
+    def decode_payload(payload: bytes | memoryview | None) -> list[Action]:
+        """
+        decodes a frame payload into a list of Action objects, returns None for a missing, empty or broken payload
+        """
+        try:
+            if payload:
+                return codec.decode(payload)
+        except (pickle.UnpicklingError, codec.CodecError):
+            logging.exception("Error decoding data")
 
-        return (header, data)
 
-    @staticmethod
-    def recv_batch(sock: socket.socket) -> list[Action]:
+class FrameReader:
+    """
+    Reads length-prefixed frames from a single connection.
+    it owns one growable buffer that the socket fills with recv_into, so receiving a frame doesn't allocate
+    and a frame that arrives in many chunks is never re-copied while it is assembled.
+    the buffer grows with the bytes that actually arrive, not with the length a header claims
+    """
+
+    def __init__(self, sock: socket.socket, initial_size: int = INITIAL_BUFFER_SIZE):
+        self.sock = sock
+        self.buffer = bytearray(initial_size)
+        self.start = 0
+        self.end = 0
+
+    def recv_frame(self) -> memoryview | None:
         """
-        This function receives raw data from a socket, attempts to unpickle it into a list of Action objects, and returns the list if successful.
+        Returns a view of the next frame payload inside the buffer, or None once the connection is closed.
+        the view is only valid until the next call. raises FrameTooLargeError for a frame over MAX_FRAME_SIZE
         """
-        size_plus_data = ActionProtocol.recv_batch_raw(sock)
+        if not self._fill(HEADER_SIZE):
+            return None
 
-        try:
-            if size_plus_data:
-                size, data = size_plus_data
-
-                if data:
-                    # Unpickle the batch
-                    actions = pickle.loads(data)
-                    if not isinstance(actions, list):
-                        actions = [actions]
-                    return actions
-        except pickle.UnpicklingError:
-            logging.exception("Error unpickling data")
+        message_length = int.from_bytes(
+            self.buffer[self.start : self.start + HEADER_SIZE], byteorder="big"
+        )
+        _check_frame_size(message_length)
+        if not self._fill(HEADER_SIZE + message_length):
+            raise ConnectionError("Socket connection broken")
+
+        payload_start = self.start + HEADER_SIZE
+        self.start = payload_start + message_length
+        if self.start == self.end:
+            # nothing left over, the next frame can start at the beginning of the buffer
+            self.start = self.end = 0
+        with memoryview(self.buffer) as view:
+            return view[payload_start : payload_start + message_length]
+
+    def recv_batch(self) -> list[Action]:
+        """
+        Receives the next frame and decodes it into a list of Action objects, returns None when the connection ends
+        """
+        return ActionProtocol.decode_payload(self.recv_frame())
+
+    def _fill(self, needed: int) -> bool:
+        """
+        Reads from the socket until at least needed bytes are buffered, returns False if the connection closed first
+        """
+        while self.end - self.start < needed:
+            if self.start + needed > len(self.buffer):
+                self._make_room(needed)
+            with memoryview(self.buffer) as view:
+                received = self.sock.recv_into(view[self.end :])
+            if not received:
+                return False
+            self.end += received
+        return True
+
+    def _make_room(self, needed: int):
+        """
+        Moves the pending bytes to the front of the buffer, and swaps in a bigger buffer once it is full.
+        it at most doubles, so a frame that is still on the way only gets as much room as twice what arrived
+        """
+        pending = self.end - self.start
+        if self.start:
+            self.buffer[:pending] = self.buffer[self.start : self.end]
+            self.start, self.end = 0, pending
+        if self.end == len(self.buffer):
+            buffer = bytearray(min(needed, len(self.buffer) * 2))
+            buffer[:pending] = self.buffer[:pending]
+            self.buffer = buffer
@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class RoomInfo:
+    """
+    A short description of a room on the server, used to list the rooms a player can join
+    """
+
+    id: str
+    players: int
+    is_playing: bool
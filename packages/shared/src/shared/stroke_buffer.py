@@ -0,0 +1,159 @@
+import itertools
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+from shared.actions.draw_action import DrawAction
+from shared.color import Color
+from shared.point import Point
+
+_COUNT = struct.Struct("<I")
+
+
+class StrokeBuffer:
+    """
+    A compact list of strokes kept in columns (one array per field) instead of DrawAction objects,
+    a segment takes 22 bytes: 4 floats for the points, 4 bytes of color and the brush size.
+    iterating (or indexing) it builds DrawActions on the fly
+    """
+
+    def __init__(self, strokes: Iterable[DrawAction] = ()):
+        self.x0 = array("f")
+        self.y0 = array("f")
+        self.x1 = array("f")
+        self.y1 = array("f")
+        self.colors = array("B")
+        self.sizes = array("H")
+        self.extend(strokes)
+
+    @property
+    def columns(self) -> tuple[array, ...]:
+        return self.x0, self.y0, self.x1, self.y1, self.colors, self.sizes
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __iter__(self) -> Iterator[DrawAction]:
+        for i in range(len(self)):
+            yield self._load(i)
+
+    def __getitem__(self, index: int | slice):
+        """
+        An int returns a single DrawAction, a slice (e.g. buffer[offset:]) returns a new StrokeBuffer
+        """
+        if not isinstance(index, slice):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("stroke index out of range")
+            return self._load(index)
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            return StrokeBuffer(self._load(i) for i in range(start, stop, step))
+        sliced = StrokeBuffer()
+        for column, source in zip(sliced.columns, self.columns):
+            width = 4 if source is self.colors else 1
+            column.extend(source[start * width : stop * width])
+        return sliced
+
+    def __eq__(self, other):
+        return isinstance(other, StrokeBuffer) and self.columns == other.columns
+
+    def __repr__(self):
+        return f"StrokeBuffer({len(self)} strokes)"
+
+    def __reduce__(self):
+        # pickled as the raw columns, this is also how the codec's pickle fallback ships it
+        return StrokeBuffer.frombytes, (self.tobytes(),)
+
+    def append(self, stroke: DrawAction):
+        self.x0.append(stroke.start.x)
+        self.y0.append(stroke.start.y)
+        self.x1.append(stroke.end.x)
+        self.y1.append(stroke.end.y)
+        self.colors.extend(stroke.color)
+        self.sizes.append(stroke.brush_size)
+
+    def extend(self, strokes: Iterable[DrawAction]):
+        """
+        Appends a column at a time, a lot cheaper than appending every stroke on its own for the batches the server keeps
+        """
+        strokes = strokes if isinstance(strokes, list) else list(strokes)
+        self.x0.extend([stroke.start.x for stroke in strokes])
+        self.y0.extend([stroke.start.y for stroke in strokes])
+        self.x1.extend([stroke.end.x for stroke in strokes])
+        self.y1.extend([stroke.end.y for stroke in strokes])
+        self.colors.extend([part for stroke in strokes for part in stroke.color])
+        self.sizes.extend([stroke.brush_size for stroke in strokes])
+
+    def compress(self, keep: Sequence[bool]) -> "StrokeBuffer":
+        """
+        Returns a new buffer with only the strokes whose flag in keep is set, a column at a time
+        """
+        compressed = StrokeBuffer()
+        for column, source in zip(compressed.columns, self.columns):
+            flags = (
+                [flag for flag in keep for _ in range(4)]
+                if source is self.colors
+                else keep
+            )
+            column.extend(itertools.compress(source, flags))
+        return compressed
+
+    def pop(self) -> DrawAction:
+        """
+        Removes and returns the last stroke
+        """
+        stroke = self[-1]
+        for column in self.columns:
+            del column[-4 if column is self.colors else -1 :]
+        return stroke
+
+    def clear(self):
+        for column in self.columns:
+            del column[:]
+
+    def tobytes(self) -> bytes:
+        """
+        Serializes the buffer as a stroke count followed by every column, little endian
+        """
+        return _COUNT.pack(len(self)) + b"".join(
+            column.tobytes() for column in self._little_endian_columns()
+        )
+
+    @classmethod
+    def frombytes(cls, data: bytes | memoryview) -> "StrokeBuffer":
+        """
+        Reads a buffer serialized by tobytes
+        """
+        view = memoryview(data)
+        (count,) = _COUNT.unpack_from(view)
+        buffer = cls()
+        offset = _COUNT.size
+        for column in buffer.columns:
+            size = column.itemsize * count * (4 if column is buffer.colors else 1)
+            if offset + size > len(view):
+                raise ValueError("truncated stroke buffer")
+            column.frombytes(view[offset : offset + size])
+            offset += size
+        if sys.byteorder != "little":
+            for column in buffer.columns:
+                column.byteswap()
+        return buffer
+
+    def _little_endian_columns(self) -> tuple[array, ...]:
+        if sys.byteorder == "little":
+            return self.columns
+        swapped = tuple(array(column.typecode, column) for column in self.columns)
+        for column in swapped:
+            column.byteswap()
+        return swapped
+
+    def _load(self, i: int) -> DrawAction:
+        return DrawAction(
+            Point(self.x0[i], self.y0[i]),
+            Point(self.x1[i], self.y1[i]),
+            Color(*self.colors[i * 4 : i * 4 + 4]),
+            self.sizes[i],
+        )
@@ -0,0 +1,221 @@
+import asyncio
+import itertools
+import os
+import queue
+import socket
+import stat
+import threading
+from typing import Awaitable, Callable
+
+from shared.config import SERVER_ADDRESS, SERVER_PORT
+
+type OnClient = Callable[
+    [asyncio.StreamReader, asyncio.StreamWriter, str], Awaitable[None]
+]
+type Streams = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class Listener:
+    """
+    The server end of a transport in the threaded server mode, accept() blocks until the next client connects
+    """
+
+    def accept(self) -> tuple[socket.socket, str]:
+        """
+        returns the client's connected socket and a name for it in the logs
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class Transport:
+    """
+    How the clients reach the server. ActionProtocol only needs a connected stream socket (or an asyncio stream),
+    so a transport is just the way both ends get one: listen() for the threaded server mode, serve() for the asyncio one,
+    connect() for the client and open_connection() for the bots
+    """
+
+    def listen(self, backlog: int = socket.SOMAXCONN) -> Listener:
+        raise NotImplementedError
+
+    async def serve(self, on_client: OnClient, backlog: int = socket.SOMAXCONN):
+        """
+        accepts clients forever, every one of them is handled by an on_client task on the running loop
+        """
+        raise NotImplementedError
+
+    def connect(self, timeout: float = None) -> socket.socket:
+        raise NotImplementedError
+
+    async def open_connection(self) -> Streams:
+        raise NotImplementedError
+
+
+class SocketListener(Listener):
+    def __init__(self, sock: socket.socket, name: Callable[[object], str]):
+        self.sock = sock
+        self.name = name
+
+    def accept(self) -> tuple[socket.socket, str]:
+        sock, addr = self.sock.accept()
+        return sock, self.name(addr)
+
+    def close(self):
+        self.sock.close()
+
+
+class TcpTransport(Transport):
+    """
+    TCP on host:port, what clients on other machines connect through
+    """
+
+    def __init__(self, host: str = SERVER_ADDRESS, port: int = SERVER_PORT):
+        self.host = host
+        self.port = port
+
+    def listen(self, backlog: int = socket.SOMAXCONN) -> Listener:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((self.host, self.port))
+        sock.listen(backlog)
+        return SocketListener(sock, str)
+
+    async def serve(self, on_client: OnClient, backlog: int = socket.SOMAXCONN):
+        server = await asyncio.start_server(
+            lambda reader, writer: on_client(
+                reader, writer, str(writer.get_extra_info("peername"))
+            ),
+            self.host,
+            self.port,
+            backlog=backlog,
+        )
+        async with server:
+            await server.serve_forever()
+
+    def connect(self, timeout: float = None) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect((self.host, self.port))
+        return sock
+
+    async def open_connection(self) -> Streams:
+        return await asyncio.open_connection(self.host, self.port)
+
+    def __str__(self):
+        return f"tcp://{self.host}:{self.port}"
+
+
+class UnixTransport(Transport):
+    """
+    A unix domain socket at path, for clients on the same machine (bots, sidecars): no TCP/IP stack on the way.
+    the clients of a unix socket have no address, so they are named by the order they connected in
+    """
+
+    def __init__(self, path: str):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix domain sockets are not supported on this platform")
+        self.path = path
+        self.counter = itertools.count(1)
+
+    def listen(self, backlog: int = socket.SOMAXCONN) -> Listener:
+        self._remove_stale_socket()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        sock.listen(backlog)
+        return SocketListener(sock, lambda addr: self._name())
+
+    async def serve(self, on_client: OnClient, backlog: int = socket.SOMAXCONN):
+        self._remove_stale_socket()
+        server = await asyncio.start_unix_server(
+            lambda reader, writer: on_client(reader, writer, self._name()),
+            self.path,
+            backlog=backlog,
+        )
+        async with server:
+            await server.serve_forever()
+
+    def connect(self, timeout: float = None) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(self.path)
+        return sock
+
+    async def open_connection(self) -> Streams:
+        return await asyncio.open_unix_connection(self.path)
+
+    def _name(self) -> str:
+        return f"{self.path}#{next(self.counter)}"
+
+    def _remove_stale_socket(self):
+        """
+        A server that didn't shut down cleanly leaves its socket file behind, and binding to it would fail
+        """
+        try:
+            if stat.S_ISSOCK(os.stat(self.path).st_mode):
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __str__(self):
+        return f"unix://{self.path}"
+
+
+class MemoryListener(Listener):
+    def __init__(self, transport: "MemoryTransport"):
+        self.transport = transport
+
+    def accept(self) -> tuple[socket.socket, str]:
+        return self.transport.pending.get(), self.transport._name()
+
+
+class MemoryTransport(Transport):
+    """
+    Connects clients to a server in the same process, e.g. for tests and benchmarks.
+    connect() makes a socket pair and hands the server its end, so there is no address to bind, nothing else can connect,
+    and the server modes and FrameReader keep working on real sockets
+    """
+
+    def __init__(self):
+        # the server ends of the pairs that weren't accepted yet
+        self.pending: queue.SimpleQueue[socket.socket] = queue.SimpleQueue()
+        self.counter = itertools.count(1)
+
+    def listen(self, backlog: int = socket.SOMAXCONN) -> Listener:
+        return MemoryListener(self)
+
+    async def serve(self, on_client: OnClient, backlog: int = socket.SOMAXCONN):
+        loop = asyncio.get_running_loop()
+        accepted: asyncio.Queue[tuple[socket.socket, str]] = asyncio.Queue()
+        listener = self.listen()
+
+        def accept_thread_main():
+            # connect() may be called from any thread, the accepted sockets are handed over to the loop
+            while True:
+                loop.call_soon_threadsafe(accepted.put_nowait, listener.accept())
+
+        threading.Thread(target=accept_thread_main, daemon=True).start()
+        tasks = set()
+        while True:
+            sock, addr = await accepted.get()
+            reader, writer = await asyncio.open_connection(sock=sock)
+            task = asyncio.create_task(on_client(reader, writer, addr))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    def connect(self, timeout: float = None) -> socket.socket:
+        client, server = socket.socketpair()
+        client.settimeout(timeout)
+        self.pending.put(server)
+        return client
+
+    async def open_connection(self) -> Streams:
+        client, server = socket.socketpair()
+        self.pending.put(server)
+        return await asyncio.open_connection(sock=client)
+
+    def _name(self) -> str:
+        return f"memory#{next(self.counter)}"
+
+    def __str__(self):
+        return "memory://"